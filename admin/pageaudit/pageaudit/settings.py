@@ -114,6 +114,55 @@ MANAGERS = []
 ADMINS_EMAIL_TO_SMS = []
 
 
+## When set to 1/true, /collect/report/ only queues the POST'd report and returns a 202, so the Node runner
+##  doesn't wait on the save. Reports are then saved by running:  manage.py process_report_queue
+REPORT_INGEST_ASYNC = os.getenv('DJANGO_REPORT_INGEST_ASYNC', '') in ('1', 'true', 'True')
+
+## When set to 1/true, new raw Lighthouse reports are saved compressed, with large repeated parts (screenshots,
+##  network request lists) stored once and shared between reports. Existing reports can be converted with:
+##  manage.py compress_report_data
+REPORT_DATA_COMPRESSED = os.getenv('DJANGO_REPORT_DATA_COMPRESSED', '') in ('1', 'true', 'True')
+
+## Where manage.py snapshot_runs writes the columnar (Arrow) snapshots of the run history for analytics.
+REPORT_SNAPSHOT_DIR = os.getenv('DJANGO_REPORT_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))
+
+## Seconds that /api/urltypeahead/ results are cached for, in Django's cache (per process, unless DJANGO_CACHE_BACKEND is set).
+URL_TYPEAHEAD_CACHE_SECONDS = int(os.getenv('DJANGO_URL_TYPEAHEAD_CACHE_SECONDS', 30))
+
+## Seconds each process buffers page view counts for before adding them to the PageView table.
+PAGE_VIEW_FLUSH_SECONDS = int(os.getenv('DJANGO_PAGE_VIEW_FLUSH_SECONDS', 60))
+
+## Seconds the banners, filter list and flatpages nav every page shows are cached for (see report/sitecache.py).
+SITE_CACHE_SECONDS = int(os.getenv('DJANGO_SITE_CACHE_SECONDS', 300))
+
+## Seconds pre-rendered browse page report cards are cached for (see report/cards.py).
+REPORT_CARD_CACHE_SECONDS = int(os.getenv('DJANGO_REPORT_CARD_CACHE_SECONDS', 86400))
+
+## Django's caches. By default they're in memory, per process. To share them between processes (the web
+##  workers and manage.py process_report_queue), set a shared backend, i.e. DJANGO_CACHE_BACKEND to
+##  django.core.cache.backends.memcached.MemcachedCache and DJANGO_CACHE_LOCATION to 127.0.0.1:11211.
+## Report cards get a cache of their own, so they don't push everything else out of a memory cache.
+##  They're only pre-rendered at ingest when it's shared (see report/cards.py).
+CACHE_BACKEND = os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.getenv('DJANGO_CACHE_LOCATION', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    'reportcards': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION or 'reportcards',
+        'KEY_PREFIX': 'reportcards',
+    },
+}
+
+if CACHE_BACKEND.endswith('LocMemCache'):
+    ## Room for every viewdata mode of a few thousand cards.
+    CACHES['reportcards']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+
+
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
 DATABASES = {
@@ -26,7 +26,7 @@ from django.urls import reverse_lazy
 handler404 = 'report.views.custom_404'
 handler500 = 'report.views.custom_500'
 
-from report.views import collect_report, get_urls
+from report.views import collect_report, collect_reports_batch, get_urls
 
 urlpatterns = [
     ## Django overall admin.
@@ -34,6 +34,7 @@ urlpatterns = [
     
     ## Node URLs for running reports and posting them to us.
     url(r'^collect/report/$', collect_report, name='collect_report'),
+    url(r'^collect/reports/batch/$', collect_reports_batch, name='collect_reports_batch'),
     url(r'^queue/$', get_urls, name='get_urls'),
 
     ## Report app URLs namespace. All URLs are in reports/urls.py
@@ -5,6 +5,9 @@ from .models import *
 class LighthouseRunAdmin(admin.ModelAdmin):
     readonly_fields = ["url"]
 
+class LighthouseRunThumbnailAdmin(admin.ModelAdmin):
+    readonly_fields = ["lighthouse_run"]
+
 class UrlAdmin(admin.ModelAdmin):
     search_fields = ["url"]
     readonly_fields = ["lighthouse_run", "url_kpi_average", "url_paths", "search_key_vals"]
@@ -26,7 +29,10 @@ admin.site.register(BannerNotification)
 admin.site.register(LighthouseDataRaw, LighthouseDataRawAdmin)
 admin.site.register(LighthouseDataUsertiming)
 admin.site.register(LighthouseRun, LighthouseRunAdmin)
+admin.site.register(LighthouseRunThumbnail, LighthouseRunThumbnailAdmin)
 admin.site.register(PageView)
+admin.site.register(ReportDeadLetter)
+admin.site.register(ReportQueueItem)
 admin.site.register(Team)
 admin.site.register(Url, UrlAdmin)
 admin.site.register(UrlKpiAverage, UrlKpiAverageAdmin)
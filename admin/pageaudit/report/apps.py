@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ReportConfig(AppConfig):
     name = 'report'
+
+    def ready(self):
+        ## Connects the signals that invalidate the site-wide cache, in every process that could save those models.
+        from . import sitecache
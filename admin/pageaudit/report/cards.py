@@ -0,0 +1,112 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+
+from .templatetags.template_helpers import TEMPLATE_HELPERS
+
+
+##
+##  Pre-rendered report cards, for the browse page and it's "load more" API.
+##
+##  A card only changes when it's URL gets a new run, so each card's HTML is cached per 'viewdata'
+##  mode, keyed by the URL's ID, it's latest run ID and a hash of the URL itself. Cards are rendered
+##  and cached when reports are saved (cacheReportCards), so a browse page just joins 20 ready
+##  fragments, and only renders the odd card that isn't cached (yet, or anymore).
+##  Averages changed without a new run (./manage.py rebuild_kpi_averages) show once the cached
+##  cards expire, after REPORT_CARD_CACHE_SECONDS.
+##
+##  Cards have their own cache, 'reportcards'. Rendering them at ingest only helps if the browse page's
+##  process can see them, so with the default per-process memory cache they're only rendered by the
+##  browse pages themselves. Set DJANGO_CACHE_BACKEND to a shared cache to have them rendered at ingest.
+##
+##
+
+logger = logging.getLogger(__name__)
+
+## The browse page's 'viewdata' modes, each is a different score on the card. The first is the default.
+REPORT_CARD_VIEWDATA = ('perfscore', 'a11yscore', 'seoscore',)
+
+
+def getReportCardCache():
+    return caches['reportcards']
+
+
+def isCacheShared(cache):
+    """
+    Whether other processes see what's put in the cache.
+    """
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def getViewData(viewData):
+    return viewData if viewData in REPORT_CARD_VIEWDATA else REPORT_CARD_VIEWDATA[0]
+
+
+def getReportCardKey(url, viewData):
+    return 'reportcard:%s:%s:%s:%s' % (url.id, url.lighthouse_run_id, viewData, hashlib.md5(url.url.encode('utf-8')).hexdigest())
+
+
+def renderReportCard(url, viewData):
+    return render_to_string('partials/report_card.html', {
+        'url': url,
+        'viewdata': viewData,
+        'templateHelpers': TEMPLATE_HELPERS,
+    })
+
+
+def getReportCardsHtml(urls, viewData):
+    """
+    The cards HTML for a list of Urls, in order.
+    Cards that aren't cached are rendered, with their runs and averages fetched in 2 queries total, and cached.
+    """
+    cache = getReportCardCache()
+    viewData = getViewData(viewData)
+    keys = [getReportCardKey(url, viewData) for url in urls]
+    cards = cache.get_many(keys)
+    missingUrls = [url for url, key in zip(urls, keys) if key not in cards]
+
+    if missingUrls:
+        prefetch_related_objects(missingUrls, 'lighthouse_run', 'url_kpi_average')
+        renderedCards = {getReportCardKey(url, viewData): renderReportCard(url, viewData) for url in missingUrls}
+        cache.set_many(renderedCards, settings.REPORT_CARD_CACHE_SECONDS)
+        cards.update(renderedCards)
+
+    return ''.join(cards[key] for key in keys)
+
+
+def cacheReportCards(urls):
+    """
+    Render and cache every 'viewdata' mode of the cards of a list of Urls, i.e. once they have a new run.
+    The Urls' lighthouse_run and url_kpi_average should be the new ones.
+    """
+    prefetch_related_objects(urls, 'lighthouse_run', 'url_kpi_average')
+
+    getReportCardCache().set_many({
+        getReportCardKey(url, viewData): renderReportCard(url, viewData)
+        for url in urls
+        for viewData in REPORT_CARD_VIEWDATA
+    }, settings.REPORT_CARD_CACHE_SECONDS)
+
+
+def cacheReportCardsOnCommit(urls):
+    """
+    Have cacheReportCards run once the reports being saved are committed, if the card cache is shared.
+    Errors are only logged, the reports are saved either way, and missing cards get rendered by the browse pages.
+    """
+    if not isCacheShared(getReportCardCache()):
+        return
+
+    def cacheCards():
+        try:
+            cacheReportCards(urls)
+        except Exception:
+            logger.exception('Pre-rendering report cards failed')
+
+    transaction.on_commit(cacheCards)
@@ -0,0 +1,107 @@
+import csv
+import datetime
+import json
+
+from django.contrib.postgres.fields import JSONField
+from django.db.models import OuterRef, Subquery, Value
+
+from .helpers import startOfDay
+from .models import LighthouseDataUsertiming, LighthouseRun
+
+
+##
+##  Streaming export of LighthouseRuns, as CSV or NDJSON.
+##
+##  Runs are read with a server-side cursor (QuerySet.iterator), with the URL and user-timing data
+##  joined in the same SQL query, and written out a row at a time by generators. Memory use stays flat
+##  no matter how many runs are exported, and the same generators feed the management command
+##  (./manage.py export_runs) and the /report/api/export/runs/ streaming response.
+##
+##
+
+## (column name, query field)
+EXPORT_COLUMNS = (
+    ('test_id', 'id'),
+    ('url_id', 'url_id'),
+    ('created_date', 'created_date'),
+    ('url', 'url__url'),
+    ('performance_score', 'performance_score'),
+    ('total_byte_weight', 'total_byte_weight'),
+    ('number_network_requests', 'number_network_requests'),
+    ('time_to_first_byte', 'time_to_first_byte'),
+    ('first_contentful_paint', 'first_contentful_paint'),
+    ('first_meaningful_paint', 'first_meaningful_paint'),
+    ('dom_content_loaded', 'dom_content_loaded'),
+    ('dom_loaded', 'dom_loaded'),
+    ('interactive', 'interactive'),
+    ('masthead_onscreen', 'masthead_onscreen'),
+    ('redirect_hops', 'redirect_hops'),
+    ('redirect_wasted_ms', 'redirect_wasted_ms'),
+    ('sequence', 'url__sequence'),
+    ('user_timing_data', 'user_timing_data'),
+)
+
+EXPORT_FORMATS = ('csv', 'ndjson',)
+EXPORT_CHUNK_SIZE = 2000
+
+
+def getExportRuns(startDate=None, endDate=None, urlFilter=None, includeUserTiming=False):
+    """
+    Values queryset of the runs to export, oldest first.
+    Dates are inclusive. 'urlFilter' is a UrlFilter to only export it's URLs' runs.
+    """
+    runs = LighthouseRun.objects.order_by('created_date', 'id')
+
+    if startDate:
+        runs = runs.filter(created_date__gte=startOfDay(startDate))
+
+    if endDate:
+        runs = runs.filter(created_date__lt=startOfDay(endDate + datetime.timedelta(days=1)))
+
+    if urlFilter is not None:
+        runs = runs.filter(url__in=urlFilter.run_query().values('id'))
+
+    if includeUserTiming:
+        userTiming = LighthouseDataUsertiming.objects.filter(lighthouse_run=OuterRef('pk')).order_by('-id').values('report_data')[:1]
+        runs = runs.annotate(user_timing_data=Subquery(userTiming, output_field=JSONField()))
+    else:
+        runs = runs.annotate(user_timing_data=Value(None, output_field=JSONField()))
+
+    return runs.values_list(*[field for name, field in EXPORT_COLUMNS])
+
+
+class LineBuffer:
+    """
+    File-like object that just hands back what's written to it, so csv.writer can write to a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csvLines(runs):
+    writer = csv.writer(LineBuffer())
+
+    yield writer.writerow([name for name, field in EXPORT_COLUMNS])
+
+    for row in runs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = list(row)
+        row[-1] = json.dumps(row[-1]) if row[-1] else ''
+        yield writer.writerow(row)
+
+
+def ndjsonLines(runs):
+    names = [name for name, field in EXPORT_COLUMNS]
+
+    for row in runs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield json.dumps(dict(zip(names, row)), default=str) + '\n'
+
+
+def exportLines(runs, format='csv'):
+    """
+    Generator of the export's lines, in 'csv' or 'ndjson' format.
+    """
+    if format == 'ndjson':
+        return ndjsonLines(runs)
+
+    return csvLines(runs)
@@ -0,0 +1,162 @@
+import json
+from collections import namedtuple
+
+from .helpers import getUserTimingValue
+
+
+##
+##  Pulls everything we store about a run out of a Lighthouse report, in one pass over the report.
+##
+##  Each KPI used to be its own try/except walk from the top of the report.
+##  Now they're all listed in this path table, which gets compiled into a tree of shared path
+##  prefixes, so e.g. 'audits' -> 'redirects' is only looked up once for both redirect fields.
+##
+##  From https://blog.dareboost.com/en/2018/06/lighthouse-tool-chrome-devtools/
+##  First ContentFul Paint: First contentful paint marks the time at which the first text/image is painted.
+##  First Meaningful Paint: First Meaningful Paint measures when the primary content of a page is visible.
+##  Speed Index: Speed Index shows how quickly the contents of a page are visibly populated.
+##  First CPU Idle: First CPU Idle marks the first time at which the page’s main thread is quiet enough to handle input.
+##  Time to Interactive: Interactive marks the time at which the page is fully interactive.
+##
+##
+
+def toScore(value):
+    return int(value * 100)
+
+
+## (name, path into the report, transform, default if missing/null/broken)
+## Names that aren't LighthouseRun fields (statusCode, thumbnail, userTimings, redirects) are used to build those.
+REPORT_FIELD_PATHS = (
+    ('accessibility_score', ('categories', 'accessibility', 'score'), toScore, 0),
+    ('performance_score', ('categories', 'performance', 'score'), toScore, 0),
+    ('seo_score', ('categories', 'seo', 'score'), toScore, 0),
+    ('total_byte_weight', ('audits', 'total-byte-weight', 'rawValue'), None, 0),
+    ('number_network_requests', ('audits', 'network-requests', 'rawValue'), None, 0),
+    ('statusCode', ('audits', 'network-requests', 'details', 'items', 0, 'statusCode'), None, None),
+    ('time_to_first_byte', ('audits', 'time-to-first-byte', 'rawValue'), None, 0),
+    ('first_meaningful_paint', ('audits', 'first-meaningful-paint', 'rawValue'), None, 0),
+    ('first_contentful_paint', ('audits', 'first-contentful-paint', 'rawValue'), None, 0),
+    ('interactive', ('audits', 'interactive', 'rawValue'), None, 0),
+    ('thumbnail', ('audits', 'screenshot-thumbnails', 'details', 'items', -1, 'data'), None, ''),
+    ('dom_content_loaded', ('audits', 'metrics', 'details', 'items', 0, 'observedDomContentLoaded'), None, 0),
+    ('dom_loaded', ('audits', 'metrics', 'details', 'items', 0, 'observedLoad'), None, 0),
+    ('redirects', ('audits', 'redirects', 'details', 'items'), None, []),
+    ('redirect_wasted_ms', ('audits', 'redirects', 'rawValue'), None, 0),
+    ('userTimings', ('audits', 'user-timings', 'details', 'items'), None, []),
+)
+
+
+ReportFields = namedtuple('ReportFields', ['run', 'userTimings', 'redirects', 'thumbnail'])
+
+
+def compilePaths(fieldPaths):
+    """
+    Turns the flat path table into a tree of shared path prefixes.
+    Each node is: {'fields': [(name, transform), ...], 'children': {key: node}}
+    """
+    tree = {'fields': [], 'children': {}}
+
+    for name, path, transform, default in fieldPaths:
+        node = tree
+
+        for key in path:
+            node = node['children'].setdefault(key, {'fields': [], 'children': {}})
+
+        node['fields'].append((name, transform))
+
+    return tree
+
+
+COMPILED_REPORT_FIELD_PATHS = compilePaths(REPORT_FIELD_PATHS)
+REPORT_FIELD_DEFAULTS = {name: default for name, path, transform, default in REPORT_FIELD_PATHS}
+
+
+def walkCompiledPaths(node, data, values):
+    """
+    Walks the report and the compiled path tree together, filling 'values' in as leaves are found.
+    Missing keys, bad indexes and wrong types just skip that branch.
+    """
+    for key, child in node['children'].items():
+        try:
+            value = data[key]
+        except (KeyError, IndexError, TypeError):
+            continue
+
+        for name, transform in child['fields']:
+            try:
+                if value is not None:
+                    values[name] = transform(value) if transform else value
+            except Exception as ex:
+                pass
+
+        if child['children']:
+            walkCompiledPaths(child, value, values)
+
+
+def extractReportFields(reportData):
+    """
+    Returns a ReportFields tuple for a Lighthouse report:
+        run:  LighthouseRun field values.
+        userTimings:  List of the report's user-timing entries.
+        redirects:  List of the report's redirect hops.
+        thumbnail:  Base64 screenshot of the loaded page, or ''.
+    """
+    values = dict(REPORT_FIELD_DEFAULTS)
+    walkCompiledPaths(COMPILED_REPORT_FIELD_PATHS, reportData, values)
+
+    userTimings = values.pop('userTimings') or []
+    redirects = values.pop('redirects') or []
+    statusCode = values.pop('statusCode')
+    thumbnail = values.pop('thumbnail') or ''
+
+    values['redirect_hops'] = len(redirects)
+    values['masthead_onscreen'] = getUserTimingValue("V18-masthead-load", userTimingsArray=userTimings)['startTime']
+
+    ## Check if the initial request was a 4xx or 5xx, and set run as invalid.
+    try:
+        values['invalid_run'] = statusCode > 399
+    except TypeError:
+        values['invalid_run'] = False
+
+    values['http_error_code'] = statusCode if values['invalid_run'] else None
+
+    return ReportFields(values, userTimings, redirects, thumbnail)
+
+
+def getReportFromPayload(payload):
+    """
+    Get the Lighthouse report out of a decoded report POST payload. Accepts:
+        {"report": "<report JSON string>"}  (what the Node runner sends)
+        {"report": {<report>}}
+        {"lhr": {<report>}}
+        {<report>}  (a bare Lighthouse report)
+    Returns a (report dict, report JSON string) tuple. The JSON string is None unless the report
+    came in as one. When we have it, it's saved as-is instead of re-serializing the report dict.
+    """
+    report = payload.get('report')
+    reportJson = None
+
+    if not report and payload.get('lhr'):
+        report = payload['lhr']
+    elif not report and 'requestedUrl' in payload:
+        report = payload
+
+    if isinstance(report, bytes):
+        report = report.decode('utf-8')
+
+    if isinstance(report, str):
+        reportJson = report
+        report = json.loads(reportJson)
+
+    if not isinstance(report, dict):
+        raise ValueError('Report value missing in payload')
+
+    return (report, reportJson)
+
+
+def loadReportPayload(rawData):
+    """
+    Decode a raw report POST body to a (report dict, report JSON string) tuple. See getReportFromPayload.
+    The outer payload dict is only referenced in here, so it's freed as soon as the report is out of it.
+    """
+    return getReportFromPayload(json.loads(rawData))
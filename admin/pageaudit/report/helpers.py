@@ -1,9 +1,18 @@
+import base64
 import os
 import datetime
+import hashlib
 import requests, json
+import uuid
+from urllib import parse
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import JSONField
 from django.core.mail import send_mail
+from django.db.models import Avg, Count, Max, Min, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils import timezone
 
 
 ##  Global var to be used any time we need to use the range or min/max # of
@@ -68,7 +77,105 @@ def getUserTimingValue(timingName, userTimingsObject=None, userTimingsArray=None
 
     return returnObject
 
+
+##
+##  Splits a batch report POST body into a list of decoded report payloads.
+##  Accepts either a JSON array of payloads, or NDJSON (one payload per line).
+##
+##
+def parseReportBatch(rawBody):
+    if isinstance(rawBody, bytes):
+        rawBody = rawBody.decode('utf-8')
+    
+    rawBody = rawBody.strip()
+    
+    if rawBody.startswith('['):
+        return json.loads(rawBody)
+    
+    return [json.loads(line) for line in rawBody.splitlines() if line.strip()]
+
+
+##
+##  Date from a YYYY-MM-DD request param. None if it's empty, ValueError if it's not a valid date.
+##
+##
+def parseDateParam(value):
+    if not value:
+        return None
+    
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Dates must be YYYY-MM-DD, got: %s' % value)
+
+
+def startOfDay(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+##
+##  Canonical form of a URL, so the same page always matches the same Url no matter how it's written.
+##  Lowercases the scheme and host, drops default ports, and drops trailing slashes from the path.
+##  i.e. 'HTTPS://www.IBM.com:443/foo/' -> 'https://www.ibm.com/foo'
+##
+##
+def normalizeUrl(url):
+    loc = parse.urlsplit(url.strip())
+    scheme = loc.scheme.lower()
+    netloc = loc.netloc.lower()
+    
+    try:
+        if (scheme, loc.port) in (('http', 80), ('https', 443)):
+            netloc = netloc.rsplit(':', 1)[0]
+    except ValueError:
+        pass
+    
+    return parse.urlunsplit((scheme, netloc, loc.path.rstrip('/'), loc.query, loc.fragment))
+
+
+##
+##  Compact hash of the normalized URL, used for Url lookups instead of the full URL string.
+##
+##
+def getUrlHash(url):
+    return uuid.UUID(bytes=hashlib.md5(normalizeUrl(url).encode('utf-8')).digest())
+
+
+##
+##  Key used to spot a report POST we've already saved (i.e. the runner re-sent it after a timeout).
+##  The sha256 of the client's idempotency key if it sent one, otherwise of the request body itself.
+##
+##
+def getIngestKey(rawBody, idempotencyKey=None):
+    if idempotencyKey:
+        return hashlib.sha256(('key:%s' % idempotencyKey).encode('utf-8')).hexdigest()
+    
+    if isinstance(rawBody, str):
+        rawBody = rawBody.encode('utf-8')
+    
+    return hashlib.sha256(rawBody).hexdigest()
+
    
+##
+##  Value to save to a JSONField. If we already have the data as a JSON string, it's cast to jsonb
+##   in the INSERT itself, which saves serializing the whole dict back to JSON in Python.
+##
+##
+def storableJson(data, jsonString=None):
+    if jsonString is None:
+        return data
+
+    return Cast(Value(jsonString), JSONField())
+
+
+##
+##  Integer average of a non-negative total, rounding halves up like Postgres round() does.
+##
+##
+def averageOf(total, count):
+    return (2 * total + count) // (2 * count)
+
+
 ##
 ##  Takes the HTTP error code passed and the message and pushes 
 ##   a message to the Slack web hook URL for our room.
@@ -110,66 +217,96 @@ def sendEmailNotification(sendToArr, emailTitle, emailBody):
         pass
 	
 
+##
+##  The lines on the score history chart: (LighthouseRun field, line label).
+##
+##
+SCORE_CHART_LINES = (
+    ('performance_score', 'Performance'),
+    ('accessibility_score', 'Accessibility '),
+    ('seo_score', 'SEO'),
+)
+
+##  Most points a downsampled chart line gets, however many runs are in range.
+CHART_MAX_POINTS = 120
+
+
 ##
 ##  Takes a LighthouseRun queryset and creates data object used by the line chart
 ##  on the report detail page to chart the score history.
+##  Shared by every chart endpoint that charts scores over time.
+##  With maxPoints, long histories are downsampled to that many points (see getBucketedRunValues).
 ##
 ##
-def createHistoricalScoreChartData(LighthouseRunQueryset):
-    ## Setup arrays of data for the line chart.
-    ## Each object is an array that is simply passed to D3 and each represents a line on the chart.
-    lineChartData = {
-        'dates': ['x'],
-        'perfScores': ['Performance'],
-        'a11yScores': ['Accessibility '],
-        'seoScores': ['SEO'],
-    }
+def createHistoricalScoreChartData(LighthouseRunQueryset, lines=SCORE_CHART_LINES, maxPoints=None):
+    ## Each column is an array that is simply passed to D3 and each represents a line on the chart.
+    ## The first item of each is its name, the dates column is the x-axis.
+    dates = ['x']
+    lineColumns = [[label] for field, label in lines]
     
-    ## Safety: IF there are actually any items in the inbound queryset, add them as data points.
-    if LighthouseRunQueryset is not None and LighthouseRunQueryset.count() > 0:
-        ## Get list of field values as array data and add to our arrays setup above for each line.
-        lhRunsPerfScores = LighthouseRunQueryset.values_list('performance_score', flat=True)
-        lhRunsA11yScores = LighthouseRunQueryset.values_list('accessibility_score', flat=True)
-        lhRunsSeoScores = LighthouseRunQueryset.values_list('seo_score', flat=True)
+    ## One query for just the fields we chart, no model instances (or their thumbnails) needed.
+    ## Safety: the queryset can be None, for an empty chart.
+    if LighthouseRunQueryset is not None:
+        fields = [field for field, label in lines]
         
-        ## Add the data values array for each line we want to chart.
-        lineChartData['perfScores'].extend(list(lhRunsPerfScores))
-        lineChartData['a11yScores'].extend(list(lhRunsA11yScores))
-        lineChartData['seoScores'].extend(list(lhRunsSeoScores))
+        if maxPoints is None:
+            runValues = LighthouseRunQueryset.values_list('created_date', *fields)
+        else:
+            runValues = getBucketedRunValues(LighthouseRunQueryset, fields, maxPoints)
         
-        ## Add dates, formatted, as x-axis array data.
-        for runData in LighthouseRunQueryset:
-            lineChartData['dates'].append(runData.created_date.strftime('%d-%m-%Y'))
-        
-        ## This is the exact specific data object this chart uses. 
-        ## We just echo this out to the JS. No further processing needed.
-        ## It's all here, nice tight bundle and makes the page JS real clean.
+        for runData in runValues:
+            dates.append(runData[0].strftime('%d-%m-%Y'))
+            
+            for column, value in zip(lineColumns, runData[1:]):
+                column.append(value)
     
+    ## This is the exact specific data object this chart uses. 
+    ## We just echo this out to the JS. No further processing needed.
+    ## It's all here, nice tight bundle and makes the page JS real clean.
     data = {
         'x': 'x',
         'xFormat': '%d-%m-%Y',
         'type': 'spline',
-        'columns': [
-            lineChartData['dates'],
-            lineChartData['perfScores'],
-            lineChartData['a11yScores'],
-            lineChartData['seoScores']
-        ]
+        'columns': [dates] + lineColumns
     }
 
     return data
 
 
-##  *** FUTURE FEATURE ***
 ##
-## Will be used with date pickers UI to allow user to select start/stop date range 
-## of data they want charted and in the data table and other places.
+##  (created_date, *fields) rows for an (unsliced) LighthouseRun queryset, oldest first.
+##  If there are more than maxPoints runs, the time range is cut into maxPoints equal buckets and
+##  each bucket is one row: the date of its first run and the (rounded) average of each field.
+##  The bucketing is done by the database, so a multi-year history is still just 2 small queries.
+##
 ##
+def getBucketedRunValues(LighthouseRunQueryset, fields, maxPoints=CHART_MAX_POINTS):
+    runs = LighthouseRunQueryset.order_by()
+    span = runs.aggregate(count=Count('id'), first=Min('created_date'), last=Max('created_date'))
+    
+    if span['count'] <= maxPoints:
+        return list(runs.order_by('created_date').values_list('created_date', *fields))
+    
+    bucketSeconds = max((span['last'] - span['first']).total_seconds() / maxPoints, 1)
+    ## The last run would start a bucket of its own, so it goes in the last one.
+    bucket = RawSQL(
+        'least(floor(extract(epoch from %s.created_date - %%s) / %%s), %%s)' % runs.model._meta.db_table,
+        (span['first'], bucketSeconds, maxPoints - 1)
+    )
+    averages = {'avg_%s' % field: Avg(field) for field in fields}
+    
+    buckets = runs.annotate(bucket=bucket).values('bucket').annotate(bucket_date=Min('created_date'), **averages).order_by('bucket')
+    
+    return [
+        (row['bucket_date'],) + tuple(round(row['avg_%s' % field]) for field in fields)
+        for row in buckets
+    ]
+
+
 ##
 ##  Takes a LighthouseRun queryset (for a given URL) and filters it to a given date scope.
-##  This is used in several views, so it's here. Also allows us to write a test for it.
+##  Dates are datetime.dates and both are inclusive, either can be None for an open end.
 ##  Use cases:
-##     Show chart/data with ALL lighthouse runs.
 ##     Show chart/data with runs from the past X # days.
 ##     Show chart/data with runs from Sept 5 to Oct 24.
 ##     Show chart/data with runs up until Oct 16.
@@ -178,11 +315,36 @@ def createHistoricalScoreChartData(LighthouseRunQueryset):
 ##
 def lighthouseRunsByDate(LighthouseRunQueryset, startDate=None, endDate=None):
     if startDate is not None:
-        LighthouseRunQueryset = LighthouseRunQueryset.filter(created_date__gt=startDate)
+        LighthouseRunQueryset = LighthouseRunQueryset.filter(created_date__gte=startOfDay(startDate))
 
     if endDate is not None:
-        LighthouseRunQueryset = LighthouseRunQueryset.filter(created_date__lt=endDate)
+        LighthouseRunQueryset = LighthouseRunQueryset.filter(created_date__lt=startOfDay(endDate + datetime.timedelta(days=1)))
 
     return LighthouseRunQueryset
     
 
+
+##
+##  Opaque, URL-safe pagination cursor for a list of JSON-able values (dates are ISO formatted).
+##
+##
+def encodeCursor(values):
+    cursorJson = json.dumps(values, default=lambda value: value.isoformat())
+
+    return base64.urlsafe_b64encode(cursorJson.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+##
+##  The list of values in a cursor from encodeCursor. Raises ValueError if it isn't one.
+##
+##
+def decodeCursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error):
+        raise ValueError('Bad cursor: %s' % cursor)
+
+    if not isinstance(values, list):
+        raise ValueError('Bad cursor: %s' % cursor)
+
+    return values
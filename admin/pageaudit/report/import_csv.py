@@ -1,120 +1,78 @@
 import csv
 import datetime
+import itertools
 
 field_names=['url', 'url2', 'views', 'hist', 'sequence',]
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.db import transaction
 from django.db.models import Avg, Max, Min, Q, Sum
 from django.utils import timezone
 
+from report.export import EXPORT_CHUNK_SIZE, EXPORT_COLUMNS, getExportRuns
 from report.models import (Url, LighthouseRun, LighthouseDataRaw, LighthouseDataUsertiming,
                            UserTimingMeasureName, UserTimingMeasure, UserTimingMeasureAverage)
 
 
-superuser = User.objects.get(id=1)
-
-
 def load_urls_into_db(path):
-    f = open(path, 'r')
-
-    reader = csv.DictReader(f,fieldnames= field_names)
-
-    row_id = 0
-
-    for row in reader:
-        urlObj = Url(
-            created_by = superuser,
-            edited_by = superuser,
-            url = 'https://%s' % row['url'],
-            sequence = int(row['sequence'])
-        )
-        urlObj.save()
+    """
+    Kept for old scripts, use: ./manage.py load_urls <path>
+    """
+    call_command('load_urls', path)
 
 
 def write_report_csv(path, date_since=None, include_user_timing=False):
+    """
+    Kept for old scripts, use: ./manage.py export_runs <path>
+    Writes the same values as it always has, which export_runs doesn't:
+    'sequence' is the URL's ID, and 'user_timing_data' is the Python repr of the data, not JSON.
+    """
     if not path:
         print('path is required')
         return
 
-    file = open(path, 'w')
-    writer = csv.writer(file)
-    with file:
-        writer.writerow([
-            "test_id",
-            "url_id",
-            "created_date",
-            "url",
-            "performance_score",
-            "total_byte_weight",
-            "number_network_requests",
-            "time_to_first_byte",
-            "first_contentful_paint",
-            "first_meaningful_paint",
-            "dom_content_loaded",
-            "dom_loaded",
-            "interactive",
-            "masthead_onscreen",
-            "redirect_hops",
-            "redirect_wasted_ms",
-            "sequence",
-            "user_timing_data"
-        ])
-
-        if date_since:
-            if date_since['month'] and date_since['day'] and date_since['year']:
-                m = date_since['month']
-                d = date_since['day']
-                y = date_since['year']
-                run_data = LighthouseRun.objects.filter(created_date__gte=datetime.date(y, m, d))
-            else:
-                raise Exception('date_since requires month day and year properties')
+    startDate = None
+
+    if date_since:
+        if date_since['month'] and date_since['day'] and date_since['year']:
+            startDate = datetime.date(date_since['year'], date_since['month'], date_since['day'])
         else:
-            run_data = LighthouseRun.objects.all()
-
-        for run in run_data:
-            if include_user_timing:
-                try:
-                    user_timing_data = str(LighthouseDataUsertiming.objects.get(lighthouse_run=run).report_data)
-                except Exception as ex:
-                    user_timing_data = ''
-            else:
-                user_timing_data = ''
-            try:
-                writer.writerow([
-                    run.id,
-                    run.url.id,
-                    run.created_date,
-                    run.url.url,
-                    run.performance_score,
-                    run.total_byte_weight,
-                    run.number_network_requests,
-                    run.time_to_first_byte,
-                    run.first_contentful_paint,
-                    run.first_meaningful_paint,
-                    run.dom_content_loaded,
-                    run.dom_loaded,
-                    run.interactive,
-                    run.masthead_onscreen,
-                    run.redirect_hops,
-                    run.redirect_wasted_ms,
-                    run.url.id,
-                    user_timing_data
-                ])
-            except Exception as ex:
-                print(ex)
-
-
-def update_urls(path):
+            raise Exception('date_since requires month day and year properties')
+
+    runs = getExportRuns(startDate=startDate, includeUserTiming=include_user_timing)
+
+    columns = [name for name, field in EXPORT_COLUMNS]
+    urlIdIndex = columns.index('url_id')
+    sequenceIndex = columns.index('sequence')
+    userTimingIndex = columns.index('user_timing_data')
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+
+        for row in runs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            row = list(row)
+            row[sequenceIndex] = row[urlIdIndex]
+            row[userTimingIndex] = '' if row[userTimingIndex] is None else str(row[userTimingIndex])
+            writer.writerow(row)
+
+
+def update_urls(path, batch_size=500):
+    """
+    Re-parse the location data of the URLs in the CSV, a batch at a time.
+    """
     f = open(path, 'r')
     fields = ['url', 'page_compl_url',]
     reader = csv.DictReader(f, fieldnames=fields)
 
-    for row in reader:
-        try:
-            urlSet = Url.objects.filter(url='https://%s' % row['url'])
-            urlObj = urlSet.first()
-            urlObj.save()
-        except Exception as ex:
-            print(ex)
+    while True:
+        urls = ['https://%s' % row['url'] for row in itertools.islice(reader, batch_size)]
+
+        if not urls:
+            break
+
+        urlObjs = list(Url.getForUrls(urls).values())
+        Url.reparseBulk(urlObjs)
+        print('Updated %s of %s URLs' % (len(urlObjs), len(urls)))
 
@@ -0,0 +1,99 @@
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from report.models import Url, UrlFilter, UrlFilterPart, UrlKpiAverage
+from report.views import getDashboardCounts
+
+
+class Command(BaseCommand):
+    """
+    Measures the filter-scoped queries behind the dashboard and browse pages: latency, peak allocated
+    memory, # of queries and the longest SQL sent. With a big filter these should stay flat, since the
+    filter's URLs are only ever a subquery or join, never a Python list of IDs.
+
+    Either point it at an existing filter, or have it add --urls synthetic URLs (and KPI averages)
+    matching a synthetic filter. The synthetic data is rolled back when it's done.
+
+    Usage:
+        ./manage.py benchmark_filtered_queries --filter marketing
+        ./manage.py benchmark_filtered_queries --urls 40000
+    """
+
+    help = 'Benchmark filter-scoped dashboard and browse queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', help='UrlFilter slug to benchmark.')
+        parser.add_argument('--urls', type=int, default=10000, help='# of synthetic URLs, when no --filter is given.')
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['filter']:
+            urlFilter = UrlFilter.get_filter_safe(options['filter'])
+
+            if urlFilter is None:
+                raise CommandError('No UrlFilter with slug: %s' % options['filter'])
+
+            self.runBenchmarks(urlFilter, options['iterations'])
+            return
+
+        with transaction.atomic():
+            urlFilter = self.addSyntheticData(options['urls'])
+            self.runBenchmarks(urlFilter, options['iterations'])
+            transaction.set_rollback(True)
+
+    def addSyntheticData(self, urlCount):
+        user = User.objects.filter(is_superuser=True).first()
+
+        if user is None:
+            raise CommandError('Synthetic URLs need a superuser to be created by.')
+
+        urlFilter = UrlFilter.objects.create(name='Benchmark filter', slug='benchmark-filter')
+        UrlFilterPart.objects.create(prop='path_segment', filter_val='benchmark-filter', filter_path_index=0, url_filter=urlFilter)
+
+        batchSize = 1000
+
+        for start in range(0, urlCount, batchSize):
+            Url.bulkLoad([
+                {'url': 'https://benchmark.example.com/benchmark-filter/%s' % i}
+                for i in range(start, min(start + batchSize, urlCount))
+            ], user)
+
+        UrlKpiAverage.objects.bulk_create(
+            [UrlKpiAverage(url_id=urlId, number_samples=1, performance_score=urlId % 100) for urlId in urlFilter.run_query().values_list('id', flat=True).iterator()],
+            batch_size=batchSize
+        )
+
+        self.stdout.write('Added %s synthetic URLs' % urlFilter.run_query().count())
+
+        return urlFilter
+
+    def runBenchmarks(self, urlFilter, iterations):
+        benchmarks = (
+            ('Dashboard counts', lambda: getDashboardCounts(urlFilter)),
+            ('Browse page', lambda: list(Url.getUrls({'filter': urlFilter})[:20])),
+            ('Filtered averages', lambda: UrlKpiAverage.getFilteredAverages(urlFilter.run_query()).count()),
+        )
+
+        for name, benchmark in benchmarks:
+            timings = []
+
+            for i in range(iterations):
+                start = time.perf_counter()
+                benchmark()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            ## Memory and queries are measured on their own run, tracing slows everything down.
+            with CaptureQueriesContext(connection) as queries:
+                tracemalloc.start()
+                benchmark()
+                currentBytes, peakBytes = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            self.stdout.write('%-18s  min %8.2f ms   peak memory %8.1f KB   %s queries, longest %s chars of SQL' % (
+                name, min(timings), peakBytes / 1000, len(queries), max(len(query['sql']) for query in queries.captured_queries)
+            ))
@@ -0,0 +1,58 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from report.extract import extractReportFields, loadReportPayload
+
+
+class Command(BaseCommand):
+    """
+    Measures everything save_report does to a report POST body (or bare Lighthouse report JSON file)
+    before it hits the database: decode, KPI extraction, and serializing the report for the INSERT
+    if it didn't come in as a JSON string. Reports latency and peak allocated memory, so changes to
+    report/extract.py can be compared before/after on real reports.
+
+    Usage:
+        ./manage.py benchmark_report_extraction /path/to/report.json --iterations 50
+    """
+
+    help = 'Benchmark report decode + KPI extraction latency and peak memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Report POST body or Lighthouse report JSON file.')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as f:
+            rawData = f.read()
+
+        timings = []
+
+        for i in range(options['iterations']):
+            start = time.perf_counter()
+            self.prepareReport(rawData)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        ## Memory is measured on its own run, tracing slows everything down.
+        tracemalloc.start()
+        reportFields = self.prepareReport(rawData)
+        currentBytes, peakBytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write('Input size:      %.2f MB' % (len(rawData) / 1000000))
+        self.stdout.write('Latency median:  %.2f ms' % statistics.median(timings))
+        self.stdout.write('Latency max:     %.2f ms' % max(timings))
+        self.stdout.write('Peak memory:     %.2f MB (%.1fx input)' % (peakBytes / 1000000, peakBytes / len(rawData)))
+        self.stdout.write('Fields:          %s' % reportFields.run)
+
+    def prepareReport(self, rawData):
+        reportData, reportJson = loadReportPayload(rawData)
+        reportFields = extractReportFields(reportData)
+
+        if reportJson is None:
+            json.dumps(reportData)
+
+        return reportFields
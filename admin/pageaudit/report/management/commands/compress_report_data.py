@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from report.models import LighthouseDataRaw, ReportChunk
+
+
+class Command(BaseCommand):
+    """
+    Convert stored raw Lighthouse reports to the compressed, chunked format (see report/storage.py),
+    or back with --decompress. Rows are converted in ID order, one batch per transaction,
+    so it can be stopped and re-run at any time.
+
+    Usage:
+        ./manage.py compress_report_data
+        ./manage.py compress_report_data --decompress --batch-size 50
+    """
+
+    help = 'Convert raw Lighthouse reports to (or from) compressed, chunked storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--decompress', action='store_true',
+                            help='Convert compressed reports back to plain JSON.')
+
+    def handle(self, *args, **options):
+        compress = not options['decompress']
+        rows = LighthouseDataRaw.objects.filter(report_data_compressed__isnull=compress).order_by('id')
+
+        ## Rows with no report at all have nothing to convert.
+        if compress:
+            rows = rows.filter(report_data__isnull=False)
+
+        lastId = 0
+        converted = 0
+
+        while True:
+            batch = list(rows.filter(id__gt=lastId)[:options['batch_size']])
+
+            if not batch:
+                break
+
+            with transaction.atomic():
+                chunks = {}
+
+                for rawData in batch:
+                    chunks.update(rawData.setReportData(rawData.getReportData(), compressed=compress))
+
+                ReportChunk.saveChunks(chunks)
+
+                for rawData in batch:
+                    rawData.save(update_fields=['report_data', 'report_data_compressed'])
+
+            lastId = batch[-1].id
+            converted += len(batch)
+            self.stdout.write('Converted %s reports...' % converted)
+
+        self.stdout.write(self.style.SUCCESS('Converted %s reports.' % converted))
@@ -0,0 +1,64 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from report.export import EXPORT_FORMATS, exportLines, getExportRuns
+from report.helpers import parseDateParam
+from report.models import UrlFilter
+
+
+class Command(BaseCommand):
+    """
+    Export LighthouseRuns (with their URL and, optionally, user-timing data) as CSV or NDJSON.
+    Streams from a server-side cursor, so memory use stays flat however many runs there are.
+
+    Usage:
+        ./manage.py export_runs runs.csv --start-date 2018-01-01 --end-date 2018-12-31
+        ./manage.py export_runs - --format ndjson --filter marketing --user-timing | gzip > runs.ndjson.gz
+    """
+
+    help = 'Export Lighthouse runs as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write, or - for stdout.')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--start-date', help='YYYY-MM-DD, inclusive.')
+        parser.add_argument('--end-date', help='YYYY-MM-DD, inclusive.')
+        parser.add_argument('--filter', help='UrlFilter slug, to only export runs of it\'s URLs.')
+        parser.add_argument('--user-timing', action='store_true', help='Include each run\'s user-timing data.')
+
+    def handle(self, *args, **options):
+        urlFilter = None
+
+        if options['filter']:
+            urlFilter = UrlFilter.get_filter_safe(options['filter'])
+
+            if urlFilter is None:
+                raise CommandError('No UrlFilter with slug: %s' % options['filter'])
+
+        runs = getExportRuns(
+            startDate = self.getDate(options['start_date']),
+            endDate = self.getDate(options['end_date']),
+            urlFilter = urlFilter,
+            includeUserTiming = options['user_timing'],
+        )
+
+        out = sys.stdout if options['path'] == '-' else open(options['path'], 'w', newline='')
+        lineCount = 0
+
+        try:
+            for line in exportLines(runs, options['format']):
+                out.write(line)
+                lineCount += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if out is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS('Wrote %s lines to %s' % (lineCount, options['path'])))
+
+    def getDate(self, value):
+        try:
+            return parseDateParam(value)
+        except ValueError as ex:
+            raise CommandError(str(ex))
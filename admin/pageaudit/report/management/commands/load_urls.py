@@ -0,0 +1,107 @@
+import csv
+import itertools
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from report.import_csv import field_names
+from report.models import Url, UrlOwner
+
+
+class Command(BaseCommand):
+    """
+    Bulk load a CSV of URLs. The file is streamed and loaded in batches, each with a fixed # of queries
+    (see Url.bulkLoad), so big catalogues load in minutes instead of hours.
+    URLs that are already in the list are skipped, or have their sequence/owner updated with --update.
+
+    By default columns are the catalogue export's: url, url2, views, hist, sequence (no header row).
+    Use --header if the file has a header row with 'url' and optional 'sequence' and 'owner' columns.
+    URLs without a scheme get --scheme added (https by default).
+
+    Usage:
+        ./manage.py load_urls /path/to/urls.csv
+        ./manage.py load_urls /path/to/urls.csv --header --update --owner "IBM Marketing"
+    """
+
+    help = 'Bulk load a CSV of URLs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file of URLs.')
+        parser.add_argument('--header', action='store_true',
+                            help='The first row is a header with the column names.')
+        parser.add_argument('--scheme', default='https',
+                            help='Scheme to add to URLs that don\'t have one.')
+        parser.add_argument('--owner', help='UrlOwner name for rows without an owner column.')
+        parser.add_argument('--update', action='store_true',
+                            help='Update sequence/owner of URLs that already exist.')
+        parser.add_argument('--user', help='Username to save the URLs as. Defaults to the first superuser.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        user = self.getUser(options['user'])
+        self.owners = {}
+        defaultOwner = self.getOwner(options['owner'])
+
+        created = 0
+        updated = 0
+        total = 0
+        start = time.perf_counter()
+
+        with open(options['path'], 'r', newline='') as f:
+            reader = csv.DictReader(f, fieldnames=None if options['header'] else field_names)
+
+            while True:
+                rows = [
+                    self.getRow(row, options['scheme'], defaultOwner)
+                    for row in itertools.islice(reader, options['batch_size']) if (row.get('url') or '').strip()
+                ]
+
+                if not rows:
+                    break
+
+                batchCreated, batchUpdated = Url.bulkLoad(rows, user, updateExisting=options['update'])
+                created += batchCreated
+                updated += batchUpdated
+                total += len(rows)
+
+                self.stdout.write('%s rows, %.0f rows/sec...' % (total, total / (time.perf_counter() - start)))
+
+        self.stdout.write(self.style.SUCCESS('Loaded %s rows in %.1f sec (%.0f rows/sec): %s created, %s updated.' % (
+            total, time.perf_counter() - start, total / max(time.perf_counter() - start, 0.001), created, updated
+        )))
+
+    def getUser(self, username):
+        try:
+            if username:
+                return User.objects.get(username=username)
+
+            return User.objects.filter(is_superuser=True).order_by('id')[:1].get()
+        except User.DoesNotExist:
+            raise CommandError('User not found. Pass an existing --user.')
+
+    def getOwner(self, name):
+        if not name:
+            return None
+
+        if name not in self.owners:
+            self.owners[name] = UrlOwner.objects.filter(owner_name=name).first() or UrlOwner.objects.create(owner_name=name)
+
+        return self.owners[name]
+
+    def getRow(self, row, scheme, defaultOwner):
+        url = row['url'].strip()
+
+        if '://' not in url:
+            url = '%s://%s' % (scheme, url)
+
+        try:
+            sequence = int(row.get('sequence') or 0)
+        except ValueError:
+            sequence = 0
+
+        return {
+            'url': url,
+            'sequence': sequence,
+            'owner': self.getOwner((row.get('owner') or '').strip()) or defaultOwner,
+        }
@@ -0,0 +1,79 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from report.models import ReportDeadLetter, ReportQueueItem
+
+
+class Command(BaseCommand):
+    """
+    Consumer for the async report queue (see DJANGO_REPORT_INGEST_ASYNC in settings).
+    Runs 1 or more worker processes that each claim batches of queued report POSTs and save them.
+
+    Usage:
+        ./manage.py process_report_queue --workers 4
+        ./manage.py process_report_queue --once
+        ./manage.py process_report_queue --requeue-dead-letters
+    """
+
+    help = 'Process queued report POSTs. Runs until stopped, unless --once is passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='# of worker processes to run.')
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help='# of queued reports each worker claims at a time.')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Attempts before a report is moved to the dead letter table.')
+        parser.add_argument('--retry-delay', type=int, default=60,
+                            help='Seconds to wait before a retry, multiplied by the attempt #.')
+        parser.add_argument('--sleep', type=float, default=2,
+                            help='Seconds a worker waits when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Stop once the queue is empty instead of waiting for more.')
+        parser.add_argument('--requeue-dead-letters', action='store_true',
+                            help='Move all dead letters back into the queue, then exit.')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead_letters']:
+            requeued = ReportDeadLetter.requeueAll()
+            self.stdout.write(self.style.SUCCESS('Re-queued %s dead letters.' % requeued))
+            return
+
+        if options['workers'] <= 1:
+            self.runWorker(options)
+            return
+
+        ## Forked workers can't share the parent's DB connection, so drop it before forking.
+        connections.close_all()
+
+        workers = [multiprocessing.Process(target=self.runWorker, args=(options,)) for i in range(options['workers'])]
+
+        for worker in workers:
+            worker.start()
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    def runWorker(self, options):
+        while True:
+            processed, failed = ReportQueueItem.processBatch(
+                batchSize=options['batch_size'],
+                maxAttempts=options['max_attempts'],
+                retryDelay=options['retry_delay'],
+            )
+
+            if processed or failed:
+                self.stdout.write('[%s] Processed %s, failed %s' % (multiprocessing.current_process().name, processed, failed))
+                continue
+
+            if options['once']:
+                return
+
+            time.sleep(options['sleep'])
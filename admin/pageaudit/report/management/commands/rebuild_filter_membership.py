@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from report.models import UrlFilter
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the materialized UrlFilterMembership rows, for every UrlFilter or just one.
+    Membership is kept current as URLs and filter parts are saved, so only run this after
+    bulk edits that skip model saves (i.e. deleting filter parts from the admin list page, or SQL).
+
+    Usage:
+        ./manage.py rebuild_filter_membership
+        ./manage.py rebuild_filter_membership --filter marketing
+    """
+
+    help = 'Rebuild which URLs each UrlFilter matches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', help='UrlFilter slug, to only rebuild that filter.')
+
+    def handle(self, *args, **options):
+        if options['filter']:
+            urlFilter = UrlFilter.get_filter_safe(options['filter'])
+
+            if urlFilter is None:
+                raise CommandError('No UrlFilter with slug: %s' % options['filter'])
+
+            urlFilter.rebuildMembership()
+            filterCount = 1
+        else:
+            filterCount = UrlFilter.rebuildAllMemberships()
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt the URL membership of %s filters' % filterCount))
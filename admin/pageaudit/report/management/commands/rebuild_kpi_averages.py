@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from report.models import UrlKpiAverage, UserTimingMeasureAverage
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the UrlKpiAverage running totals and averages from the LighthouseRun history,
+    and the UserTimingMeasureAverage ones from the UserTimingMeasure history.
+    Use when the stored totals have drifted (runs deleted/edited by hand, failed ingests, etc).
+
+    Usage:
+        ./manage.py rebuild_kpi_averages
+        ./manage.py rebuild_kpi_averages --url-id 12 --url-id 34
+    """
+
+    help = 'Rebuild URL KPI and user-timing running totals from the run history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url-id', action='append', type=int, dest='url_ids',
+                            help='Only rebuild this URL ID. Can be used more than once.')
+
+    def handle(self, *args, **options):
+        rebuilt = UrlKpiAverage.rebuildFromRuns(urlIds=options['url_ids'])
+        rebuiltTimings = UserTimingMeasureAverage.rebuildFromMeasures(urlIds=options['url_ids'])
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt KPI averages for %s URLs, and %s user-timing averages.' % (rebuilt, rebuiltTimings)))
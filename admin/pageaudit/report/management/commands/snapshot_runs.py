@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from report.helpers import parseDateParam
+from report.snapshots import getLastRunId, getSnapshotDir, writeSnapshot
+
+
+class Command(BaseCommand):
+    """
+    Append new LighthouseRuns and their user-timing measures to the columnar Arrow snapshot,
+    one partition per day, and rewrite its URL list. Only runs newer than the last snapshot and
+    created before --until (default today) are written, so run it once a day.
+    Read the snapshot with report.snapshots.SnapshotReader.
+
+    Usage:
+        ./manage.py snapshot_runs
+        ./manage.py snapshot_runs --path /data/pagelab-snapshots
+    """
+
+    help = 'Append new Lighthouse runs to the columnar (Arrow) snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Snapshot directory. Defaults to the REPORT_SNAPSHOT_DIR setting.')
+        parser.add_argument('--until', help='YYYY-MM-DD, exclusive. Defaults to today.')
+
+    def handle(self, *args, **options):
+        root = getSnapshotDir(options['path'])
+
+        try:
+            until = parseDateParam(options['until'])
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        lastRunId = getLastRunId(root)
+        runCount, partCount, urlCount = writeSnapshot(root, until)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %s runs (after run %s) in %s parts, and %s URLs, to %s' % (runCount, lastRunId, partCount, urlCount, root)
+        ))
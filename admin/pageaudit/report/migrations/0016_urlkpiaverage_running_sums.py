@@ -0,0 +1,134 @@
+# Generated by Django 2.0.8 on 2026-10-17 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+KPI_AVERAGE_FIELDS = (
+    'accessibility_score',
+    'dom_content_loaded',
+    'dom_loaded',
+    'first_contentful_paint',
+    'first_meaningful_paint',
+    'interactive',
+    'masthead_onscreen',
+    'number_network_requests',
+    'performance_score',
+    'redirect_wasted_ms',
+    'time_to_first_byte',
+    'total_byte_weight',
+)
+
+
+def populate_running_sums(apps, schema_editor):
+    """
+    Seed the new running totals from the existing valid run history.
+    """
+    LighthouseRun = apps.get_model('report', 'LighthouseRun')
+    UrlKpiAverage = apps.get_model('report', 'UrlKpiAverage')
+
+    sums = {'%s_sum' % field: Sum(field) for field in KPI_AVERAGE_FIELDS}
+
+    urlTotals = LighthouseRun.objects.filter(
+        number_network_requests__gt=1, performance_score__gt=5, invalid_run=False
+    ).order_by().values('url').annotate(
+        total_samples=Count('id'),
+        total_seo_samples=Count('id', filter=Q(seo_score__gt=0)),
+        seo_score_sum=Sum('seo_score'),
+        **sums
+    )
+
+    for totals in urlTotals.iterator():
+        values = {
+            'number_samples': totals['total_samples'],
+            'seo_number_samples': totals['total_seo_samples'],
+            'seo_score_sum': totals['seo_score_sum'] or 0,
+        }
+
+        for field in KPI_AVERAGE_FIELDS:
+            values['%s_sum' % field] = totals['%s_sum' % field] or 0
+
+        UrlKpiAverage.objects.filter(url_id=totals['url']).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    ## Also merges the two 0012 branches.
+    dependencies = [
+        ('report', '0012_auto_20181109_1225'),
+        ('report', '0015_auto_20181130_1123'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='seo_number_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='accessibility_score_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='dom_content_loaded_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='dom_loaded_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='first_contentful_paint_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='first_meaningful_paint_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='interactive_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='masthead_onscreen_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='number_network_requests_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='performance_score_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='redirect_wasted_ms_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='seo_score_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='time_to_first_byte_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlkpiaverage',
+            name='total_byte_weight_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_running_sums, migrations.RunPython.noop),
+    ]
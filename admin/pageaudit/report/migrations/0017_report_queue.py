@@ -0,0 +1,47 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0016_urlkpiaverage_running_sums'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDeadLetter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('queued_date', models.DateTimeField()),
+                ('raw_data', models.BinaryField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportQueueItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('modified_date', models.DateTimeField(auto_now=True)),
+                ('available_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('raw_data', models.BinaryField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['available_date', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reportqueueitem',
+            index=models.Index(fields=['available_date', 'id'], name='report_repo_availab_3ce5ec_idx'),
+        ),
+    ]
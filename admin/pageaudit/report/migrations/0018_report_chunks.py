@@ -0,0 +1,33 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:43
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0017_report_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('hash', models.CharField(max_length=64, unique=True)),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lighthousedataraw',
+            name='report_data_compressed',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='lighthousedataraw',
+            name='report_data',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:44
+
+import base64
+import binascii
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 500
+
+
+def move_thumbnails(apps, schema_editor):
+    """
+    Copy the base64 thumbnails off the LighthouseRun rows into LighthouseRunThumbnail as JPEG bytes.
+    """
+    LighthouseRun = apps.get_model('report', 'LighthouseRun')
+    LighthouseRunThumbnail = apps.get_model('report', 'LighthouseRunThumbnail')
+
+    runs = LighthouseRun.objects.exclude(thumbnail_image__isnull=True).exclude(thumbnail_image='').order_by().values_list('id', 'thumbnail_image')
+    thumbnails = []
+
+    for runId, thumbnail in runs.iterator(chunk_size=BATCH_SIZE):
+        try:
+            thumbnails.append(LighthouseRunThumbnail(lighthouse_run_id=runId, image=base64.b64decode(thumbnail, validate=True)))
+        except (binascii.Error, ValueError):
+            continue
+
+        if len(thumbnails) >= BATCH_SIZE:
+            LighthouseRunThumbnail.objects.bulk_create(thumbnails)
+            thumbnails = []
+
+    LighthouseRunThumbnail.objects.bulk_create(thumbnails)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0018_report_chunks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LighthouseRunThumbnail',
+            fields=[
+                ('lighthouse_run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lighthouse_run_thumbnail_lighthouse_run', serialize=False, to='report.LighthouseRun')),
+                ('image', models.BinaryField()),
+            ],
+        ),
+        migrations.RunPython(move_thumbnails, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='lighthouserun',
+            name='thumbnail_image',
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:46
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def dedupe_names_and_rebuild_averages(apps, schema_editor):
+    """
+    Merge duplicate UserTimingMeasureNames (from get_or_create races) into the oldest one,
+    then rebuild every UserTimingMeasureAverage, with the new running totals, from the measures
+    of runs that weren't 4xx/5xx. Clears out duplicate URL + name averages too.
+    """
+    UserTimingMeasureName = apps.get_model('report', 'UserTimingMeasureName')
+    UserTimingMeasure = apps.get_model('report', 'UserTimingMeasure')
+    UserTimingMeasureAverage = apps.get_model('report', 'UserTimingMeasureAverage')
+
+    duplicates = UserTimingMeasureName.objects.order_by().values('name').annotate(keepId=Min('id'), total=Count('id')).filter(total__gt=1)
+
+    for duplicate in duplicates:
+        dupeIds = UserTimingMeasureName.objects.filter(name=duplicate['name']).exclude(id=duplicate['keepId']).values_list('id', flat=True)
+        UserTimingMeasure.objects.filter(name_id__in=list(dupeIds)).update(name_id=duplicate['keepId'])
+        UserTimingMeasureName.objects.filter(id__in=list(dupeIds)).delete()
+
+    totals = UserTimingMeasure.objects.filter(lighthouse_run__invalid_run=False).order_by().values('url', 'name').annotate(
+        samples=Count('id'),
+        durationSum=Sum('duration'),
+        startTimeSum=Sum('start_time'),
+    )
+
+    UserTimingMeasureAverage.objects.all().delete()
+    UserTimingMeasureAverage.objects.bulk_create([
+        UserTimingMeasureAverage(
+            url_id = total['url'],
+            name_id = total['name'],
+            number_samples = total['samples'],
+            duration_sum = total['durationSum'],
+            start_time_sum = total['startTimeSum'],
+            duration = (2 * total['durationSum'] + total['samples']) // (2 * total['samples']),
+            start_time = (2 * total['startTimeSum'] + total['samples']) // (2 * total['samples']),
+        ) for total in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0019_lighthouse_run_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertimingmeasureaverage',
+            name='duration_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usertimingmeasureaverage',
+            name='start_time_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(dedupe_names_and_rebuild_averages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0020_user_timing_running_sums'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usertimingmeasurename',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='usertimingmeasureaverage',
+            unique_together={('url', 'name')},
+        ),
+    ]
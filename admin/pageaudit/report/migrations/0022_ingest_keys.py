@@ -0,0 +1,23 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0021_user_timing_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lighthouserun',
+            name='ingest_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='reportqueueitem',
+            name='ingest_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
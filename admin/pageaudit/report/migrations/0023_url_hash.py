@@ -0,0 +1,81 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:49
+
+import hashlib
+import logging
+import uuid
+from urllib import parse
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+
+def get_url_hash(url):
+    """
+    Frozen copy of report.helpers.getUrlHash (and normalizeUrl), as it was when url_hash was added.
+    The migration has to hash URLs the same way even if the helpers change later.
+    """
+    loc = parse.urlsplit(url.strip())
+    scheme = loc.scheme.lower()
+    netloc = loc.netloc.lower()
+
+    try:
+        if (scheme, loc.port) in (('http', 80), ('https', 443)):
+            netloc = netloc.rsplit(':', 1)[0]
+    except ValueError:
+        pass
+
+    normalized = parse.urlunsplit((scheme, netloc, loc.path.rstrip('/'), loc.query, loc.fragment))
+
+    return uuid.UUID(bytes=hashlib.md5(normalized.encode('utf-8')).digest())
+
+
+def populate_url_hashes(apps, schema_editor):
+    """
+    Hash every existing URL, in one UPDATE. If 2 URLs normalize to the same thing, only the oldest gets
+    the hash. The others keep matching on their exact URL (see Url.getForUrl), and are logged here
+    so they can be merged by hand.
+    """
+    Url = apps.get_model('report', 'Url')
+    ids = []
+    hashes = []
+    seen = {}
+
+    for urlId, url in Url.objects.order_by('id').values_list('id', 'url').iterator():
+        urlHash = get_url_hash(url)
+
+        if urlHash in seen:
+            logger.warning('Duplicate URL %s (%s), same as %s (%s)', urlId, url, *seen[urlHash])
+            continue
+
+        seen[urlHash] = (urlId, url)
+        ids.append(urlId)
+        hashes.append(str(urlHash))
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE %s SET url_hash = hashes.url_hash FROM unnest(%%s::integer[], %%s::uuid[]) AS hashes (id, url_hash) '
+            'WHERE %s.id = hashes.id' % (Url._meta.db_table, Url._meta.db_table),
+            [ids, hashes]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0022_ingest_keys'),
+    ]
+
+    operations = [
+        ## 'url' is unique, so it's already got an index. This one was a 2nd copy.
+        migrations.RemoveIndex(
+            model_name='url',
+            name='report_url_url_d2ecf9_idx',
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='url_hash',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_url_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0023_url_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='url',
+            name='url_hash',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
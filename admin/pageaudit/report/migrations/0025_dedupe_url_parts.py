@@ -0,0 +1,51 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:50
+
+from django.db import migrations
+
+
+def dedupe(schema_editor, model, m2mField, fields):
+    """
+    Point every Url linked to a duplicate row at the oldest copy, then delete the duplicates.
+    """
+    through = m2mField.remote_field.through
+    table = model._meta.db_table
+    throughTable = through._meta.db_table
+    column = m2mField.m2m_reverse_name()
+    urlColumn = m2mField.m2m_column_name()
+    keepers = 'SELECT id, min(id) OVER (PARTITION BY %s) AS keep_id FROM %s' % (', '.join(fields), table)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO {through} ({urlColumn}, {column})
+            SELECT DISTINCT t.{urlColumn}, k.keep_id FROM {through} t JOIN ({keepers}) k ON k.id = t.{column}
+            WHERE k.id <> k.keep_id
+            ON CONFLICT DO NOTHING
+        """.format(through=throughTable, column=column, urlColumn=urlColumn, keepers=keepers))
+
+        cursor.execute("""
+            DELETE FROM {through} t USING ({keepers}) k
+            WHERE k.id = t.{column} AND k.id <> k.keep_id
+        """.format(through=throughTable, column=column, urlColumn=urlColumn, keepers=keepers))
+
+        cursor.execute("""
+            DELETE FROM {table} p USING ({keepers}) k
+            WHERE k.id = p.id AND k.id <> k.keep_id
+        """.format(table=table, keepers=keepers))
+
+
+def dedupe_url_parts(apps, schema_editor):
+    Url = apps.get_model('report', 'Url')
+
+    dedupe(schema_editor, apps.get_model('report', 'UrlPath'), Url._meta.get_field('url_paths'), ('path', 'sequence'))
+    dedupe(schema_editor, apps.get_model('report', 'SearchKeyVal'), Url._meta.get_field('search_key_vals'), ('key', 'val'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0024_url_hash_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_url_parts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.0.8 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0025_dedupe_url_parts'),
+    ]
+
+    ## The unique constraints index the same columns as the removed indexes.
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchkeyval',
+            name='report_sear_key_8430fe_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='urlpath',
+            name='report_urlp_path_94a9ef_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchkeyval',
+            unique_together={('key', 'val')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='urlpath',
+            unique_together={('path', 'sequence')},
+        ),
+    ]
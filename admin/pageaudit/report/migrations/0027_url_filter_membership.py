@@ -0,0 +1,67 @@
+# Generated by Django 2.0.8 on 2026-10-17 20:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def get_part_query(part):
+    """
+    Same as UrlFilter.make_query_object, as of this migration.
+    """
+    if part.prop == 'path_segment':
+        if part.filter_path_index is not None:
+            return {'url_paths__sequence': part.filter_path_index, 'url_paths__path': part.filter_val}
+
+        return {'url_paths__path': part.filter_val}
+    elif part.prop == 'search_key':
+        return {}
+
+    return {part.prop: part.filter_val}
+
+
+def build_memberships(apps, schema_editor):
+    Url = apps.get_model('report', 'Url')
+    UrlFilter = apps.get_model('report', 'UrlFilter')
+    UrlFilterPart = apps.get_model('report', 'UrlFilterPart')
+    UrlFilterMembership = apps.get_model('report', 'UrlFilterMembership')
+
+    for urlFilter in UrlFilter.objects.all():
+        condition = models.Q()
+
+        for part in UrlFilterPart.objects.filter(url_filter=urlFilter):
+            condition.add(models.Q(**get_part_query(part)), models.Q.AND)
+
+        sql, params = Url.objects.filter(condition).distinct().order_by().values('id').query.sql_with_params()
+
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (url_filter_id, url_id) SELECT %%s, matches.id FROM (%s) matches' % (UrlFilterMembership._meta.db_table, sql),
+                [urlFilter.id] + list(params)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0026_url_parts_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UrlFilterMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='url_filter_membership_url', to='report.Url')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='urlfiltermembership',
+            name='url_filter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='url_filter_membership_url_filter', to='report.UrlFilter'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='urlfiltermembership',
+            unique_together={('url_filter', 'url')},
+        ),
+        migrations.RunPython(build_memberships, migrations.RunPython.noop),
+    ]
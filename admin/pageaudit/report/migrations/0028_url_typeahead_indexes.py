@@ -0,0 +1,30 @@
+# Generated by Django 2.0.8 on 2026-10-17 20:40
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0027_url_filter_membership'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        ## Prefix matches (url LIKE 'foo%'), whatever the database's collation.
+        migrations.RunSQL(
+            'CREATE INDEX report_url_url_pattern_idx ON report_url (url varchar_pattern_ops)',
+            'DROP INDEX report_url_url_pattern_idx',
+        ),
+        ## Substring matches (url LIKE '%foo%').
+        migrations.RunSQL(
+            'CREATE INDEX report_url_url_trgm_idx ON report_url USING gin (url gin_trgm_ops)',
+            'DROP INDEX report_url_url_trgm_idx',
+        ),
+        ## Host matches, ranked ahead of other substring matches.
+        migrations.RunSQL(
+            'CREATE INDEX report_url_hostname_trgm_idx ON report_url USING gin (hostname gin_trgm_ops)',
+            'DROP INDEX report_url_hostname_trgm_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.0.8 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0028_url_typeahead_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lighthouserun',
+            index=models.Index(fields=['url', 'created_date'], name='report_ligh_url_id_740343_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.8 on 2026-10-17 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0029_lighthouserun_url_created_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportdeadletter',
+            name='ingest_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.0.8 on 2026-10-17 21:10
+
+from django.db import migrations
+
+
+def dedupe_null_vals(apps, schema_editor):
+    """
+    unique_together ('key', 'val') doesn't stop duplicate (key, NULL) rows, NULLs are never equal.
+    Point every Url linked to a duplicate at the oldest copy, then delete the duplicates.
+    """
+    Url = apps.get_model('report', 'Url')
+    m2mField = Url._meta.get_field('search_key_vals')
+    table = apps.get_model('report', 'SearchKeyVal')._meta.db_table
+    throughTable = m2mField.remote_field.through._meta.db_table
+    column = m2mField.m2m_reverse_name()
+    urlColumn = m2mField.m2m_column_name()
+    keepers = 'SELECT id, min(id) OVER (PARTITION BY key) AS keep_id FROM %s WHERE val IS NULL' % table
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO {through} ({urlColumn}, {column})
+            SELECT DISTINCT t.{urlColumn}, k.keep_id FROM {through} t JOIN ({keepers}) k ON k.id = t.{column}
+            WHERE k.id <> k.keep_id
+            ON CONFLICT DO NOTHING
+        """.format(through=throughTable, column=column, urlColumn=urlColumn, keepers=keepers))
+
+        cursor.execute("""
+            DELETE FROM {through} t USING ({keepers}) k
+            WHERE k.id = t.{column} AND k.id <> k.keep_id
+        """.format(through=throughTable, column=column, keepers=keepers))
+
+        cursor.execute("""
+            DELETE FROM {table} p USING ({keepers}) k
+            WHERE k.id = p.id AND k.id <> k.keep_id
+        """.format(table=table, keepers=keepers))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0030_reportdeadletter_ingest_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_null_vals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.8 on 2026-10-17 21:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0031_dedupe_search_key_vals'),
+    ]
+
+    operations = [
+        ## Django 2.0 can't declare a conditional unique constraint, so it's plain SQL.
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX report_searchkeyval_key_null_val_uniq ON report_searchkeyval (key) WHERE val IS NULL',
+            'DROP INDEX report_searchkeyval_key_null_val_uniq',
+        ),
+    ]
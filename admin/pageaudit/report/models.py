@@ -1,13 +1,45 @@
+import base64
+import datetime
 import json
+from functools import lru_cache
 from urllib import parse
 
 from django.contrib.postgres.fields import JSONField
 from django.contrib.auth.models import User, Group
-from django.db import models
-from django.db.models import Avg, Max, Min, Q, Sum, F
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum, F
+from django.db.models.functions import Cast
+from django.urls import reverse
+from django.utils import timezone
 from collections import namedtuple
 
+from .cards import cacheReportCardsOnCommit
+from .extract import extractReportFields, getReportFromPayload, loadReportPayload
 from .helpers import *
+from .storage import compressJson, decompressJson, getChunkHashes, joinReport, splitReport
+
+
+## LighthouseRun KPI fields that have a stored running average in UrlKpiAverage.
+## SEO is kept out of here on purpose: it's newer, so it's only averaged over runs that have one.
+KPI_AVERAGE_FIELDS = (
+    'accessibility_score',
+    'dom_content_loaded',
+    'dom_loaded',
+    'first_contentful_paint',
+    'first_meaningful_paint',
+    'interactive',
+    'masthead_onscreen',
+    'number_network_requests',
+    'performance_score',
+    'redirect_wasted_ms',
+    'time_to_first_byte',
+    'total_byte_weight',
+)
+
+## Shortest URL typeahead text that's searched for anywhere in the URL. pg_trgm can't index anything shorter.
+TYPEAHEAD_MIN_SUBSTRING = 3
 
 
 ## Custom Url object filters mapped to functions.
@@ -84,6 +116,10 @@ class LighthouseRun(models.Model):
     lighthouse_error_code = models.CharField(max_length=255, blank=True, null=True)
     lighthouse_error_msg = models.TextField(blank=True, null=True)
 
+    ## Hash of the report POST (or the client's idempotency key) this run was saved from.
+    ## Unique, so a re-sent report can't be saved twice. See helpers.getIngestKey.
+    ingest_key = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
+
     ## KPIs go in here for quick, single relationship query and sorting from parent URL.
     ## This is like the ledger line for a run, containing quick-accessable fields we need.
     ## Shit is WAY faster with this here now.
@@ -103,7 +139,6 @@ class LighthouseRun(models.Model):
     redirect_hops = models.PositiveIntegerField(default=0)
     redirect_wasted_ms = models.PositiveIntegerField(default=0)
     seo_score = models.PositiveIntegerField(default=0)
-    thumbnail_image = models.TextField(blank=True, null=True)
     time_to_first_byte = models.PositiveIntegerField(default=0)
     total_byte_weight = models.PositiveIntegerField(default=0)
 
@@ -119,11 +154,54 @@ class LighthouseRun(models.Model):
         indexes = [
             models.Index(fields=['created_date',]),
             models.Index(fields=['url',]),
+            ## A URL's runs in date order, for the chart and table date ranges.
+            models.Index(fields=['url', 'created_date',]),
         ]
 
     def __str__(self):
         return 'perf: %s - requests: %s' % (self.performance_score, self.number_network_requests,)
 
+    def isValidRun(self):
+        """
+        In-memory version of the validRuns() queryset filter, for a run we already have loaded.
+        """
+        return self.number_network_requests > 1 and self.performance_score > 5 and not self.invalid_run
+
+    def thumbnailUrl(self):
+        return reverse('plr:reports_thumbnail', kwargs={'id': self.id})
+
+
+class LighthouseRunThumbnail(models.Model):
+    """
+    Screenshot thumbnail of the page for a LighthouseRun, as JPEG bytes.
+    Kept out of the LighthouseRun row so the browse/chart/table queries don't drag it around,
+    and served by the /report/thumb/<run id>.jpg view instead of being inlined in the HTML.
+    """
+
+    lighthouse_run = models.OneToOneField('LighthouseRun',
+                                          primary_key=True,
+                                          related_name='lighthouse_run_thumbnail_lighthouse_run',
+                                          on_delete=models.CASCADE)
+    image = models.BinaryField()
+
+    def __str__(self):
+        return "%s" % (self.lighthouse_run_id,)
+
+    @classmethod
+    def fromBase64(cls, run, thumbnail):
+        """
+        Unsaved thumbnail for the run from the report's base64 screenshot, or None if there isn't a usable one.
+        """
+        try:
+            image = base64.b64decode(thumbnail, validate=True)
+        except (TypeError, ValueError):
+            return None
+
+        if not image:
+            return None
+
+        return cls(lighthouse_run=run, image=image)
+
 
 class UrlOwner(models.Model):
     """
@@ -161,6 +239,11 @@ class Url(models.Model):
                                   on_delete=models.PROTECT)
 
     url = models.URLField(unique=True)
+
+    ## Hash of the normalized URL, for fast lookups that also match trailing-slash/case variants.
+    ## See helpers.normalizeUrl and Url.getForUrl.
+    url_hash = models.UUIDField(unique=True, blank=True, null=True, editable=False)
+
     lighthouse_run = models.ForeignKey('LighthouseRun',
                                        related_name='url_lighthouse_run',
                                        on_delete=models.SET_NULL,
@@ -201,65 +284,266 @@ class Url(models.Model):
     class Meta:
         ordering = ['url']
 
-        indexes = [
-            models.Index(fields=['url',]),
-        ]
-
     def __str__(self):
         return "%s" % (self.url,)
 
+    def clean(self):
+        duplicate = Url.objects.filter(url_hash=getUrlHash(self.url)).exclude(id=self.id).first()
+
+        if duplicate is not None:
+            raise ValidationError({'url': 'This URL is already in the list as: %s' % duplicate.url})
+
     def save(self, *args, **kwargs):
         """
         Override save to populate the location data.
+        Only re-parses when the URL changed, and then takes a fixed # of queries, however long the URL is.
         """
-        if self.url != self.parsed_url:
-            # We parse the url and save each location bit
-            loc = parse.urlparse(self.url)
-            self.protocol = loc.scheme
-            self.host = loc.netloc
-            self.hostname = loc.hostname
-            self.port = loc.port
-            self.pathname = loc.path
-            self.search = loc.query
-            self.hash = loc.fragment
-            self.origin = '%s://%s' % (loc.scheme, loc.netloc,)
-            self.parsed_url = self.url
-
-            super(Url, self).save(*args, **kwargs) # save this now
-            # replace any existing SearchKeyVal and UrlPath objects in m2m
-            self.url_paths.all().delete()
-            self.search_key_vals.all().delete()
-            # now re-save them
-            pathSegments = loc.path.split('/')
-            i = 0
-            for seg in pathSegments:
-                if seg is not '':
-                    path = UrlPath.objects.create(sequence=i, path=seg)
-                    self.url_paths.add(path)
-                    i = i + 1
-            self.save() # save added m2m records
-
-            for query in loc.query.split('&'):
-                kv = query.split('=')
-                try:
-                    key = kv[0]
-                except:
-                    continue
-                try:
-                    val = kv[1]
-                except:
-                    val = None
-                search_key = SearchKeyVal.objects.create(key=key, val=val)
-                self.search_key_vals.add(search_key)
-            self.save() # save added m2m records
-        else:
-            super(Url, self).save(*args, **kwargs)
+        urlHash = getUrlHash(self.url)
 
-    def getUrls(options):
+        ## Urls added before url_hash existed, that normalize the same as another Url, don't get a hash
+        ##  (see migration 0023). They keep matching on their exact URL only, and can still be saved.
+        if urlHash != self.url_hash and not (self.url_hash is None and self.id is not None and Url.isHashTaken(urlHash, self.id)):
+            self.url_hash = urlHash
+
+        urlChanged = self.url != self.parsed_url
+
+        if urlChanged:
+            self.setLocationFields()
+
+        super(Url, self).save(*args, **kwargs)
+
+        if urlChanged:
+            ## Cached URL -> ID lookups could point at this Url's old URL.
+            getUrlIdForHash.cache_clear()
+
+            segments, pairs = self.getLocationParts()
+            self.url_paths.set(internRows(UrlPath, ('path', 'sequence'), segments))
+            self.search_key_vals.set(internRows(SearchKeyVal, ('key', 'val'), pairs))
+            UrlFilterMembership.updateForUrls([self.id])
+
+    @classmethod
+    def isHashTaken(cls, urlHash, urlId):
+        return cls.objects.filter(url_hash=urlHash).exclude(id=urlId).exists()
+
+    def setLocationFields(self):
         """
-        Get a list of URLs, sorted, and return only ones with at least 1 valid run in the book.
-        Otherwise you could have a list of a bunch of URLs that don't have any runs yet.
+        Parse the url and set each location bit.
+        """
+        loc = parse.urlparse(self.url)
+        self.protocol = loc.scheme
+        self.host = loc.netloc
+        self.hostname = loc.hostname
+        self.port = loc.port
+        self.pathname = loc.path
+        self.search = loc.query
+        self.hash = loc.fragment
+        self.origin = '%s://%s' % (loc.scheme, loc.netloc,)
+        self.parsed_url = self.url
+
+    def getLocationParts(self):
+        """
+        The (path, sequence) and (key, val) tuples for the url's UrlPath and SearchKeyVal M2Ms.
+        """
+        segments = [seg for seg in self.pathname.split('/') if seg != '']
+        pairs = []
+
+        for query in self.search.split('&'):
+            kv = query.split('=')
+
+            if kv[0] != '':
+                pairs.append((kv[0], kv[1] if len(kv) > 1 else None))
+
+        return ([(seg, i) for i, seg in enumerate(segments)], pairs)
 
+    @classmethod
+    def bulkLoad(cls, rows, user, updateExisting=False):
+        """
+        Add a batch of URLs in a fixed # of queries, for loading big URL lists:
+        one lookup for the URLs that already exist, one bulk INSERT for the new ones, and bulk INSERTs
+        for their location parts. With 'updateExisting', existing URLs get their sequence/owner updated
+        in one UPDATE instead of being skipped.
+        Takes a list of {'url': <URL>, 'sequence': <int>, 'owner': <UrlOwner or None>} dicts.
+        Returns a (created, updated) count tuple.
+        """
+        byHash = {}
+
+        for row in rows:
+            byHash[getUrlHash(row['url'])] = row
+
+        existing = cls.objects.in_bulk(list(byHash.keys()), field_name='url_hash')
+        exact = cls.objects.in_bulk([row['url'] for row in byHash.values()], field_name='url')
+        newUrls = []
+        changedUrls = []
+
+        for urlHash, row in byHash.items():
+            urlObj = exact.get(row['url']) or existing.get(urlHash)
+
+            if urlObj is None:
+                urlObj = cls(url=row['url'], url_hash=urlHash, sequence=row.get('sequence') or 0,
+                             owner=row.get('owner'), created_by=user, edited_by=user)
+                urlObj.setLocationFields()
+                newUrls.append(urlObj)
+            elif updateExisting:
+                sequence = row.get('sequence') or urlObj.sequence
+                owner = row.get('owner') or urlObj.owner
+
+                if (sequence, getattr(owner, 'id', None)) != (urlObj.sequence, urlObj.owner_id):
+                    urlObj.sequence = sequence
+                    urlObj.owner = owner
+                    urlObj.edited_by = user
+                    urlObj.edited_date = timezone.now()
+                    changedUrls.append(urlObj)
+
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(newUrls)
+                cls.setLocationPartsBulk(newUrls, replace=False)
+                UrlFilterMembership.updateForUrls([urlObj.id for urlObj in newUrls])
+        except IntegrityError:
+            ## Another loader added some of the same URLs in the meantime, they'll be found this time.
+            return cls.bulkLoad(rows, user, updateExisting)
+
+        bulkUpdate(cls, changedUrls, ['sequence', 'owner', 'edited_by', 'edited_date'])
+
+        return (len(newUrls), len(changedUrls))
+
+    @classmethod
+    def reparseBulk(cls, urlObjs):
+        """
+        Re-parse the location data and M2Ms of a batch of existing Urls, in a fixed # of queries.
+        """
+        urlObjs = list({urlObj.id: urlObj for urlObj in urlObjs}.values())
+        urlHashes = {urlObj.id: getUrlHash(urlObj.url) for urlObj in urlObjs}
+        hashOwners = dict(cls.objects.filter(url_hash__in=list(urlHashes.values())).values_list('url_hash', 'id'))
+
+        for urlObj in urlObjs:
+            urlHash = urlHashes[urlObj.id]
+            owner = hashOwners.get(urlHash, urlObj.id)
+
+            ## Same as save(): a Url without a hash doesn't take one another Url already has.
+            if owner == urlObj.id or urlObj.url_hash is not None:
+                urlObj.url_hash = urlHash
+                hashOwners[urlHash] = urlObj.id
+
+            urlObj.setLocationFields()
+
+        with transaction.atomic():
+            bulkUpdate(cls, urlObjs, ['url_hash', 'protocol', 'host', 'hostname', 'port', 'pathname', 'search', 'hash', 'origin', 'parsed_url'])
+            cls.setLocationPartsBulk(urlObjs, replace=True)
+            UrlFilterMembership.updateForUrls([urlObj.id for urlObj in urlObjs])
+
+        getUrlIdForHash.cache_clear()
+
+    @classmethod
+    def setLocationPartsBulk(cls, urlObjs, replace):
+        """
+        Link a batch of saved Urls to their UrlPath and SearchKeyVal rows, with one bulk INSERT per M2M.
+        With 'replace', existing links are deleted first.
+        """
+        for fieldName, model, fields, partsIndex in (('url_paths', UrlPath, ('path', 'sequence'), 0), ('search_key_vals', SearchKeyVal, ('key', 'val'), 1)):
+            through = getattr(cls, fieldName).through
+            targetField = cls._meta.get_field(fieldName).m2m_reverse_field_name()
+            urlParts = [(urlObj, urlObj.getLocationParts()[partsIndex]) for urlObj in urlObjs]
+            allParts = list(dict.fromkeys([part for urlObj, parts in urlParts for part in parts]))
+            interned = dict(zip(allParts, internRows(model, fields, allParts)))
+
+            if replace:
+                through.objects.filter(url_id__in=[urlObj.id for urlObj in urlObjs]).delete()
+
+            through.objects.bulk_create([
+                through(**{'url_id': urlObj.id, targetField: interned[part]})
+                for urlObj, parts in urlParts for part in dict.fromkeys(parts)
+            ])
+
+    @classmethod
+    def getTypeaheadMatches(cls, text, limit=6):
+        """
+        Up to 'limit' {'id', 'url'} dicts of URLs containing 'text', for the URL typeahead.
+        URLs (or hosts) starting with it come first, then URLs with it in the host, then anywhere.
+        Each group is a LIMITed, indexed query (see migration 0028), all sent as one UNION ALL, so it's
+        fast however many URLs there are. Text shorter than a trigram only gets prefix matches.
+        """
+        prefixes = Q()
+
+        for scheme in ('', 'http://', 'https://', 'http://www.', 'https://www.'):
+            prefixes |= Q(url__startswith=scheme + text)
+
+        groups = [cls.objects.filter(prefixes)]
+
+        if len(text) >= TYPEAHEAD_MIN_SUBSTRING:
+            groups.append(cls.objects.filter(hostname__contains=text).exclude(prefixes))
+            groups.append(cls.objects.filter(url__contains=text).exclude(prefixes).exclude(hostname__contains=text))
+
+        ## No ORDER BY, so each group stops at 'limit' matches instead of sorting all of them, and the
+        ##  groups don't overlap, so later groups aren't run at all once earlier ones found enough.
+        groups = [group.order_by().values('id', 'url')[:limit] for group in groups]
+
+        if len(groups) == 1:
+            return list(groups[0])
+
+        return list(groups[0].union(*groups[1:], all=True)[:limit])
+
+    @classmethod
+    def getIdForUrl(cls, url):
+        """
+        ID of the Url for a URL string: the Url with exactly that URL, or else the one it normalizes to.
+        Raises Url.DoesNotExist.
+        """
+        ## An exact match first, Urls added before url_hash existed might normalize the same as another Url.
+        urlId = cls.objects.filter(url=url).values_list('id', flat=True).first()
+
+        if urlId is not None:
+            return urlId
+
+        urlHash = getUrlHash(url)
+        urlId = getUrlIdForHash(urlHash)
+
+        if not cls.objects.filter(id=urlId, url_hash=urlHash).exists():
+            ## Cached ID is stale, the Url was edited or deleted by another process.
+            getUrlIdForHash.cache_clear()
+            urlId = getUrlIdForHash(urlHash)
+
+        return urlId
+
+    @classmethod
+    def getForUrl(cls, url):
+        """
+        The Url for a URL string (i.e. a report's requestedUrl): the Url with exactly that URL,
+        or else the one it normalizes to. Raises Url.DoesNotExist.
+        """
+        ## An exact match first, Urls added before url_hash existed might normalize the same as another Url.
+        urlObj = cls.objects.filter(url=url).first()
+
+        if urlObj is not None:
+            return urlObj
+
+        urlHash = getUrlHash(url)
+        urlObj = cls.objects.filter(id=getUrlIdForHash(urlHash)).first()
+
+        if urlObj is None or urlObj.url_hash != urlHash:
+            ## Cached ID is stale, the Url was edited or deleted by another process.
+            getUrlIdForHash.cache_clear()
+            urlObj = cls.objects.get(url_hash=urlHash)
+
+        return urlObj
+
+    @classmethod
+    def getForUrls(cls, urls):
+        """
+        Batch version of getForUrl. Returns a {URL string: Url} dict for the ones that exist.
+        """
+        found = cls.objects.in_bulk(list(urls), field_name='url')
+        urlHashes = {url: getUrlHash(url) for url in urls if url not in found}
+
+        if urlHashes:
+            byHash = cls.objects.in_bulk(list(urlHashes.values()), field_name='url_hash')
+            found.update({url: byHash[urlHash] for url, urlHash in urlHashes.items() if urlHash in byHash})
+
+        return found
+
+    def getUrlsSort(options):
+        """
+        The (sort field, sort order) of a getUrls options dict. Sort order is "" for ascending, "-" for descending.
         """
 
         allowedSortby = {
@@ -272,7 +556,6 @@ class Url(models.Model):
 
         defSortby = "date"
         defSortorder = "-"
-        defUrlIds = []
 
         ## Sort by.
         try:
@@ -293,29 +576,112 @@ class Url(models.Model):
         except Exception as ex:
             userSortorder = defSortorder
 
+        ## Map sortorder field to proper query filter condition.
+        querySortorder = "" if userSortorder == "asc" else defSortorder
+
+        return (querySortby, querySortorder)
+
+    def getUrls(options):
+        """
+        Get a list of URLs, sorted, and return only ones with at least 1 valid run in the book.
+        Otherwise you could have a list of a bunch of URLs that don't have any runs yet.
+        Ties are sorted by ID, in the same direction, so the order is stable (see getUrlsPage).
+
+        """
+
+        defUrlIds = []
+
+        querySortby, querySortorder = Url.getUrlsSort(options)
+
         try:
             urlIds = options['ids']
         except Exception as ex:
             urlIds = defUrlIds
 
-        ## Map sortorder field to proper query filter condition.
-        querySortorder = "" if userSortorder == "asc" else defSortorder
+        try:
+            urlFilter = options['filter']
+        except Exception as ex:
+            urlFilter = None
 
 
-        urls = Url.objects.prefetch_related("lighthouse_run").prefetch_related("url_kpi_average")
+        ## No prefetching the latest run and averages, the cards are pre-rendered (see report/cards.py).
+        urls = Url.objects.all()
         
         ## Do a special sorting procedure to put null values first if ascending, last if order is descending.
         ## By default, Django always puts null date fields first no matter what.
         if querySortorder == "":
-            urls = urls.order_by(F(querySortby).asc(nulls_first=True))
+            urls = urls.order_by(F(querySortby).asc(nulls_first=True), 'id')
         else:
-            urls = urls.order_by(F(querySortby).desc(nulls_last=True))
+            urls = urls.order_by(F(querySortby).desc(nulls_last=True), '-id')
         
         if len(urlIds) > 0:
             urls = urls.filter(id__in=urlIds)
         
+        ## Only URLs matching the UrlFilter, joined on it's materialized membership.
+        if urlFilter is not None:
+            urls = urls.filter(url_filter_membership_url__url_filter=urlFilter)
+        
         return urls
 
+    @classmethod
+    def getUrlsPage(cls, options, cursor=None, pageSize=20):
+        """
+        One page of getUrls, keyset paginated: instead of an OFFSET and a COUNT(*), the page starts after
+        the (sort value, ID) of the last URL on the previous page, passed in as the 'cursor' string.
+        Fetches pageSize + 1 rows to know if there's another page.
+        Returns a (list of Urls, cursor for the next page or None) tuple. A bad cursor starts from the first page.
+        """
+        querySortby, querySortorder = Url.getUrlsSort(options)
+        urls = Url.getUrls(options).annotate(sort_value=F(querySortby))
+
+        try:
+            sortValue, lastId = decodeCursor(cursor) if cursor else (None, None)
+            sortValue = cls.getSortField(querySortby).to_python(sortValue)
+            lastId = int(lastId)
+        except (ValueError, TypeError, ValidationError) as ex:
+            lastId = None
+
+        if lastId is not None:
+            urls = urls.filter(cls.getKeysetCondition(querySortby, querySortorder == "", sortValue, lastId))
+
+        page = list(urls[:pageSize + 1])
+
+        if len(page) <= pageSize:
+            return (page, None)
+
+        page = page[:pageSize]
+
+        return (page, encodeCursor([page[-1].sort_value, page[-1].id]))
+
+    @classmethod
+    def getSortField(cls, fieldPath):
+        """
+        Model field at the end of a getUrls sort field path, i.e.: 'url_kpi_average__seo_score'.
+        """
+        model = cls
+
+        for name in fieldPath.split('__')[:-1]:
+            model = model._meta.get_field(name).related_model
+
+        return model._meta.get_field(fieldPath.split('__')[-1])
+
+    def getKeysetCondition(fieldPath, ascending, sortValue, lastId):
+        """
+        Q for the rows after (sortValue, lastId), in getUrls order: nulls first ascending, last descending.
+        """
+        isNull = Q(**{fieldPath + '__isnull': True})
+
+        if ascending:
+            if sortValue is None:
+                return (isNull & Q(id__gt=lastId)) | ~isNull
+
+            return Q(**{fieldPath + '__gt': sortValue}) | Q(**{fieldPath: sortValue, 'id__gt': lastId})
+
+        if sortValue is None:
+            return isNull & Q(id__lt=lastId)
+
+        return Q(**{fieldPath + '__lt': sortValue}) | Q(**{fieldPath: sortValue, 'id__lt': lastId}) | isNull
+
     def getKpiAverages(self):
         try:
             return UrlKpiAverage.objects.get(url=self)
@@ -338,9 +704,83 @@ class Url(models.Model):
             return namedtuple('RowObject', row.keys())(*row.values())
 
 
+## Process-local LRU of normalized URL hash -> Url ID, for the runner's report POSTs and the URL search.
+## Misses raise, so they aren't cached.
+URL_ID_CACHE_SIZE = 10000
+
+@lru_cache(maxsize=URL_ID_CACHE_SIZE)
+def getUrlIdForHash(urlHash):
+    return Url.objects.values_list('id', flat=True).get(url_hash=urlHash)
+
+
+def internRows(model, fields, rows):
+    """
+    Get-or-create a list of rows of a model that's unique on 'fields', for all the rows at once:
+    one SELECT for the ones that exist and one bulk INSERT for the rest.
+    Takes a list of value tuples for 'fields'. Returns the model objects in the same order.
+    """
+    rows = list(dict.fromkeys(rows))
+
+    if not rows:
+        return []
+
+    ## Match each field against all the values it has in 'rows'. That can find a few extra rows,
+    ##  but is much cheaper to build than an OR of every row, and the extras are just ignored.
+    query = Q()
+
+    for i, field in enumerate(fields):
+        values = {row[i] for row in rows}
+        fieldQuery = Q(**{'%s__in' % field: values - {None}})
+
+        if None in values:
+            fieldQuery |= Q(**{'%s__isnull' % field: True})
+
+        query &= fieldQuery
+
+    found = {tuple(getattr(obj, field) for field in fields): obj for obj in model.objects.filter(query)}
+    missing = [row for row in rows if row not in found]
+
+    try:
+        with transaction.atomic():
+            for obj in model.objects.bulk_create([model(**dict(zip(fields, row))) for row in missing]):
+                found[tuple(getattr(obj, field) for field in fields)] = obj
+    except IntegrityError:
+        ## Another save created some of them in the meantime, now they'll be found.
+        return internRows(model, fields, rows)
+
+    return [found[row] for row in rows]
+
+
+def bulkUpdate(model, objs, fieldNames):
+    """
+    Save 'fieldNames' of many objects in one UPDATE ... FROM (VALUES ...) statement.
+    """
+    if not objs:
+        return
+
+    fields = [model._meta.get_field(name) for name in fieldNames]
+    pk = model._meta.pk
+    table = model._meta.db_table
+    castTypes = [pk.rel_db_type(connection)] + [field.cast_db_type(connection) for field in fields]
+    castRow = '(%s)' % ', '.join(['%%s::%s' % castType for castType in castTypes])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE {table} SET {sets} FROM (VALUES {values}) AS v({columns}) WHERE {table}.{pk} = v.{pk}'.format(
+                table=table,
+                pk=pk.column,
+                sets=', '.join(['%s = v.%s' % (field.column, field.column) for field in fields]),
+                values=', '.join([castRow] * len(objs)),
+                columns=', '.join([pk.column] + [field.column for field in fields]),
+            ),
+            [field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in objs for field in [pk] + fields]
+        )
+
+
 class UrlPath(models.Model):
     """
     Url path 'segments' and order.
+    Shared by every Url with the same segment in the same place.
     """
 
     created_date = models.DateTimeField(auto_now_add=True)
@@ -349,10 +789,7 @@ class UrlPath(models.Model):
 
     class Meta:
         ordering = ['path',]
-
-        indexes = [
-            models.Index(fields=['path', 'sequence',]),
-        ]
+        unique_together = ('path', 'sequence',)
 
     def __str__(self):
         return '%s: %s' % (self.path, self.sequence,)
@@ -361,6 +798,7 @@ class UrlPath(models.Model):
 class SearchKeyVal(models.Model):
     """
     url.location.search key -> val.
+    Shared by every Url with the same key -> val.
     """
 
     created_date = models.DateTimeField(auto_now_add=True)
@@ -369,10 +807,9 @@ class SearchKeyVal(models.Model):
 
     class Meta:
         ordering = ['key',]
-
-        indexes = [
-            models.Index(fields=['key', 'val',]),
-        ]
+        ## Keys with no val (?foo) are kept unique by a partial index on 'key' WHERE val IS NULL,
+        ##  see migration 0032. unique_together treats every NULL val as different.
+        unique_together = ('key', 'val',)
 
     def __str__(self):
         return '%s: %s' % (self.key, self.val,)
@@ -404,12 +841,17 @@ class UserTimingMeasureName(models.Model):
     """
 
     created_date = models.DateTimeField(auto_now_add=True)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
     description = models.TextField(null=True, blank=True)
     team = models.ForeignKey('Team',
                             related_name='user_timing_measure_name_team',
                             on_delete=models.CASCADE, null=True, blank=True)
 
+    ## Process-local {name: ID} cache for ingestion. There's only a few hundred names, and they
+    ##  almost never change, so after warm up a report's names cost no queries at all.
+    ID_CACHE_MAX_SIZE = 5000
+    idCache = {}
+
     class Meta:
         ordering = ['name']
 
@@ -420,6 +862,32 @@ class UserTimingMeasureName(models.Model):
     def __str__(self):
         return '%s' % (self.name,)
 
+    @classmethod
+    def getIds(cls, names):
+        """
+        Returns a {name: ID} dict for the given names, creating any that don't exist yet.
+        Uncached names are upserted with one INSERT ... ON CONFLICT DO NOTHING, then looked up with one SELECT.
+        """
+        missing = {name for name in names if name not in cls.idCache}
+
+        if missing:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO %s (created_date, name) VALUES %s ON CONFLICT (name) DO NOTHING' % (
+                        cls._meta.db_table, ', '.join(['(%s, %s)'] * len(missing))
+                    ),
+                    [value for name in missing for value in (timezone.now(), name)]
+                )
+
+            ## Full, so start over. That drops the names that were already cached too, so look up all of them.
+            if len(cls.idCache) + len(missing) > cls.ID_CACHE_MAX_SIZE:
+                cls.idCache.clear()
+                missing = set(names)
+
+            cls.idCache.update(cls.objects.filter(name__in=missing).values_list('name', 'id'))
+
+        return {name: cls.idCache[name] for name in names}
+
 
 class UserTimingMeasure(models.Model):
     """
@@ -452,12 +920,59 @@ class UserTimingMeasure(models.Model):
     def __str__(self):
         return '%s : %s' % (self.name, self.duration)
 
+    @classmethod
+    def saveForRuns(cls, runUserTimings, retry=True):
+        """
+        Save the 'Measure' user-timings for a list of (LighthouseRun, report user-timing items) tuples,
+        with one bulk INSERT, and add the ones from runs that weren't 4xx/5xx into the URL averages.
+        Measures with a negative start time or duration (i.e. the mark was before navigation start) are skipped.
+        """
+        measureItems = []
+
+        for run, userTimings in runUserTimings:
+            for item in userTimings:
+                if item.get('timingType') == "Measure" and item.get('startTime', -1) >= 0 and item.get('duration', -1) >= 0:
+                    measureItems.append((run, item))
+
+        if not measureItems:
+            return []
+
+        try:
+            with transaction.atomic():
+                nameIds = UserTimingMeasureName.getIds({item['name'] for run, item in measureItems})
+                measures = cls.objects.bulk_create([
+                    cls(
+                        url_id = run.url_id,
+                        lighthouse_run = run,
+                        name_id = nameIds[item['name']],
+                        start_time = round(item['startTime']),
+                        duration = round(item['duration']),
+                    ) for run, item in measureItems
+                ])
+
+                ## FKs are only checked at COMMIT by default, so check them now, while we can still retry.
+                connection.check_constraints()
+        except IntegrityError:
+            ## Most likely a cached name was deleted since we cached it. Try again with a fresh cache.
+            if not retry:
+                raise
+
+            UserTimingMeasureName.idCache.clear()
+            return cls.saveForRuns(runUserTimings, retry=False)
+
+        ## User-timings only happen if the page actually loaded and executed properly.
+        ## IOW: A report that was invalid and returned a 400+ HTTP response code
+        ##   won't contain user-timings, but skip them just in case.
+        UserTimingMeasureAverage.addMeasures([measure for measure in measures if not measure.lighthouse_run.invalid_run])
+
+        return measures
+
 
 class UserTimingMeasureAverage(models.Model):
     """
     The average of a particular user-timing for a particular URL.
-    These are dynamically generated on LighthouseDataRaw save, by simply
-    averaging all the same user-timings for the given URL.
+    Kept as running totals, updated when a run's measures are saved,
+    so the average never has to re-read the URL's measure history.
     Only runs that are 'valid' are counted in the average.
     """
 
@@ -472,8 +987,13 @@ class UserTimingMeasureAverage(models.Model):
     start_time = models.PositiveIntegerField(default=0)
     number_samples = models.PositiveIntegerField(default=0)
 
+    ## Running totals the averages above are calculated from.
+    duration_sum = models.BigIntegerField(default=0)
+    start_time_sum = models.BigIntegerField(default=0)
+
     class Meta:
         ordering = ['start_time']
+        unique_together = ('url', 'name',)
 
         indexes = [
             models.Index(fields=['created_date', 'url', 'name',]),
@@ -482,6 +1002,81 @@ class UserTimingMeasureAverage(models.Model):
     def __str__(self):
         return '%s : %s' % (self.name, self.duration)
 
+    @classmethod
+    def addMeasures(cls, measures):
+        """
+        Add saved UserTimingMeasures into their URL + name running averages.
+        All of them go in with one INSERT ... ON CONFLICT DO UPDATE, no matter how many URLs and names.
+        """
+        totals = {}
+
+        for measure in measures:
+            total = totals.setdefault((measure.url_id, measure.name_id), [0, 0, 0])
+            total[0] += 1
+            total[1] += measure.duration
+            total[2] += measure.start_time
+
+        if not totals:
+            return
+
+        table = cls._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO {table} (created_date, url_id, name_id, number_samples, duration_sum, start_time_sum, duration, start_time)
+                VALUES {values}
+                ON CONFLICT (url_id, name_id) DO UPDATE SET
+                    number_samples = {table}.number_samples + EXCLUDED.number_samples,
+                    duration_sum = {table}.duration_sum + EXCLUDED.duration_sum,
+                    start_time_sum = {table}.start_time_sum + EXCLUDED.start_time_sum,
+                    duration = round(({table}.duration_sum + EXCLUDED.duration_sum)::numeric / ({table}.number_samples + EXCLUDED.number_samples)),
+                    start_time = round(({table}.start_time_sum + EXCLUDED.start_time_sum)::numeric / ({table}.number_samples + EXCLUDED.number_samples))
+                """.format(
+                    table=table,
+                    values=', '.join(['(%s, %s, %s, %s, %s, %s, round(%s::numeric / %s), round(%s::numeric / %s))'] * len(totals)),
+                ),
+                [
+                    value for (urlId, nameId), (samples, durationSum, startTimeSum) in totals.items()
+                    for value in (timezone.now(), urlId, nameId, samples, durationSum, startTimeSum, durationSum, samples, startTimeSum, samples)
+                ]
+            )
+
+    @classmethod
+    def rebuildFromMeasures(cls, urlIds=None):
+        """
+        Rebuild the running totals and averages from the stored measures of runs that weren't 4xx/5xx.
+        Only for the given URL IDs, if passed. Returns the number of averages rebuilt.
+        """
+        measures = UserTimingMeasure.objects.filter(lighthouse_run__invalid_run=False)
+        averages = cls.objects.all()
+
+        if urlIds is not None:
+            measures = measures.filter(url_id__in=urlIds)
+            averages = averages.filter(url_id__in=urlIds)
+
+        totals = measures.order_by().values('url', 'name').annotate(
+            samples=Count('id'),
+            durationSum=Sum('duration'),
+            startTimeSum=Sum('start_time'),
+        )
+
+        with transaction.atomic():
+            averages.delete()
+            rebuilt = cls.objects.bulk_create([
+                cls(
+                    url_id = total['url'],
+                    name_id = total['name'],
+                    number_samples = total['samples'],
+                    duration_sum = total['durationSum'],
+                    start_time_sum = total['startTimeSum'],
+                    duration = averageOf(total['durationSum'], total['samples']),
+                    start_time = averageOf(total['startTimeSum'], total['samples']),
+                ) for total in totals
+            ])
+
+        return len(rebuilt)
+
 
 class UrlKpiAverage(models.Model):
     """
@@ -519,6 +1114,24 @@ class UrlKpiAverage(models.Model):
     ## REMOVE THIS after new user-timing models are POPULATED WITH THE DATA.
     masthead_onscreen = models.PositiveIntegerField(default=0)
 
+    ## Running totals the averages above are derived from.
+    ## Each new valid run is added in, so we never re-scan the URL's run history on ingest.
+    ## If these ever drift, rebuild them with:  manage.py rebuild_kpi_averages
+    seo_number_samples = models.PositiveIntegerField(default=0)
+    accessibility_score_sum = models.BigIntegerField(default=0)
+    dom_content_loaded_sum = models.BigIntegerField(default=0)
+    dom_loaded_sum = models.BigIntegerField(default=0)
+    first_contentful_paint_sum = models.BigIntegerField(default=0)
+    first_meaningful_paint_sum = models.BigIntegerField(default=0)
+    interactive_sum = models.BigIntegerField(default=0)
+    masthead_onscreen_sum = models.BigIntegerField(default=0)
+    number_network_requests_sum = models.BigIntegerField(default=0)
+    performance_score_sum = models.BigIntegerField(default=0)
+    redirect_wasted_ms_sum = models.BigIntegerField(default=0)
+    seo_score_sum = models.BigIntegerField(default=0)
+    time_to_first_byte_sum = models.BigIntegerField(default=0)
+    total_byte_weight_sum = models.BigIntegerField(default=0)
+
     class Meta:
         indexes = [
             models.Index(fields=['created_date', 'url',]),
@@ -528,10 +1141,120 @@ class UrlKpiAverage(models.Model):
         return '%s' % (self.url.url,)
 
     def getFilteredAverages(urls):
-        try:
-          return UrlKpiAverage.objects.filter(url_id__in=list(urls.values_list('id', flat=True)))
-        except Exception as ex:
-          return UrlKpiAverage.objects.all()
+        """
+        Averages of a Url queryset's URLs. The URLs stay a subquery, however many there are.
+        """
+        return UrlKpiAverage.objects.filter(url_id__in=urls.values('id'))
+
+    def setAveragesFromSums(self):
+        """
+        Re-derive each average field from its running total and sample count.
+        Halves round up, the same as the user timing averages.
+        """
+        for field in KPI_AVERAGE_FIELDS:
+            if self.number_samples > 0:
+                setattr(self, field, averageOf(getattr(self, '%s_sum' % field), self.number_samples))
+            else:
+                setattr(self, field, 0)
+
+        if self.seo_number_samples > 0:
+            self.seo_score = averageOf(self.seo_score_sum, self.seo_number_samples)
+        else:
+            self.seo_score = 0
+
+    @classmethod
+    def addRuns(cls, url, runs):
+        """
+        Add the given LighthouseRuns for a URL into its running totals and update the averages.
+        Invalid runs are skipped. The average row is locked while it's updated so
+        concurrent ingests for the same URL can't lose a sample.
+        Returns the UrlKpiAverage, or None if there was nothing valid to add.
+        """
+        validRuns = [run for run in runs if run.isValidRun()]
+
+        if not validRuns:
+            return None
+
+        with transaction.atomic():
+            urlAvg, created = cls.objects.select_for_update().get_or_create(url=url)
+
+            ## Add the values as they're stored: the integer fields save int() of a float, i.e. 210.7 is 210.
+            for run in validRuns:
+                urlAvg.number_samples += 1
+
+                for field in KPI_AVERAGE_FIELDS:
+                    sumField = '%s_sum' % field
+                    setattr(urlAvg, sumField, getattr(urlAvg, sumField) + int(getattr(run, field)))
+
+                if run.seo_score > 0:
+                    urlAvg.seo_number_samples += 1
+                    urlAvg.seo_score_sum += int(run.seo_score)
+
+            urlAvg.setAveragesFromSums()
+            urlAvg.save()
+
+        return urlAvg
+
+    @classmethod
+    def rebuildFromRuns(cls, urlIds=None):
+        """
+        Recalculate the running totals and averages from the LighthouseRun history,
+        in one grouped query. Scoped to the given URL IDs, or all URLs if none are passed.
+        Returns the number of URLs rebuilt.
+        """
+        runs = LighthouseRun.objects.validRuns()
+
+        if urlIds is not None:
+            runs = runs.filter(url_id__in=urlIds)
+
+        sums = {'%s_sum' % field: Sum(field) for field in KPI_AVERAGE_FIELDS}
+
+        ## order_by() clears the default run ordering, otherwise it ends up in the GROUP BY.
+        urlTotals = runs.order_by().values('url').annotate(
+            total_samples=Count('id'),
+            total_seo_samples=Count('id', filter=Q(seo_score__gt=0)),
+            seo_score_sum=Sum('seo_score'),
+            **sums
+        )
+
+        rebuilt = 0
+
+        for totals in urlTotals.iterator():
+            with transaction.atomic():
+                urlAvg, created = cls.objects.select_for_update().get_or_create(url_id=totals['url'])
+                urlAvg.number_samples = totals['total_samples']
+                urlAvg.seo_number_samples = totals['total_seo_samples']
+                urlAvg.seo_score_sum = totals['seo_score_sum'] or 0
+
+                for field in KPI_AVERAGE_FIELDS:
+                    sumField = '%s_sum' % field
+                    setattr(urlAvg, sumField, totals[sumField] or 0)
+
+                urlAvg.setAveragesFromSums()
+                urlAvg.save()
+
+                Url.objects.filter(id=totals['url']).update(url_kpi_average=urlAvg)
+
+            rebuilt += 1
+
+        ## URLs that have no valid runs left (e.g. they were all deleted) get zeroed,
+        ## otherwise they'd keep their old totals and averages forever.
+        emptyAverages = cls.objects.exclude(url_id__in=runs.order_by().values('url_id'))
+
+        if urlIds is not None:
+            emptyAverages = emptyAverages.filter(url_id__in=urlIds)
+
+        zeroed = {field: 0 for field in KPI_AVERAGE_FIELDS}
+        zeroed.update({'%s_sum' % field: 0 for field in KPI_AVERAGE_FIELDS})
+        emptyAverages.update(
+            number_samples=0,
+            seo_number_samples=0,
+            seo_score=0,
+            seo_score_sum=0,
+            **zeroed
+        )
+
+        return rebuilt
 
 
 ## FUTURE USE:
@@ -582,7 +1305,12 @@ class LighthouseDataRaw(models.Model):
     lighthouse_run = models.ForeignKey('LighthouseRun',
                             related_name='lighthouse_data_raw_lighthouse_run',
                             on_delete=models.PROTECT)
-    report_data = JSONField()
+    report_data = JSONField(blank=True, null=True)
+
+    ## With REPORT_DATA_COMPRESSED on, the report is saved here instead of 'report_data'
+    ##  as a compressed skeleton, with it's big blobs in shared ReportChunks. See report/storage.py.
+    ## Always read the report with getReportData(), which handles both.
+    report_data_compressed = models.BinaryField(blank=True, null=True)
 
 
     class Meta:
@@ -595,264 +1323,274 @@ class LighthouseDataRaw(models.Model):
     def __str__(self):
         return "%s - %s" % (self.lighthouse_run, self.created_date,)
 
-    def save_report(self, raw_data):
+    def getReportData(self):
         """
-        Save the posted raw report data object to the database.
+        The full Lighthouse report, put back together from it's chunks if it was saved compressed.
+        """
+        if self.report_data_compressed is None:
+            return self.report_data
 
+        skeleton = decompressJson(self.report_data_compressed)
+        chunks = dict(ReportChunk.objects.filter(hash__in=getChunkHashes(skeleton)).values_list('hash', 'data'))
+
+        return joinReport(skeleton, chunks)
+
+    @classmethod
+    def getReportJson(cls, runId):
+        """
+        The report of a LighthouseRun ID as JSON text, or None if it doesn't have one.
+        Uncompressed reports come straight out of PostgreSQL as text (report_data::text), so they're
+        never decoded in Python. Compressed ones have to be put back together with getReportData().
         """
+        reportRow = cls.objects.filter(lighthouse_run_id=runId).annotate(
+            report_json=Cast('report_data', models.TextField())
+        ).order_by('-id').values_list('report_json', 'report_data_compressed').first()
 
-        ## Initially set run to be 'valid'. If the report contains a 400+ header
-        ##  then we set this to 'false' so we don't bother re-calculating averages.
-        validRun = True
-        raw_report = json.loads(raw_data.decode('utf-8'))
+        if reportRow is None:
+            return None
+
+        reportJson, compressed = reportRow
+
+        if compressed is None:
+            return reportJson
+
+        return json.dumps(cls(report_data_compressed=bytes(compressed)).getReportData())
+
+    def setReportData(self, reportData, reportJson=None, compressed=None):
+        """
+        Set the report to save, compressed or not (defaults to the REPORT_DATA_COMPRESSED setting).
+        Returns the {hash: chunk} dict of ReportChunks that need saving along with it.
+        """
+        if compressed is None:
+            compressed = settings.REPORT_DATA_COMPRESSED
+
+        if not compressed:
+            self.report_data = storableJson(reportData, reportJson)
+            self.report_data_compressed = None
+            return {}
+
+        skeleton, chunks = splitReport(reportData)
+        self.report_data = None
+        self.report_data_compressed = compressJson(skeleton)
+
+        return chunks
+
+    def save_report(self, raw_data, ingestKey=None):
+        """
+        Save the posted raw report data object to the database.
+        Returns the new LighthouseRun. If a run was already saved with the same 'ingestKey',
+        this raises an IntegrityError and nothing is saved.
+        """
 
         ## Set the raw data JSON and get the URL object so we can
         ##  process and create all the other models.
-        report_data = json.loads(raw_report['report'])
-        url = Url.objects.get(url=report_data['requestedUrl'])
+        ## All the fields we need come out of the report in one pass.
+        report_data, reportJson = loadReportPayload(raw_data)
+        reportFields = extractReportFields(report_data)
 
 
-        ## 1. Create this new LighthouseRun object (the main pointer/parent).
-        this_run = LighthouseRun(url=url)
-        this_run.save()
+        ## Everything is saved in one transaction, so a report that fails part way leaves nothing behind,
+        ##  and it's ingestKey is free for the runner to retry with.
+        with transaction.atomic():
+            url = Url.getForUrl(report_data['requestedUrl'])
 
 
-        ## 2. Change the Url object to point to this Run as the new/latest one.
-        url.lighthouse_run = this_run
-        url.save()
+            ## 1. Create this new LighthouseRun object (the main pointer/parent),
+            ##  with the key fields we want from the report for fast, single query.
+            ## If the report contains a 400+ header the run is 'invalid', and we don't bother re-calculating averages.
+            this_run = LighthouseRun(url=url, ingest_key=ingestKey, **reportFields.run)
+            this_run.save()
+            validRun = not this_run.invalid_run
 
+            thumbnail = LighthouseRunThumbnail.fromBase64(this_run, reportFields.thumbnail)
 
-        ## 3. Create this raw data object and point to the Run it's associated with (created in #2)
-        lighthouse_data_raw = LighthouseDataRaw(lighthouse_run=this_run,
-                                                report_data=report_data,)
-        lighthouse_data_raw.save()
+            if thumbnail is not None:
+                thumbnail.save()
 
-        ## From https://blog.dareboost.com/en/2018/06/lighthouse-tool-chrome-devtools/
-        # First ContentFul Paint: First contentful paint marks the time at which the first text/image is painted.
-        # First Meaningful Paint: First Meaningful Paint measures when the primary content of a page is visible.
-        # Speed Index: Speed Index shows how quickly the contents of a page are visibly populated.
-        # First CPU Idle: First CPU Idle marks the first time at which the page’s main thread is quiet enough to handle input.
-        # Time to Interactive: Interactive marks the time at which the page is fully interactive.
 
-        ## 4. Now grab the key fields we want and add them to the LighthouseRun for fast, single query.
-        try:
-            accessibility_score = int(report_data['categories']['accessibility']['score'] * 100)
-            if accessibility_score is None:
-                accessibility_score = 0
-        except Exception as ex:
-            accessibility_score = 0
+            ## 2. Change the Url object to point to this Run as the new/latest one.
+            url.lighthouse_run = this_run
+            url.save()
 
-        try:
-            performance_score = int(report_data['categories']['performance']['score'] * 100)
-            if performance_score is None:
-                performance_score = 0
-        except Exception as ex:
-            performance_score = 0
 
-        try:
-            seo_score = int(report_data['categories']['seo']['score'] * 100)
-            if seo_score is None:
-                seo_score = 0
-        except Exception as ex:
-            seo_score = 0
+            ## 3. Create this raw data object and point to the Run it's associated with (created in #1)
+            lighthouse_data_raw = LighthouseDataRaw(lighthouse_run=this_run)
+            ReportChunk.saveChunks(lighthouse_data_raw.setReportData(report_data, reportJson))
+            lighthouse_data_raw.save()
 
-        try:
-            total_byte_weight = report_data['audits']['total-byte-weight']['rawValue']
-            if total_byte_weight is None:
-                total_byte_weight = 0
-        except Exception as ex:
-            total_byte_weight = 0
 
-        try:
-            number_network_requests = report_data['audits']['network-requests']['rawValue']
-            if number_network_requests is None:
-                number_network_requests = 0
-        except Exception as ex:
-            number_network_requests = 0
+            if validRun:
+                ## 4. Add this run into the URL's running averages. Constant time, no matter how many runs the URL has.
+                urlAvg = UrlKpiAverage.addRuns(url, [this_run])
 
-        try:
-            time_to_first_byte = report_data['audits']['time-to-first-byte']['rawValue']
-            if time_to_first_byte is None:
-                time_to_first_byte = 0
-        except Exception as ex:
-            time_to_first_byte = 0
+                ## Associate the URL to the average object for it.
+                if urlAvg is not None and url.url_kpi_average_id != urlAvg.id:
+                    url.url_kpi_average = urlAvg
+                    url.save()
 
-        try:
-            first_meaningful_paint = report_data['audits']['first-meaningful-paint']['rawValue']
-            if first_meaningful_paint is None:
-                first_meaningful_paint = 0
-        except Exception as ex:
-            first_meaningful_paint = 0
 
-        try:
-            first_contentful_paint = report_data['audits']['first-contentful-paint']['rawValue']
-            if first_contentful_paint is None:
-                first_contentful_paint = 0
-        except Exception as ex:
-            first_contentful_paint = 0
+            ## 5. Now save the user timing section fields to it's model.
+            reportUsertiming = LighthouseDataUsertiming(
+                lighthouse_run = this_run,
+                report_data = {'items': reportFields.userTimings},
+            )
+            reportUsertiming.save()
 
-        try:
-            interactive = report_data['audits']['interactive']['rawValue']
-            if interactive is None:
-                interactive = 0
-        except Exception as ex:
-            interactive = 0
 
-        try:
-            thumbnail = report_data['audits']['screenshot-thumbnails']['details']['items'][-1]['data']
-            if thumbnail is None:
-                thumbnail = 0
-        except Exception as ex:
-            thumbnail = ""
+            ## 6. Save this run's user timing measures and add them into the URL's averages, in a few queries total.
+            UserTimingMeasure.saveForRuns([(this_run, reportFields.userTimings)])
 
-        try:
-            dom_content_loaded = report_data['audits']['metrics']['details']['items'][0]['observedDomContentLoaded']
-            if dom_content_loaded is None:
-                dom_content_loaded = 0
-        except Exception as ex:
-            dom_content_loaded = 0
 
-        try:
-            dom_loaded = report_data['audits']['metrics']['details']['items'][0]['observedLoad']
-            if dom_loaded is None:
-                dom_loaded = 0
-        except Exception as ex:
-            dom_loaded = 0
+            ## 7. Pre-render the URL's browse page cards, once the run is committed (if other processes can see them).
+            cacheReportCardsOnCommit([url])
 
-        try:
-            redirect_hops = len(report_data['audits']['redirects']['details']['items'])
-            if redirect_hops is None:
-                redirect_hops = 0
-        except Exception as ex:
-            redirect_hops = 0
+        return this_run
 
-        try:
-            redirect_wasted_ms = report_data['audits']['redirects']['rawValue']
-            if redirect_wasted_ms is None:
-                redirect_wasted_ms = 0
-        except Exception as ex:
-            redirect_wasted_ms = 0
-
-
-        mastheadOnscreen = getUserTimingValue("V18-masthead-load", userTimingsObject=report_data['audits']['user-timings'])
-
-        ## We only do it this way because we already have this run in memory.
-        ## Otherwise we would use: LighthouseRun...filter().update(...) as it's more performant in Django.
-        this_run.accessibility_score = accessibility_score
-        this_run.performance_score = performance_score
-        this_run.seo_score = seo_score
-        this_run.total_byte_weight = total_byte_weight
-        this_run.number_network_requests = number_network_requests
-        this_run.time_to_first_byte = time_to_first_byte
-        this_run.first_contentful_paint = first_contentful_paint
-        this_run.first_meaningful_paint = first_meaningful_paint
-        this_run.interactive = interactive
-        this_run.masthead_onscreen = mastheadOnscreen['startTime']
-        this_run.thumbnail_image = thumbnail
-        this_run.redirect_wasted_ms = redirect_wasted_ms
-        this_run.redirect_hops = redirect_hops
-        this_run.dom_content_loaded = dom_content_loaded
-        this_run.dom_loaded = dom_loaded
-
-        ## Check if the initial request was a 4xx or 5xx, and set run as invalid.
-        ## Flag variable is used below so we don't re-calc averages if we don't have to.
-        try:
-            statusCode = report_data['audits']['network-requests']['details']['items'][0]['statusCode']
-            if statusCode > 399:
-                this_run.invalid_run = True
-                this_run.http_error_code = statusCode
-                validRun = False
-        except Exception as ex:
-            pass
+    @classmethod
+    def save_reports(cls, raw_reports, ingestKeys=None):
+        """
+        Batch version of save_report, for backfills and replays.
+        Takes a list of decoded report POST payloads, and saves all of them in one transaction
+        with a handful of bulk INSERTs, instead of ~40 queries per report.
+        URL averages are updated once per URL for the whole batch.
+        Reports that can't be saved (bad JSON, unknown URL) are skipped and reported back.
+        With 'ingestKeys' (one per payload, or None), reports that were already saved are skipped too.
+
+        Returns a list with a result for each payload, in the same order:
+            {'run': <LighthouseRun ID>}, {'run': <LighthouseRun ID>, 'duplicate': True} or {'error': <message>}
+        """
 
-        ## Save the run object with populated fields.
-        this_run.save()
-        
-        
-        if validRun:
-            ## 5. Get/Create the average model object and re-calc new averages including the run we just saved.
-            urlRuns = LighthouseRun.objects.filter(url=url).validRuns()
+        results = [None] * len(raw_reports)
+        reports = []
+        chunks = {}
+
+        ## 1. Skip reports that were already saved, or that are in this batch more than once.
+        ingestKeys = ingestKeys or [None] * len(raw_reports)
+        savedRuns = dict(LighthouseRun.objects.filter(ingest_key__in=[key for key in ingestKeys if key]).values_list('ingest_key', 'id'))
+        firstIndexes = {}
+        duplicateOf = {}
+
+        for i, ingestKey in enumerate(ingestKeys):
+            if ingestKey in savedRuns:
+                results[i] = {'run': savedRuns[ingestKey], 'duplicate': True}
+            elif ingestKey in firstIndexes:
+                duplicateOf[i] = firstIndexes[ingestKey]
+            elif ingestKey:
+                firstIndexes[ingestKey] = i
+
+        ## 2. Decode and extract each report, and find it's URL, all URLs in 1 query.
+        for i, raw_report in enumerate(raw_reports):
+            if results[i] is not None or i in duplicateOf:
+                continue
 
-            ## Seo is new, so only get average using runs that have it (>0), and for safety, set to 0 if there are none.
-            urlRunsWithSeoScore = urlRuns.filter(seo_score__gt=0)
             try:
-                seoAvg = round(urlRunsWithSeoScore.aggregate(Avg('seo_score'))['seo_score__avg'])
+                report_data, reportJson = getReportFromPayload(raw_report)
+                rawData = LighthouseDataRaw()
+                chunks.update(rawData.setReportData(report_data, reportJson))
+                reports.append((i, rawData, report_data, extractReportFields(report_data)))
             except Exception as ex:
-                seoAvg = 0
-
-            urlAvg, created = UrlKpiAverage.objects.get_or_create(url=url)
-
-            urlAvg.accessibility_score = round(urlRuns.aggregate(Avg('accessibility_score'))['accessibility_score__avg'])
-            urlAvg.first_contentful_paint = round(urlRuns.aggregate(Avg('first_contentful_paint'))['first_contentful_paint__avg'])
-            urlAvg.first_meaningful_paint = round(urlRuns.aggregate(Avg('first_meaningful_paint'))['first_meaningful_paint__avg'])
-            urlAvg.interactive = round(urlRuns.aggregate(Avg('interactive'))['interactive__avg'])
-            urlAvg.masthead_onscreen = round(urlRuns.aggregate(Avg('masthead_onscreen'))['masthead_onscreen__avg'])
-            urlAvg.number_network_requests = round(urlRuns.aggregate(Avg('number_network_requests'))['number_network_requests__avg'])
-            urlAvg.performance_score = round(urlRuns.aggregate(Avg('performance_score'))['performance_score__avg'])
-            urlAvg.seo_score = seoAvg
-            urlAvg.time_to_first_byte = round(urlRuns.aggregate(Avg('time_to_first_byte'))['time_to_first_byte__avg'])
-            urlAvg.total_byte_weight = round(urlRuns.aggregate(Avg('total_byte_weight'))['total_byte_weight__avg'])
-            urlAvg.dom_content_loaded = round(urlRuns.aggregate(Avg('dom_content_loaded'))['dom_content_loaded__avg'])
-            urlAvg.dom_loaded = round(urlRuns.aggregate(Avg('dom_loaded'))['dom_loaded__avg'])
-            urlAvg.redirect_wasted_ms = round(urlRuns.aggregate(Avg('redirect_wasted_ms'))['redirect_wasted_ms__avg'])
-            urlAvg.number_samples = urlRuns.count()
-            urlAvg.save()
+                results[i] = {'error': 'Invalid report: %s' % ex}
 
-            ## Associate the URL to the average object for it.
-            url.url_kpi_average = urlAvg
-            url.save()
+        urls = Url.getForUrls({report_data.get('requestedUrl') or '' for i, rawData, report_data, reportFields in reports})
 
+        newRuns = []
 
-        ## 6. Now save the user timing section fields to it's model.
-        reportUsertiming = LighthouseDataUsertiming(
-            lighthouse_run = this_run,
-            report_data = {'items': report_data['audits']['user-timings']['details']['items']},
-        )
-        reportUsertiming.save()
+        for i, rawData, report_data, reportFields in reports:
+            url = urls.get(report_data.get('requestedUrl') or '')
 
+            if url is None:
+                results[i] = {'error': 'Unknown URL: %s' % report_data.get('requestedUrl')}
+            else:
+                newRuns.append((i, rawData, reportFields, LighthouseRun(url=url, ingest_key=ingestKeys[i], **reportFields.run)))
 
-        ## 7. Loop thru the user timings object and create an entry for each one for this run.
-        for item in report_data['audits']['user-timings']['details']['items']:
-            if item['timingType'] == "Measure":
-                itemName, created = UserTimingMeasureName.objects.get_or_create(name=item['name'])
+        with transaction.atomic():
+            ## 3. Create the runs, and the raw data, thumbnail + user timing objects that point to them.
+            LighthouseRun.objects.bulk_create([run for i, rawData, reportFields, run in newRuns])
 
-                if item['startTime'] < 0:
-                    continue
+            thumbnails = [LighthouseRunThumbnail.fromBase64(run, reportFields.thumbnail) for i, rawData, reportFields, run in newRuns]
+            LighthouseRunThumbnail.objects.bulk_create([thumbnail for thumbnail in thumbnails if thumbnail is not None])
 
-                try:
-                    UserTimingMeasure.objects.create(
-                        url = url,
-                        lighthouse_run = this_run,
-                        name = itemName,
-                        start_time = item['startTime'],
-                        duration = item['duration'],
-                    )
-                except Exception as ex:
-                    ## Should log this after logging model is setup.
-                    pass
-
-
-                ## Now re-calculate the average for this user-timing item, FOR THIS URL.
-                ## User-timings only happen if the page actually loaded and executed properly.
-                ## IOW: A report that was invalid and returned a 400+ HTTP response code
-                ##   won't contain the user-timings so this averaging step won't even run.
-                ## Zero to no risk of averaging an 'invalid' user-timing # here.
-                if validRun:
-                    urlItemMeasures = UserTimingMeasure.objects.filter(url=url, name=itemName)
-                    itemDurationAvg = round(urlItemMeasures.aggregate(Avg('duration'))['duration__avg'])
-                    itemStartTimeAvg = round(urlItemMeasures.aggregate(Avg('start_time'))['start_time__avg'])
-
-                    ## Find or create an Avg record for the user-timing for this URL, then store the new avg #s.
-                    itemAvgObj, created = UserTimingMeasureAverage.objects.get_or_create(url=url, name=itemName)
-                    itemAvgObj.duration = itemDurationAvg
-                    itemAvgObj.start_time = itemStartTimeAvg
-                    itemAvgObj.number_samples += 1
-                    itemAvgObj.save()
+            for i, rawData, reportFields, run in newRuns:
+                rawData.lighthouse_run = run
+
+            ReportChunk.saveChunks(chunks)
+            LighthouseDataRaw.objects.bulk_create([rawData for i, rawData, reportFields, run in newRuns])
+
+            LighthouseDataUsertiming.objects.bulk_create([
+                LighthouseDataUsertiming(
+                    lighthouse_run = run,
+                    report_data = {'items': reportFields.userTimings},
+                ) for i, rawData, reportFields, run in newRuns
+            ])
+
+            ## 4. User timing measures for every run, and their averages.
+            UserTimingMeasure.saveForRuns([(run, reportFields.userTimings) for i, rawData, reportFields, run in newRuns])
+
+            ## 5. Once per URL: point it at it's latest run and add the valid runs into it's averages.
+            urlRuns = {}
+
+            for i, rawData, reportFields, run in newRuns:
+                urlRuns.setdefault(run.url, []).append(run)
+                results[i] = {'run': run.id}
+
+            for url, runs in urlRuns.items():
+                urlAvg = UrlKpiAverage.addRuns(url, runs)
+                urlUpdates = {'lighthouse_run': runs[-1]}
+
+                if urlAvg is not None:
+                    urlUpdates['url_kpi_average'] = urlAvg
+
+                Url.objects.filter(id=url.id).update(**urlUpdates)
+
+                for field, value in urlUpdates.items():
+                    setattr(url, field, value)
+
+            ## 6. Pre-render the URLs' browse page cards, once the runs are committed (if other processes can see them).
+            cacheReportCardsOnCommit(list(urlRuns))
+
+        for i, firstIndex in duplicateOf.items():
+            results[i] = dict(results[firstIndex], duplicate=True) if 'run' in results[firstIndex] else results[firstIndex]
+
+        return results
 
     def __str__(self):
         return "%s - %s" % (self.lighthouse_run, self.created_date,)
 
 
+class ReportChunk(models.Model):
+    """
+    A compressed piece of a raw Lighthouse report (i.e. a screenshot filmstrip or network request list),
+    keyed by the hash of it's content, and shared by every stored report that contains it.
+    See report/storage.py.
+    """
+
+    created_date = models.DateTimeField(auto_now_add=True)
+    hash = models.CharField(max_length=64, unique=True)
+    data = models.BinaryField()
+
+    def __str__(self):
+        return "%s" % (self.hash,)
+
+    @classmethod
+    def saveChunks(cls, chunks):
+        """
+        Save a {hash: compressed data} dict of chunks, skipping any that are already stored.
+        """
+        if not chunks:
+            return
+
+        existing = set(cls.objects.filter(hash__in=chunks.keys()).values_list('hash', flat=True))
+        newChunks = [cls(hash=chunkHash, data=data) for chunkHash, data in chunks.items() if chunkHash not in existing]
+
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(newChunks)
+        except IntegrityError:
+            ## Another ingest saved some of the same chunks in the meantime.
+            for chunk in newChunks:
+                cls.objects.get_or_create(hash=chunk.hash, defaults={'data': chunk.data})
+
+
 class LighthouseDataUsertiming(models.Model):
     """
     Stores the Lighthouse report 'user-timing' JSON object that contains all the
@@ -874,6 +1612,143 @@ class LighthouseDataUsertiming(models.Model):
         return "%s - %s" % (self.lighthouse_run, self.created_date,)
 
 
+class ReportQueueItem(models.Model):
+    """
+    A raw report POST, waiting to be processed by the report queue consumer:
+        ./manage.py process_report_queue
+    The request body is stored as-is so the POST can return right away. The consumer then
+    saves them in batches with LighthouseDataRaw.save_reports. Items that keep failing get retried
+    with a backoff, then moved to the ReportDeadLetter table.
+    """
+
+    created_date = models.DateTimeField(auto_now_add=True)
+    modified_date = models.DateTimeField(auto_now=True)
+    available_date = models.DateTimeField(default=timezone.now)
+    raw_data = models.BinaryField()
+    ingest_key = models.CharField(max_length=64, blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['available_date', 'id']
+
+        indexes = [
+            models.Index(fields=['available_date', 'id',]),
+        ]
+
+    def __str__(self):
+        return "%s - attempts: %s" % (self.created_date, self.attempts,)
+
+    @classmethod
+    def processBatch(cls, batchSize=20, maxAttempts=5, retryDelay=60):
+        """
+        Claim up to 'batchSize' available items and save their reports.
+        Items are claimed with SKIP LOCKED, so any # of consumer processes can run side by side.
+        The whole batch is saved with LighthouseDataRaw.save_reports. If that blows up, each item
+        is retried on it's own so one bad report doesn't sink the rest of the batch.
+        If the consumer dies mid-batch the transaction rolls back and the items get picked up again.
+        Returns a (processed, failed) count tuple.
+        """
+        processed = 0
+        failed = 0
+
+        with transaction.atomic():
+            items = list(cls.objects.select_for_update(skip_locked=True).filter(available_date__lte=timezone.now())[:batchSize])
+            batch = []
+
+            for item in items:
+                try:
+                    batch.append((item, json.loads(bytes(item.raw_data).decode('utf-8'))))
+                except Exception as ex:
+                    item.recordFailure('Invalid report: %s' % ex, maxAttempts, retryDelay)
+                    failed += 1
+
+            try:
+                with transaction.atomic():
+                    results = LighthouseDataRaw.save_reports([rawReport for item, rawReport in batch], [item.ingest_key for item, rawReport in batch])
+            except Exception as ex:
+                results = []
+
+                for item, rawReport in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append(LighthouseDataRaw.save_reports([rawReport], [item.ingest_key])[0])
+                    except Exception as ex:
+                        results.append({'error': str(ex)})
+
+            doneIds = []
+
+            for (item, rawReport), result in zip(batch, results):
+                if 'error' in result:
+                    item.recordFailure(result['error'], maxAttempts, retryDelay)
+                    failed += 1
+                else:
+                    doneIds.append(item.id)
+
+            cls.objects.filter(id__in=doneIds).delete()
+            processed = len(doneIds)
+
+        return (processed, failed)
+
+    def recordFailure(self, error, maxAttempts, retryDelay):
+        """
+        Push the item back in the queue with a linear backoff, or dead-letter it
+        once it's used up all its attempts.
+        """
+        self.attempts += 1
+        self.last_error = error
+
+        if self.attempts >= maxAttempts:
+            ReportDeadLetter.objects.create(
+                queued_date = self.created_date,
+                raw_data = self.raw_data,
+                ingest_key = self.ingest_key,
+                attempts = self.attempts,
+                last_error = error,
+            )
+            self.delete()
+        else:
+            self.available_date = timezone.now() + datetime.timedelta(seconds=retryDelay * self.attempts)
+            self.save()
+
+
+class ReportDeadLetter(models.Model):
+    """
+    A queued report that failed every processing attempt.
+    Kept so it can be looked at in the admin and re-queued once whatever broke it is fixed:
+        ./manage.py process_report_queue --requeue-dead-letters
+    """
+
+    created_date = models.DateTimeField(auto_now_add=True)
+    queued_date = models.DateTimeField()
+    raw_data = models.BinaryField()
+    ingest_key = models.CharField(max_length=64, blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_date']
+
+    def __str__(self):
+        return "%s - %s" % (self.queued_date, self.last_error,)
+
+    @classmethod
+    def requeueAll(cls):
+        """
+        Move every dead letter back into the report queue, with a fresh set of attempts.
+        Returns the # of items re-queued.
+        """
+        with transaction.atomic():
+            deadLetters = list(cls.objects.select_for_update())
+
+            ReportQueueItem.objects.bulk_create([
+                ReportQueueItem(raw_data=deadLetter.raw_data, ingest_key=deadLetter.ingest_key) for deadLetter in deadLetters
+            ])
+            cls.objects.filter(id__in=[deadLetter.id for deadLetter in deadLetters]).delete()
+
+        return len(deadLetters)
+
+
 class BannerNotification(models.Model):
     """
     Allows you to create a site-wide banner at the top of the page for site-wide
@@ -913,6 +1788,25 @@ class PageView(models.Model):
     def __str__(self):
         return "%s : %s" % (self.view_count, self.url)
 
+    @classmethod
+    def addViews(cls, viewCounts):
+        """
+        Add a {url: # of views} dict to the counts, creating PageViews as needed, in one
+        INSERT ... ON CONFLICT statement. The counts are added in SQL, so concurrent adds never lose views.
+        """
+        if not viewCounts:
+            return
+
+        urls = list(viewCounts)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {table} (created_date, modified_date, url, view_count) '
+                'SELECT now(), now(), views.url, views.view_count FROM unnest(%s::varchar[], %s::integer[]) AS views(url, view_count) '
+                'ON CONFLICT (url) DO UPDATE SET view_count = {table}.view_count + EXCLUDED.view_count, modified_date = EXCLUDED.modified_date'.format(table=cls._meta.db_table),
+                [urls, [viewCounts[url] for url in urls]]
+            )
+
 
 class UrlFilterPart(models.Model):
     """
@@ -959,10 +1853,32 @@ class UrlFilterPart(models.Model):
     def __str__(self):
         return "%s: %s => %s" % (self.prop, self.filter_key or None, self.filter_val,)
 
+    def save(self, *args, **kwargs):
+        """
+        Override save to rebuild the filter's URL membership with the changed part.
+        """
+        with transaction.atomic():
+            super(UrlFilterPart, self).save(*args, **kwargs)
+            self.url_filter.rebuildMembership()
+
+    def delete(self, *args, **kwargs):
+        """
+        Override delete to rebuild the filter's URL membership without this part.
+        Parts deleted in bulk (i.e. QuerySet.delete()) don't come through here, run:  manage.py rebuild_filter_membership
+        """
+        urlFilter = self.url_filter
+
+        with transaction.atomic():
+            result = super(UrlFilterPart, self).delete(*args, **kwargs)
+            urlFilter.rebuildMembership()
+
+        return result
+
 
 class UrlFilter(models.Model):
     """
     A named UrlFilter. Allows users to create and save a filter for reuse and shared usage.
+    A URL has to match all of a filter's parts, so a filter with no parts (i.e. one that was just created) matches every URL.
     """
 
     created_date = models.DateTimeField(auto_now_add=True, editable=False)
@@ -977,6 +1893,19 @@ class UrlFilter(models.Model):
     def __str__(self):
         return "%s" % (self.name)
 
+    def save(self, *args, **kwargs):
+        """
+        Override save to build a new filter's URL membership. It has no parts yet, so that's every URL.
+        After that, its parts keep it current (see UrlFilterPart.save).
+        """
+        adding = self._state.adding
+
+        with transaction.atomic():
+            super(UrlFilter, self).save(*args, **kwargs)
+
+            if adding:
+                self.rebuildMembership()
+
     def get_filter_safe(filter_slug):
         try:
             return UrlFilter.objects.get(slug=filter_slug)
@@ -985,10 +1914,17 @@ class UrlFilter(models.Model):
 
     def run_query(self):
         """
-        Get all of the filter parts and create a set of urls
-        to do dashboard operations on.
+        Get the set of urls matching this filter to do dashboard operations on.
+        Reads the filter's materialized UrlFilterMembership rows, so it's a single indexed join.
         """
-        filter_parts = UrlFilterPart.objects.filter(url_filter=self)
+        return Url.objects.filter(url_filter_membership_url__url_filter=self)
+
+    def get_matching_urls(self):
+        """
+        Get all of the filter parts and create a set of urls matching them, straight from the URLs' location data.
+        Used to (re)build the filter's UrlFilterMembership rows.
+        """
+        filter_parts = self.url_filter_part_url_filter.all()
 
         and_condition = Q()
         
@@ -1000,6 +1936,26 @@ class UrlFilter(models.Model):
 
         return query_set
 
+    def rebuildMembership(self):
+        """
+        Replace this filter's UrlFilterMembership rows with the URLs that match it now.
+        """
+        with transaction.atomic():
+            UrlFilterMembership.objects.filter(url_filter=self).delete()
+            UrlFilterMembership.insertMatches(self, self.get_matching_urls())
+
+    @classmethod
+    def rebuildAllMemberships(cls):
+        """
+        Rebuild every filter's UrlFilterMembership rows. Returns the number of filters.
+        """
+        urlFilters = list(cls.objects.prefetch_related('url_filter_part_url_filter'))
+
+        for urlFilter in urlFilters:
+            urlFilter.rebuildMembership()
+
+        return len(urlFilters)
+
     def make_query_object(self, part):
         """
         Create an object that can be used in a Q() and_condition.
@@ -1031,3 +1987,53 @@ class UrlFilter(models.Model):
 
             return obj
 
+
+class UrlFilterMembership(models.Model):
+    """
+    Materialized UrlFilter results: a row for each URL that matches a filter.
+    Filtered views join on this instead of re-running the filter's location data query on every request.
+    Kept current when a Url's URL changes (see updateForUrls) and when a filter's parts change
+    (see UrlFilter.rebuildMembership). Rebuild them all with:  manage.py rebuild_filter_membership
+    """
+
+    url_filter = models.ForeignKey('UrlFilter',
+                                   related_name='url_filter_membership_url_filter',
+                                   on_delete=models.CASCADE)
+    url = models.ForeignKey('Url',
+                            related_name='url_filter_membership_url',
+                            on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('url_filter', 'url',)
+
+    def __str__(self):
+        return '%s: %s' % (self.url_filter_id, self.url_id,)
+
+    @classmethod
+    def insertMatches(cls, urlFilter, urls):
+        """
+        Add the URLs of a Url queryset to a filter, with one INSERT ... SELECT.
+        """
+        sql, params = urls.order_by().values('id').query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (url_filter_id, url_id) SELECT %%s, matches.id FROM (%s) matches ON CONFLICT DO NOTHING' % (cls._meta.db_table, sql),
+                [urlFilter.id] + list(params)
+            )
+
+    @classmethod
+    def updateForUrls(cls, urlIds):
+        """
+        Re-check which filters a batch of Urls match, after their URLs changed.
+        One DELETE, plus one INSERT ... SELECT per filter.
+        """
+        if not urlIds:
+            return
+
+        with transaction.atomic():
+            cls.objects.filter(url_id__in=urlIds).delete()
+
+            for urlFilter in UrlFilter.objects.prefetch_related('url_filter_part_url_filter'):
+                cls.insertMatches(urlFilter, urlFilter.get_matching_urls().filter(id__in=urlIds))
+
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DataError
+from django.dispatch import receiver
+
+from .models import PageView
+
+
+##
+##  Buffered page view counting.
+##
+##  The {% trackPageView %} tag only adds to an in-process count, it never touches the database.
+##  Each process adds its counts to the PageView table every PAGE_VIEW_FLUSH_SECONDS, in one
+##  statement (PageView.addViews), once a request has finished and it's response has been sent.
+##  A process that stops loses at most that many seconds of it's views, fine for rough usage stats.
+##
+##
+
+viewCounts = Counter()
+viewCountsLock = threading.Lock()
+lastFlushTime = time.monotonic()
+
+
+## Longest path PageView.url holds. Longer ones are cut to fit, or they'd fail the whole flush.
+MAX_PATH_LENGTH = PageView._meta.get_field('url').max_length
+
+
+def recordPageView(path):
+    path = path[:MAX_PATH_LENGTH]
+
+    with viewCountsLock:
+        viewCounts[path] += 1
+
+
+def flushPageViews():
+    """
+    Add the buffered counts to the PageView table, and empty the buffer.
+    If that fails, the counts go back in the buffer for the next flush. Unless the counts themselves
+    are what the database rejected, then they'd fail every flush after this one too, so they're dropped.
+    """
+    global viewCounts, lastFlushTime
+
+    with viewCountsLock:
+        flushCounts = viewCounts
+        viewCounts = Counter()
+        lastFlushTime = time.monotonic()
+
+    try:
+        PageView.addViews(flushCounts)
+    except DataError:
+        raise
+    except Exception:
+        with viewCountsLock:
+            viewCounts.update(flushCounts)
+
+        raise
+
+
+@receiver(request_finished, dispatch_uid='report.pageviews.flushPageViewsAfterRequest')
+def flushPageViewsAfterRequest(sender, **kwargs):
+    if viewCounts and time.monotonic() - lastFlushTime >= settings.PAGE_VIEW_FLUSH_SECONDS:
+        try:
+            flushPageViews()
+        except Exception:
+            ## Page views aren't worth a failed request, they'll be tried again next time.
+            pass
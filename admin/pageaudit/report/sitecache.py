@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.contrib.flatpages.models import FlatPage
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import BannerNotification, UrlFilter
+
+
+##
+##  Cache of the site-wide data every page renders around it's main content: the active banners,
+##  the URL filter list and the flatpages nav.
+##
+##  Everything is cached under keys that include a version number. Saving or deleting any of the
+##  models it comes from bumps the version (see the signals at the bottom), so the next render
+##  rebuilds it. Django's default cache is per process, so a save only bumps the version in the
+##  process that did it. The others pick it up when their copy expires after SITE_CACHE_SECONDS,
+##  or right away if DJANGO_CACHE_BACKEND is set to a shared cache.
+##
+##
+
+SITE_CACHE_VERSION_KEY = 'sitecache:version'
+
+
+def getNewSiteCacheVersion():
+    """
+    Starting version number, for when there's none in the cache (yet, or anymore, i.e. it was culled).
+    It's the current time in ms, so it's past any version used before, and old entries that are still
+    cached never come back.
+    """
+    return int(time.time() * 1000)
+
+
+def getSiteCacheVersion():
+    version = cache.get(SITE_CACHE_VERSION_KEY)
+
+    if version is None:
+        version = getNewSiteCacheVersion()
+        cache.add(SITE_CACHE_VERSION_KEY, version, None)
+        version = cache.get(SITE_CACHE_VERSION_KEY, version)
+
+    return version
+
+
+def bumpSiteCacheVersion(**kwargs):
+    try:
+        cache.incr(SITE_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.add(SITE_CACHE_VERSION_KEY, getNewSiteCacheVersion(), None)
+
+
+def getCached(name, build):
+    """
+    The cached value of 'name', or build() it and cache it if it's not cached, or is an old version.
+    """
+    key = 'sitecache:%s:%s' % (name, getSiteCacheVersion())
+    value = cache.get(key)
+
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.SITE_CACHE_SECONDS)
+
+    return value
+
+
+def getActiveBanners():
+    return getCached('banners', lambda: list(BannerNotification.objects.filter(active=True)))
+
+
+def getUrlFilters():
+    return getCached('filters', lambda: list(UrlFilter.objects.all()))
+
+
+def getFlatpages():
+    """
+    This site's flatpages for the nav. Like {% get_flatpages %} without a user, that leaves out
+    the ones only for signed-in users.
+    """
+    return getCached('flatpages', lambda: list(FlatPage.objects.filter(sites=settings.SITE_ID, registration_required=False)))
+
+
+for model in (BannerNotification, UrlFilter, FlatPage):
+    post_save.connect(bumpSiteCacheVersion, sender=model, dispatch_uid='report.sitecache.save.%s' % model.__name__)
+    post_delete.connect(bumpSiteCacheVersion, sender=model, dispatch_uid='report.sitecache.delete.%s' % model.__name__)
+
+m2m_changed.connect(bumpSiteCacheVersion, sender=FlatPage.sites.through, dispatch_uid='report.sitecache.flatpagesites')
@@ -0,0 +1,336 @@
+import datetime
+import glob
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+
+from django.conf import settings
+from django.utils import timezone
+
+from .helpers import startOfDay
+from .models import LighthouseRun, Url, UserTimingMeasure
+
+
+##
+##  Columnar snapshots of the LighthouseRun history, for analytics outside of PostgreSQL.
+##
+##  Runs and their user-timing measures are written as Arrow IPC files, partitioned by the day
+##  the run was created:
+##      <SNAPSHOT_DIR>/runs/date=2018-10-17/part-<first run id>-<last run id>.arrow
+##      <SNAPSHOT_DIR>/measures/date=2018-10-17/part-<first run id>-<last run id>.arrow
+##      <SNAPSHOT_DIR>/urls.arrow
+##
+##  Each snapshot only appends runs newer than the highest run ID already written, so a daily
+##  ./manage.py snapshot_runs just adds the previous day's partition. urls.arrow is small and
+##  rewritten every time. The files are uncompressed so SnapshotReader can memory-map them,
+##  pandas users can just do:  SnapshotReader().runs().to_pandas()
+##
+##
+
+SNAPSHOT_KPI_FIELDS = (
+    'accessibility_score',
+    'performance_score',
+    'seo_score',
+    'dom_content_loaded',
+    'dom_loaded',
+    'first_contentful_paint',
+    'first_meaningful_paint',
+    'interactive',
+    'number_network_requests',
+    'redirect_hops',
+    'redirect_wasted_ms',
+    'time_to_first_byte',
+    'total_byte_weight',
+    'masthead_onscreen',
+)
+
+RUN_SCHEMA = pa.schema(
+    [
+        ('id', pa.int64()),
+        ('url_id', pa.int64()),
+        ('created_date', pa.timestamp('us', tz='UTC')),
+        ('date', pa.date32()),
+        ('invalid_run', pa.bool_()),
+        ('http_error_code', pa.int32()),
+    ] + [(field, pa.int64()) for field in SNAPSHOT_KPI_FIELDS]
+)
+
+MEASURE_SCHEMA = pa.schema([
+    ('lighthouse_run_id', pa.int64()),
+    ('url_id', pa.int64()),
+    ('date', pa.date32()),
+    ('name', pa.string()),
+    ('start_time', pa.int64()),
+    ('duration', pa.int64()),
+    ('invalid_run', pa.bool_()),
+])
+
+URL_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('url', pa.string()),
+    ('created_date', pa.timestamp('us', tz='UTC')),
+    ('inactive', pa.bool_()),
+    ('sequence', pa.int64()),
+    ('owner', pa.string()),
+    ('hostname', pa.string()),
+    ('pathname', pa.string()),
+])
+
+## Max runs per part file. A day with more runs than this is written as several parts.
+SNAPSHOT_PART_ROWS = 100000
+SNAPSHOT_CHUNK_SIZE = 2000
+
+PART_NAME_RE = re.compile(r'^part-(\d+)-(\d+)\.arrow$')
+PARTITION_NAME_RE = re.compile(r'^date=(\d{4}-\d{2}-\d{2})$')
+
+
+def getSnapshotDir(root=None):
+    return root or settings.REPORT_SNAPSHOT_DIR
+
+
+def writeTable(table, path):
+    """
+    Write an Arrow table to an IPC file. Written to a temp file and moved into place, so readers
+    never see half a file, and a snapshot that died part way can just be run again.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tempPath = path + '.tmp'
+
+    with pa.OSFile(tempPath, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    os.replace(tempPath, path)
+
+
+def readTable(path):
+    """
+    Memory-map an Arrow IPC file. The table's buffers point straight into the mapped file.
+    """
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def getPartPaths(root, tableName, startDate=None, endDate=None):
+    """
+    Part file paths of a partitioned table, oldest first. Dates are inclusive.
+    """
+    paths = []
+
+    for partitionPath in sorted(glob.glob(os.path.join(root, tableName, 'date=*'))):
+        match = PARTITION_NAME_RE.match(os.path.basename(partitionPath))
+
+        if not match:
+            continue
+
+        date = datetime.datetime.strptime(match.group(1), '%Y-%m-%d').date()
+
+        if (startDate and date < startDate) or (endDate and date > endDate):
+            continue
+
+        partNames = [name for name in os.listdir(partitionPath) if PART_NAME_RE.match(name)]
+        partNames.sort(key=lambda name: int(PART_NAME_RE.match(name).group(1)))
+        paths.extend(os.path.join(partitionPath, name) for name in partNames)
+
+    return paths
+
+
+def getLastRunId(root=None):
+    """
+    Highest run ID already in the snapshot, or 0 if there isn't one yet.
+    """
+    lastIds = [int(PART_NAME_RE.match(os.path.basename(path)).group(2)) for path in getPartPaths(getSnapshotDir(root), 'runs')]
+
+    return max(lastIds, default=0)
+
+
+def getPartPath(root, tableName, date, runIds):
+    return os.path.join(root, tableName, 'date=%s' % date.isoformat(), 'part-%s-%s.arrow' % (runIds[0], runIds[-1]))
+
+
+def getRunColumns(rows):
+    """
+    {column name: [values]} for a list of run values_list rows (see writeSnapshot).
+    """
+    columns = {name: [] for name in RUN_SCHEMA.names}
+    fieldNames = ['id', 'url_id', 'created_date', 'invalid_run', 'http_error_code'] + list(SNAPSHOT_KPI_FIELDS)
+
+    for row in rows:
+        for name, value in zip(fieldNames, row):
+            columns[name].append(value)
+
+        columns['date'].append(timezone.localtime(row[2]).date())
+
+    return columns
+
+
+def writeRunsPart(root, date, rows):
+    """
+    Write one part of runs, all from the same day, and the part of user-timing measures that go with it.
+    The measures go first, the runs part is what marks these runs as written.
+    """
+    runs = pa.Table.from_pydict(getRunColumns(rows), schema=RUN_SCHEMA)
+    runIds = runs.column('id').to_pylist()
+    invalidRunIds = {row[0] for row in rows if row[3]}
+
+    measureColumns = {name: [] for name in MEASURE_SCHEMA.names}
+    measures = UserTimingMeasure.objects.filter(
+        lighthouse_run_id__gte=runIds[0],
+        lighthouse_run_id__lte=runIds[-1],
+    ).order_by('lighthouse_run_id', 'id').values_list('lighthouse_run_id', 'url_id', 'name__name', 'start_time', 'duration')
+
+    ## IDs are a range, but runs of another day could be in it if they were saved out of order.
+    runIdSet = set(runIds)
+
+    for runId, urlId, name, startTime, duration in measures.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        if runId in runIdSet:
+            for column, value in zip(('lighthouse_run_id', 'url_id', 'name', 'start_time', 'duration'), (runId, urlId, name, startTime, duration)):
+                measureColumns[column].append(value)
+
+            measureColumns['date'].append(date)
+            measureColumns['invalid_run'].append(runId in invalidRunIds)
+
+    writeTable(pa.Table.from_pydict(measureColumns, schema=MEASURE_SCHEMA), getPartPath(root, 'measures', date, runIds))
+    writeTable(runs, getPartPath(root, 'runs', date, runIds))
+
+
+def writeUrls(root):
+    columns = {name: [] for name in URL_SCHEMA.names}
+    urls = Url.objects.order_by('id').values_list('id', 'url', 'created_date', 'inactive', 'sequence', 'owner__owner_name', 'hostname', 'pathname')
+
+    for row in urls.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        for name, value in zip(URL_SCHEMA.names, row):
+            columns[name].append(value)
+
+    writeTable(pa.Table.from_pydict(columns, schema=URL_SCHEMA), os.path.join(root, 'urls.arrow'))
+
+    return len(columns['id'])
+
+
+def writeSnapshot(root=None, until=None, partRows=SNAPSHOT_PART_ROWS):
+    """
+    Append runs newer than the last snapshot, created before the 'until' date (default today), so
+    only whole days are written. Rewrites urls.arrow.
+    Returns a (runs written, parts written, urls written) tuple.
+    """
+    root = getSnapshotDir(root)
+    until = until or timezone.localdate()
+
+    runs = LighthouseRun.objects.filter(
+        id__gt=getLastRunId(root),
+        created_date__lt=startOfDay(until),
+    ).order_by('id').values_list('id', 'url_id', 'created_date', 'invalid_run', 'http_error_code', *SNAPSHOT_KPI_FIELDS)
+
+    runCount = 0
+    partCount = 0
+    partDate = None
+    partRowList = []
+
+    for row in runs.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        date = timezone.localtime(row[2]).date()
+
+        if partRowList and (date != partDate or len(partRowList) >= partRows):
+            writeRunsPart(root, partDate, partRowList)
+            runCount += len(partRowList)
+            partCount += 1
+            partRowList = []
+
+        partDate = date
+        partRowList.append(row)
+
+    if partRowList:
+        writeRunsPart(root, partDate, partRowList)
+        runCount += len(partRowList)
+        partCount += 1
+
+    urlCount = writeUrls(root)
+
+    return (runCount, partCount, urlCount)
+
+
+class SnapshotReader:
+    """
+    Reads a snapshot written by writeSnapshot, without touching the database.
+    Every method returns a pyarrow Table, or a list of tuples for the *OverTime methods.
+    Dates are inclusive datetime.dates, and only the partitions in range are mapped.
+
+    Usage:
+        reader = SnapshotReader()
+        reader.kpiOverTime('performance_score', startDate=datetime.date(2018, 1, 1), urlIds=[12, 13])
+        reader.runs(columns=['url_id', 'date', 'interactive']).to_pandas()
+    """
+
+    def __init__(self, root=None):
+        self.root = getSnapshotDir(root)
+
+    def readPartitions(self, tableName, schema, startDate=None, endDate=None):
+        tables = [readTable(path) for path in getPartPaths(self.root, tableName, startDate, endDate)]
+
+        if not tables:
+            return schema.empty_table()
+
+        return pa.concat_tables(tables)
+
+    def runs(self, startDate=None, endDate=None, urlIds=None, columns=None, includeInvalid=False):
+        table = self.readPartitions('runs', RUN_SCHEMA, startDate, endDate)
+
+        if not includeInvalid:
+            table = table.filter(pc.invert(table.column('invalid_run')))
+
+        if urlIds is not None:
+            table = table.filter(pc.is_in(table.column('url_id'), value_set=pa.array(urlIds, pa.int64())))
+
+        return table.select(columns) if columns else table
+
+    def measures(self, startDate=None, endDate=None, urlIds=None, names=None, includeInvalid=False):
+        table = self.readPartitions('measures', MEASURE_SCHEMA, startDate, endDate)
+
+        if not includeInvalid:
+            table = table.filter(pc.invert(table.column('invalid_run')))
+
+        if urlIds is not None:
+            table = table.filter(pc.is_in(table.column('url_id'), value_set=pa.array(urlIds, pa.int64())))
+
+        if names is not None:
+            table = table.filter(pc.is_in(table.column('name'), value_set=pa.array(names, pa.string())))
+
+        return table
+
+    def urls(self):
+        path = os.path.join(self.root, 'urls.arrow')
+
+        if not os.path.exists(path):
+            return URL_SCHEMA.empty_table()
+
+        return readTable(path)
+
+    def kpiOverTime(self, kpi, startDate=None, endDate=None, urlIds=None):
+        """
+        Daily average of a KPI over valid runs.
+        Returns a list of (date, average, number of runs) tuples, oldest first.
+        """
+        if kpi not in SNAPSHOT_KPI_FIELDS:
+            raise ValueError('Unknown KPI: %s' % kpi)
+
+        return self.getDailyAverages(self.runs(startDate, endDate, urlIds, columns=['date', kpi]), kpi)
+
+    def measureOverTime(self, name, field='duration', startDate=None, endDate=None, urlIds=None):
+        """
+        Daily average of a user-timing measure's duration or start_time over valid runs.
+        Returns a list of (date, average, number of measures) tuples, oldest first.
+        """
+        if field not in ('duration', 'start_time'):
+            raise ValueError('Unknown measure field: %s' % field)
+
+        return self.getDailyAverages(self.measures(startDate, endDate, urlIds, names=[name]), field)
+
+    def getDailyAverages(self, table, field):
+        averages = table.group_by('date').aggregate([(field, 'mean'), (field, 'count')]).sort_by('date')
+
+        return list(zip(
+            averages.column('date').to_pylist(),
+            averages.column('%s_mean' % field).to_pylist(),
+            averages.column('%s_count' % field).to_pylist(),
+        ))
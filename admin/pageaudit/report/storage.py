@@ -0,0 +1,92 @@
+import hashlib
+import json
+import zlib
+
+
+##
+##  Compressed, de-duplicated storage for raw Lighthouse reports.
+##
+##  A report is split into a 'skeleton' and chunks. Every audit 'details' object bigger than
+##  CHUNK_MIN_BYTES (screenshot filmstrips, final-screenshot, network request lists, etc) is cut out,
+##  stored once as a zlib-compressed chunk keyed by the sha256 of its JSON, and replaced in the
+##  skeleton by a {CHUNK_REF_KEY: <hash>} pointer. The same blob in a later run is just another pointer.
+##  The skeleton itself is compressed too.
+##
+##
+
+CHUNK_MIN_BYTES = 4096
+CHUNK_REF_KEY = '$chunk'
+COMPRESSION_LEVEL = 6
+
+
+def toJson(data):
+    """
+    Canonical JSON, so the same data always gets the same hash.
+    """
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+def compressJson(data):
+    return zlib.compress(toJson(data).encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def decompressJson(compressed):
+    return json.loads(zlib.decompress(bytes(compressed)).decode('utf-8'))
+
+
+def splitReport(reportData, minChunkBytes=CHUNK_MIN_BYTES):
+    """
+    Split a report into it's skeleton and chunks. The report passed in isn't modified.
+    Returns a (skeleton, {hash: compressed chunk}) tuple.
+    """
+    chunks = {}
+    audits = reportData.get('audits')
+
+    if not isinstance(audits, dict):
+        return (reportData, chunks)
+
+    skeletonAudits = {}
+
+    for auditName, audit in audits.items():
+        details = audit.get('details') if isinstance(audit, dict) else None
+
+        if details is not None:
+            detailsJson = toJson(details)
+
+            if len(detailsJson) >= minChunkBytes:
+                chunkHash = hashlib.sha256(detailsJson.encode('utf-8')).hexdigest()
+                chunks[chunkHash] = zlib.compress(detailsJson.encode('utf-8'), COMPRESSION_LEVEL)
+                audit = dict(audit, details={CHUNK_REF_KEY: chunkHash})
+
+        skeletonAudits[auditName] = audit
+
+    return (dict(reportData, audits=skeletonAudits), chunks)
+
+
+def getChunkHashes(skeleton):
+    """
+    All the chunk hashes a skeleton points to.
+    """
+    hashes = set()
+
+    for audit in (skeleton.get('audits') or {}).values():
+        details = audit.get('details') if isinstance(audit, dict) else None
+
+        if isinstance(details, dict) and CHUNK_REF_KEY in details:
+            hashes.add(details[CHUNK_REF_KEY])
+
+    return hashes
+
+
+def joinReport(skeleton, chunks):
+    """
+    Put a report back together from it's skeleton and a {hash: compressed chunk} dict.
+    Modifies and returns the skeleton.
+    """
+    for audit in (skeleton.get('audits') or {}).values():
+        details = audit.get('details') if isinstance(audit, dict) else None
+
+        if isinstance(details, dict) and CHUNK_REF_KEY in details:
+            audit['details'] = decompressJson(chunks[details[CHUNK_REF_KEY]])
+
+    return skeleton
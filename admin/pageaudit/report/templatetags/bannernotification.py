@@ -1,14 +1,15 @@
 from django import template
 
-from report.models import BannerNotification
+from report.sitecache import getActiveBanners
 
 register = template.Library()
 
 
 ##
 ##  Gets all active banners and displays them at page top, using the 'banner_notification.html' template.
+##  Active banners are cached, see report/sitecache.py.
 ##
 @register.inclusion_tag("partials/banner_notification.html")
 def bannerNotification():
-    return {"banners": BannerNotification.objects.filter(active=True)}
+    return {"banners": getActiveBanners()}
 
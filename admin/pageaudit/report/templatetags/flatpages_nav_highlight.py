@@ -1,8 +1,20 @@
 from django import template
 from django.conf import settings
 
+from report.sitecache import getFlatpages
+
 register = template.Library()
 
+
+##
+## Flatpages for the site nav. Same as flatpages' {% get_flatpages %} (without a user, so never the
+##  registration_required ones), but cached (see report/sitecache.py).
+##
+@register.simple_tag
+def getNavFlatpages():
+    return getFlatpages()
+
+
 # settings value
 @register.simple_tag(takes_context=True)
 def highlight_nav_item(context, url):
@@ -1,25 +1,14 @@
 from django import template
 
-from report.models import PageView
+from report.pageviews import recordPageView
 
 register = template.Library()
 
 ##
-## On page template, increments the hit count to the URL, or creates it as 1.
+## On page template, counts a hit to the URL. Buffered in memory, see report/pageviews.py.
 ##
 @register.simple_tag(takes_context=True)
 def trackPageView(context):
-    request = context['request']
-    
-    try:
-        pvObj = PageView.objects.get(url=request.path)
-        pvObj.view_count = pvObj.view_count + 1
-        pvObj.save()
-    
-    except Exception as ex:
-        PageView.objects.create(
-            url = request.path,
-            view_count = 1
-        )
+    recordPageView(context['request'].path)
     
     return ""
@@ -0,0 +1,77 @@
+import json
+
+from django.contrib.auth.models import User
+
+from ..models import Url
+
+
+def makeReport(url, performance=0.8, accessibility=0.7, seo=0.9, statusCode=200, userTimings=None):
+    """
+    Smallest Lighthouse report that has every field save_report reads.
+    """
+    if userTimings is None:
+        userTimings = [
+            {'name': 'V18-masthead-load', 'timingType': 'Measure', 'startTime': 120.5, 'duration': 40.2},
+            {'name': 'page-ready', 'timingType': 'Measure', 'startTime': 300, 'duration': 900},
+            {'name': 'page-ready-mark', 'timingType': 'Mark', 'startTime': 1200},
+        ]
+
+    return {
+        'requestedUrl': url,
+        'finalUrl': url,
+        'categories': {
+            'performance': {'score': performance},
+            'accessibility': {'score': accessibility},
+            'seo': {'score': seo},
+        },
+        'audits': {
+            'total-byte-weight': {'rawValue': 1529392},
+            'network-requests': {
+                'rawValue': 42,
+                'details': {'items': [{'url': url, 'statusCode': statusCode}]},
+            },
+            'time-to-first-byte': {'rawValue': 210},
+            'first-meaningful-paint': {'rawValue': 1800},
+            'first-contentful-paint': {'rawValue': 1500},
+            'interactive': {'rawValue': 4200},
+            'screenshot-thumbnails': {
+                'details': {'items': [{'data': 'AAAA'}, {'data': '/9j/4AAQSkZJRg=='}]},
+            },
+            'metrics': {
+                'details': {'items': [{'observedDomContentLoaded': 1100, 'observedLoad': 3900}]},
+            },
+            'redirects': {
+                'rawValue': 320,
+                'details': {'items': [{'url': url, 'wastedMs': 320}]},
+            },
+            'user-timings': {
+                'details': {'items': userTimings},
+            },
+        },
+    }
+
+
+def makePayload(url, **kwargs):
+    """
+    Report POST body, the way the Node runner sends it: the report is a JSON string inside JSON.
+    """
+    return json.dumps({
+        'lhr': {},
+        'report': json.dumps(makeReport(url, **kwargs)),
+        'artifacts': {},
+    }).encode('utf-8')
+
+
+def getSuperuser():
+    """
+    The user test Urls are created by, created the first time it's needed.
+    """
+    superuser, created = User.objects.get_or_create(username='superuser', defaults={'is_staff': True, 'is_superuser': True})
+
+    return superuser
+
+
+def makeUrl(url, **kwargs):
+    superuser = getSuperuser()
+
+    return Url.objects.create(created_by=superuser, edited_by=superuser, url=url, **kwargs)
@@ -0,0 +1,68 @@
+import json
+
+from django.test import TestCase
+
+from ..models import *
+from .sample_reports import makePayload, makeReport, makeUrl
+
+class TestBatchIngest(TestCase):
+
+    def setUp(self):
+        self.urls = [
+            makeUrl('https://ibm.com/foo'),
+            makeUrl('https://ibm.com/bar'),
+        ]
+
+    def test_save_reports_matches_save_report(self):
+        ## Same 3 reports, one URL saved 1 at a time, the other in a batch.
+        scores = [(0.6, 200), (0.9, 200), (0.99, 404)]
+
+        for perf, statusCode in scores:
+            LighthouseDataRaw().save_report(raw_data=makePayload(self.urls[0].url, performance=perf, statusCode=statusCode))
+
+        results = LighthouseDataRaw.save_reports([
+            json.loads(makePayload(self.urls[1].url, performance=perf, statusCode=statusCode).decode('utf-8')) for perf, statusCode in scores
+        ])
+
+        self.assertEqual(len([result for result in results if 'run' in result]), 3)
+
+        single, batched = [Url.objects.get(id=url.id) for url in self.urls]
+
+        self.assertEqual(batched.lighthouse_run_id, results[-1]['run'])
+        self.assertEqual(batched.lighthouse_run.http_error_code, 404)
+
+        for field in ['number_samples', 'performance_score', 'interactive', 'masthead_onscreen', 'seo_score']:
+            self.assertEqual(getattr(single.url_kpi_average, field), getattr(batched.url_kpi_average, field))
+
+        self.assertEqual(LighthouseDataRaw.objects.filter(lighthouse_run__url=batched).count(), 3)
+        self.assertEqual(UserTimingMeasure.objects.filter(url=batched).count(), 6)
+        self.assertEqual(UserTimingMeasureName.objects.count(), 2)
+
+        singleTiming = UserTimingMeasureAverage.objects.get(url=single, name__name='page-ready')
+        batchedTiming = UserTimingMeasureAverage.objects.get(url=batched, name__name='page-ready')
+
+        self.assertEqual((singleTiming.duration, singleTiming.number_samples), (batchedTiming.duration, batchedTiming.number_samples))
+
+    def test_batch_endpoint_ndjson(self):
+        lines = [
+            makePayload(self.urls[0].url).decode('utf-8'),
+            json.dumps({'report': makeReport('https://ibm.com/unknown')}),
+        ]
+
+        response = self.client.post('/collect/reports/batch/', '\n'.join(lines), content_type='application/x-ndjson')
+        results = response.json()['results']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('run', results[0])
+        self.assertIn('error', results[1])
+        self.assertEqual(LighthouseRun.objects.count(), 1)
+
+    def test_url_variants(self):
+        LighthouseDataRaw().save_report(makePayload('HTTPS://IBM.com:443/foo/'))
+        results = LighthouseDataRaw.save_reports([{'report': makeReport('https://ibm.com/bar/')}])
+
+        self.assertEqual(LighthouseRun.objects.get(url=self.urls[0]).url_id, self.urls[0].id)
+        self.assertEqual(LighthouseRun.objects.get(id=results[0]['run']).url_id, self.urls[1].id)
+
+        response = self.client.get('/report/api/urlid/', {'url': 'https://ibm.com/foo/'})
+        self.assertEqual(response.json()['results']['urlid'], self.urls[0].id)
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import *
+from .sample_reports import makePayload, makeUrl
+
+class TestBrowse(TestCase):
+
+    def setUp(self):
+        for url, performance in [('https://ibm.com/foo/a', 0.8), ('https://ibm.com/bar', 0.95), ('https://ibm.com/foo/b', 0.3)]:
+            makeUrl(url)
+            LighthouseDataRaw().save_report(makePayload(url, performance=performance))
+
+        ## URLs without runs sort with nulls, and ties on a score are broken by ID.
+        for url in ['https://ibm.com/new/1', 'https://ibm.com/new/2']:
+            makeUrl(url)
+
+        LighthouseDataRaw().save_report(makePayload('https://ibm.com/new/1', performance=0.8))
+
+        urlFilter = UrlFilter.objects.create(name='foo filter', slug='foo')
+        UrlFilterPart.objects.create(prop='path_segment', filter_val='foo', url_filter=urlFilter)
+
+    def test_browse(self):
+        response = self.client.get('/report/browse/', {'sortby': 'perfscore', 'sortorder': 'asc'})
+        self.assertEqual([url.url for url in response.context['urls']], ['https://ibm.com/new/2', 'https://ibm.com/foo/b', 'https://ibm.com/foo/a', 'https://ibm.com/new/1', 'https://ibm.com/bar'])
+        self.assertFalse(response.context['hasNextPage'])
+
+        response = self.client.get('/report/browse/', {'sortby': 'perfscore', 'filter': 'foo'})
+        self.assertEqual([url.url for url in response.context['urls']], ['https://ibm.com/foo/a', 'https://ibm.com/foo/b'])
+
+    def test_cursor_pages(self):
+        for sortby in ['url', 'date', 'a11yscore', 'perfscore', 'seoscore']:
+            for sortorder in ['asc', 'desc']:
+                options = {'sortby': sortby, 'sortorder': sortorder}
+                pages = []
+                cursor = None
+
+                while True:
+                    urls, cursor = Url.getUrlsPage(options, cursor, pageSize=2)
+                    pages.extend(urls)
+
+                    if cursor is None:
+                        break
+
+                self.assertEqual(pages, list(Url.getUrls(options)), (sortby, sortorder))
+
+    def test_load_more(self):
+        response = self.client.get('/report/api/browse/items/', {'sortby': 'perfscore'})
+        self.assertTrue(response.json()['hasNextPage'] is False)
+
+        urls, cursor = Url.getUrlsPage({'sortby': 'perfscore'}, pageSize=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/report/api/browse/items/', {'sortby': 'perfscore', 'cursor': cursor})
+
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+        self.assertNotIn('ibm.com/bar<', response.json()['resultsHtml'])
+        self.assertIn('ibm.com/foo/b<', response.json()['resultsHtml'])
+
+        ## Bad cursors start from the top.
+        response = self.client.get('/report/api/browse/items/', {'sortby': 'perfscore', 'cursor': 'not a cursor'})
+        self.assertIn('ibm.com/bar<', response.json()['resultsHtml'])
+
+        ## Page numbers still work.
+        response = self.client.get('/report/api/browse/items/', {'filter': 'foo', 'page': 1})
+
+        self.assertEqual(response.json()['hasNextPage'], False)
+        self.assertIn('ibm.com/foo/a', response.json()['resultsHtml'])
+        self.assertNotIn('ibm.com/bar', response.json()['resultsHtml'])
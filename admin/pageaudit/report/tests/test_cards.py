@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..cards import getReportCardCache, getReportCardKey, getReportCardsHtml, renderReportCard
+from ..models import *
+from .sample_reports import makePayload, makeUrl
+
+class TestReportCards(TestCase):
+
+    def setUp(self):
+        getReportCardCache().clear()
+
+        for url, performance in [('https://ibm.com/foo', 0.8), ('https://ibm.com/bar', 0.95)]:
+            makeUrl(url)
+            LighthouseDataRaw().save_report(makePayload(url, performance=performance))
+
+        makeUrl('https://ibm.com/new')
+
+    def test_cards_are_cached(self):
+        urls = list(Url.objects.order_by('id'))
+        html = getReportCardsHtml(urls, 'perfscore')
+
+        for url in Url.objects.order_by('id').select_related('lighthouse_run', 'url_kpi_average'):
+            self.assertIn(renderReportCard(url, 'perfscore'), html)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(getReportCardsHtml(list(Url.objects.order_by('id')), 'perfscore'), html)
+
+        self.assertEqual(len(queries), 1)
+
+        ## Unknown modes are the default one.
+        self.assertEqual(getReportCardsHtml(urls, 'nonsense'), html)
+        self.assertNotEqual(getReportCardsHtml(urls, 'seoscore'), html)
+
+    def test_new_run_is_new_card(self):
+        url = Url.objects.get(url='https://ibm.com/foo')
+        key = getReportCardKey(url, 'perfscore')
+
+        LighthouseDataRaw().save_report(makePayload(url.url, performance=0.5))
+
+        self.assertNotEqual(getReportCardKey(Url.objects.get(id=url.id), 'perfscore'), key)
+
+    def test_browse_pages_use_cached_cards(self):
+        self.client.get('/report/browse/', {'sortby': 'perfscore'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/report/api/browse/items/', {'sortby': 'perfscore'})
+
+        self.assertIn('ibm.com/bar</div>', response.json()['resultsHtml'])
+        ## The cards are all cached, so no fetching the URLs' runs or averages.
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "report_lighthouserun"' in query['sql'] or 'FROM "report_urlkpiaverage"' in query['sql']])
+
+
+class TestReportCardsAtIngest(TransactionTestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+        makeUrl('https://ibm.com/foo')
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir)
+
+    def sharedCardCache(self):
+        """
+        A file cache, which every process sees, in place of the default per-process one.
+        """
+        return override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'reportcards': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.cacheDir},
+        })
+
+    def test_cards_are_rendered_at_ingest(self):
+        with self.sharedCardCache():
+            LighthouseDataRaw().save_report(makePayload('https://ibm.com/foo', performance=0.8))
+            url = Url.objects.get(url='https://ibm.com/foo')
+
+            for viewData in ['perfscore', 'a11yscore', 'seoscore']:
+                self.assertIsNotNone(getReportCardCache().get(getReportCardKey(url, viewData)))
+
+            LighthouseDataRaw.save_reports([makePayload('https://ibm.com/foo', performance=0.6)])
+            url = Url.objects.get(url='https://ibm.com/foo')
+
+            self.assertIsNotNone(getReportCardCache().get(getReportCardKey(url, 'perfscore')))
+
+    def test_not_rendered_at_ingest_into_a_process_cache(self):
+        getReportCardCache().clear()
+        LighthouseDataRaw().save_report(makePayload('https://ibm.com/foo', performance=0.8))
+        url = Url.objects.get(url='https://ibm.com/foo')
+
+        self.assertIsNone(getReportCardCache().get(getReportCardKey(url, 'perfscore')))
+
+    def test_render_errors_dont_fail_the_ingest(self):
+        with self.sharedCardCache(), mock.patch('report.cards.renderReportCard', side_effect=RuntimeError('template blew up')), self.assertLogs('report.cards', 'ERROR'):
+            response = self.client.post('/collect/report/', makePayload('https://ibm.com/foo'), content_type='text/plain')
+
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(LighthouseRun.objects.count(), 1)
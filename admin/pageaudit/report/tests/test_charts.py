@@ -0,0 +1,103 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..helpers import createHistoricalScoreChartData, getBucketedRunValues
+from ..models import *
+from .sample_reports import makeUrl
+
+class TestScoreCharts(TestCase):
+
+    def setUp(self):
+        self.url = makeUrl('https://ibm.com/foo')
+
+        for day, perf in enumerate([60, 71, 93]):
+            run = LighthouseRun.objects.create(url=self.url, performance_score=perf, accessibility_score=50, seo_score=day, number_network_requests=20)
+            LighthouseRun.objects.filter(id=run.id).update(created_date=timezone.make_aware(datetime.datetime(2018, 10, 15 + day, 12)))
+
+    def test_chart_data_is_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = createHistoricalScoreChartData(LighthouseRun.objects.filter(url=self.url).order_by('-created_date')[:2])
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('thumbnail_image', queries[0]['sql'])
+        self.assertEqual(data['columns'], [
+            ['x', '17-10-2018', '16-10-2018'],
+            ['Performance', 93, 71],
+            ['Accessibility ', 50, 50],
+            ['SEO', 2, 1],
+        ])
+
+        self.assertEqual(createHistoricalScoreChartData(None)['columns'], [['x'], ['Performance'], ['Accessibility '], ['SEO']])
+
+    def test_api_chart_scores(self):
+        response = self.client.get('/report/api/chart/scores/', {'urlid': self.url.id, 'range': '15'})
+
+        self.assertEqual(response.json()['results']['columns'][1], ['Performance', 93, 71, 60])
+
+    def test_api_date_ranges(self):
+        response = self.client.get('/report/api/chart/scores/', {'urlid': self.url.id, 'range': 'custom', 'startdate': '2018-10-16', 'enddate': '2018-10-16'})
+        self.assertEqual(response.json()['results']['columns'][0], ['x', '16-10-2018'])
+
+        response = self.client.get('/report/api/chart/scores/', {'urlid': self.url.id, 'range': 'all'})
+        self.assertEqual(response.json()['results']['columns'][1], ['Performance', 60, 71, 93])
+
+        response = self.client.get('/report/api/table/kpis/', {'urlid': self.url.id, 'range': 'custom', 'startdate': '2018-10-16'})
+        self.assertEqual(response.json()['results']['performance_score'], [71, 93])
+
+        response = self.client.get('/report/api/chart/scores/', {'urlid': self.url.id, 'range': 'custom', 'startdate': '16-10-2018'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_downsampling(self):
+        start = timezone.make_aware(datetime.datetime(2016, 1, 1))
+
+        LighthouseRun.objects.bulk_create([
+            LighthouseRun(url=self.url, performance_score=i % 10, seo_score=50, number_network_requests=20)
+            for i in range(1000)
+        ])
+
+        for i, runId in enumerate(LighthouseRun.objects.filter(seo_score=50).order_by('id').values_list('id', flat=True)):
+            LighthouseRun.objects.filter(id=runId).update(created_date=start + datetime.timedelta(days=i))
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = getBucketedRunValues(LighthouseRun.objects.filter(url=self.url, seo_score=50), ['performance_score', 'seo_score'], 100)
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(len(rows), 100)
+        self.assertEqual(rows[0], (start, 4, 50))
+        self.assertEqual([row[0] for row in rows], sorted(row[0] for row in rows))
+
+        ## Few enough runs, no downsampling.
+        self.assertEqual(len(getBucketedRunValues(LighthouseRun.objects.filter(url=self.url), ['seo_score'], 2000)), 1003)
+
+    def test_kpi_table_conditional_get(self):
+        params = {'urlid': self.url.id, 'range': '30'}
+        response = self.client.get('/report/api/table/kpis/', params)
+        results = response.json()['results']
+
+        self.assertEqual(results['performance_score'], [93, 71, 60])
+        self.assertEqual(len(results['created_date']), 3)
+        self.assertEqual(set(results), set(['id', 'created_date', 'performance_score', 'accessibility_score', 'seo_score', 'total_byte_weight', 'number_network_requests',
+                                            'time_to_first_byte', 'dom_content_loaded', 'first_contentful_paint', 'first_meaningful_paint', 'interactive', 'dom_loaded',
+                                            'redirect_hops', 'redirect_wasted_ms']))
+
+        with CaptureQueriesContext(connection) as queries:
+            notModified = self.client.get('/report/api/table/kpis/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(notModified.status_code, 304)
+        self.assertFalse([query for query in queries.captured_queries if 'performance_score' in query['sql']])
+
+        notModified = self.client.get('/report/api/table/kpis/', params, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(notModified.status_code, 304)
+
+        ## Another range, or a new run, is a new ETag.
+        self.assertNotEqual(self.client.get('/report/api/table/kpis/', {'urlid': self.url.id, 'range': '15'})['ETag'], response['ETag'])
+
+        LighthouseRun.objects.create(url=self.url, performance_score=80, number_network_requests=20)
+        response = self.client.get('/report/api/table/kpis/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results']['performance_score'], [80, 93, 71, 60])
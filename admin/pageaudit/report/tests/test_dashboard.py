@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import *
+from ..views import getDashboardCounts
+from .sample_reports import makePayload, makeUrl
+
+class TestDashboard(TestCase):
+
+    def setUp(self):
+        for url, performance, statusCode in [('https://ibm.com/foo/a', 0.8, 200), ('https://ibm.com/bar', 0.95, 200), ('https://ibm.com/foo/b', 0.3, 404)]:
+            makeUrl(url)
+            LighthouseDataRaw().save_report(makePayload(url, performance=performance, statusCode=statusCode))
+
+        urlFilter = UrlFilter.objects.create(name='foo filter', slug='foo')
+        UrlFilterPart.objects.create(prop='path_segment', filter_val='foo', url_filter=urlFilter)
+
+    def test_dashboard_counts(self):
+        with self.assertNumQueries(2):
+            context = getDashboardCounts()
+
+        self.assertEqual(self.client.get('/report/dashboard/').context['urlPerfCountGood'], 1)
+
+        self.assertEqual(context['totalTestedUrls'], 2)
+        self.assertEqual(context['scopedUrlsTestedCount'], 2)
+        self.assertEqual(context['urlGlobalPerfAvg'], 88)
+        self.assertEqual((context['urlPerfCountPoor'], context['urlPerfCountAvg'], context['urlPerfCountGood']), (0, 1, 1))
+        self.assertEqual((context['urlFiCountFast'], context['urlFiCountAvg'], context['urlFiCountSlow']), (0, 2, 0))
+        self.assertEqual(context['urlFcpCountFast'], 2)
+
+    def test_filtered_dashboard_counts(self):
+        urlFilter = UrlFilter.objects.get(slug='foo')
+
+        with self.assertNumQueries(2):
+            context = getDashboardCounts(urlFilter)
+
+        self.assertEqual(self.client.get('/report/dashboard/', {'filter': 'foo'}).context['filter'], urlFilter)
+        self.assertEqual(context['totalTestedUrls'], 2)
+        self.assertEqual(context['scopedUrlsTestedCount'], 1)
+        self.assertEqual(context['urlGlobalPerfAvg'], 80)
+        self.assertEqual((context['urlPerfCountPoor'], context['urlPerfCountAvg'], context['urlPerfCountGood']), (0, 1, 0))
+        self.assertEqual(context['urlFiCountAvg'], 1)
+
+    def test_filtered_averages_subquery(self):
+        urlFilter = UrlFilter.objects.get(slug='foo')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(UrlKpiAverage.getFilteredAverages(urlFilter.run_query()).count(), 1)
+
+        out = StringIO()
+        call_command('benchmark_filtered_queries', urls=50, iterations=1, stdout=out)
+
+        self.assertIn('Added 50 synthetic URLs', out.getvalue())
+        self.assertFalse(UrlFilter.objects.filter(slug='benchmark-filter').exists())
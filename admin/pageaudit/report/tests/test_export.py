@@ -0,0 +1,57 @@
+import csv
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+
+from ..export import exportLines, getExportRuns
+from ..import_csv import write_report_csv
+from ..models import *
+from .sample_reports import makePayload, makeUrl
+
+class TestExport(TestCase):
+
+    def setUp(self):
+        for url in ['https://ibm.com/foo', 'https://ibm.com/bar']:
+            makeUrl(url, sequence=7)
+            LighthouseDataRaw().save_report(makePayload(url))
+
+        self.urlFilter = UrlFilter.objects.create(name='foo filter', slug='foo')
+        UrlFilterPart.objects.create(prop='path_segment', filter_val='foo', url_filter=self.urlFilter)
+
+    def test_export_one_query(self):
+        runs = getExportRuns(includeUserTiming=True)
+
+        with self.assertNumQueries(1):
+            rows = list(csv.reader(''.join(exportLines(runs, 'csv')).splitlines()))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][3], 'https://ibm.com/foo')
+        self.assertEqual(rows[1][-2], '7')
+        self.assertEqual(len(json.loads(rows[1][-1])['items']), 3)
+
+    def test_export_api(self):
+        response = self.client.get('/report/api/export/runs/', {'format': 'ndjson', 'filter': 'foo', 'startdate': '2000-01-01'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([row['url'] for row in rows], ['https://ibm.com/foo'])
+        self.assertIsNone(rows[0]['user_timing_data'])
+
+        response = self.client.get('/report/api/export/runs/', {'enddate': '2000-01-01'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+        self.assertEqual(self.client.get('/report/api/export/runs/', {'startdate': '2000-13-01'}).status_code, 400)
+
+    def test_legacy_csv_keeps_old_values(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.csv', delete=False) as f:
+            write_report_csv(f.name, include_user_timing=True)
+            rows = list(csv.reader(f))
+
+        os.remove(f.name)
+        run = LighthouseRun.objects.get(url__url='https://ibm.com/foo')
+
+        self.assertEqual(rows[1][0], str(run.id))
+        self.assertEqual(rows[1][-2], str(run.url_id))
+        self.assertEqual(rows[1][-1], str(LighthouseDataUsertiming.objects.get(lighthouse_run=run).report_data))
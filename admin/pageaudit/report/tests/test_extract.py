@@ -0,0 +1,61 @@
+import json
+
+from django.test import SimpleTestCase
+
+from ..extract import *
+from .sample_reports import makePayload, makeReport
+
+class TestExtractReportFields(SimpleTestCase):
+
+    def test_extractReportFields(self):
+        fields = extractReportFields(makeReport('https://ibm.com/foo', performance=0.83))
+
+        self.assertEqual(fields.run['performance_score'], 83)
+        self.assertEqual(fields.run['accessibility_score'], 70)
+        self.assertEqual(fields.run['seo_score'], 90)
+        self.assertEqual(fields.run['number_network_requests'], 42)
+        self.assertEqual(fields.run['dom_content_loaded'], 1100)
+        self.assertEqual(fields.run['dom_loaded'], 3900)
+        self.assertEqual(fields.thumbnail, '/9j/4AAQSkZJRg==')
+        self.assertEqual(fields.run['redirect_hops'], 1)
+        self.assertEqual(fields.run['redirect_wasted_ms'], 320)
+        self.assertEqual(fields.run['masthead_onscreen'], 120.5)
+        self.assertFalse(fields.run['invalid_run'])
+        self.assertIsNone(fields.run['http_error_code'])
+        self.assertEqual(len(fields.userTimings), 3)
+        self.assertEqual(fields.redirects[0]['wastedMs'], 320)
+
+    def test_extractReportFields_errorPage(self):
+        fields = extractReportFields(makeReport('https://ibm.com/foo', statusCode=404))
+
+        self.assertTrue(fields.run['invalid_run'])
+        self.assertEqual(fields.run['http_error_code'], 404)
+
+    def test_extractReportFields_missingData(self):
+        report = makeReport('https://ibm.com/foo', performance=None)
+        del report['audits']['metrics']
+        report['audits']['screenshot-thumbnails']['details']['items'] = []
+        report['audits']['redirects'] = None
+
+        fields = extractReportFields(report)
+
+        self.assertEqual(fields.run['performance_score'], 0)
+        self.assertEqual(fields.run['dom_loaded'], 0)
+        self.assertEqual(fields.thumbnail, '')
+        self.assertEqual(fields.run['redirect_hops'], 0)
+        self.assertEqual(fields.redirects, [])
+        self.assertEqual(extractReportFields({}).run['masthead_onscreen'], 0)
+
+    def test_payloadShapes(self):
+        report = makeReport('https://ibm.com/foo')
+
+        reportData, reportJson = loadReportPayload(makePayload('https://ibm.com/foo'))
+
+        self.assertEqual(reportData, report)
+        self.assertEqual(json.loads(reportJson), report)
+        self.assertEqual(getReportFromPayload({'report': report}), (report, None))
+        self.assertEqual(getReportFromPayload({'lhr': report, 'report': None}), (report, None))
+        self.assertEqual(getReportFromPayload(report), (report, None))
+
+        with self.assertRaises(ValueError):
+            getReportFromPayload({'lhr': {}, 'report': ''})
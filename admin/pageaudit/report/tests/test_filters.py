@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
 from django.contrib.auth.models import User
@@ -87,3 +90,39 @@ class TestUrlFilters(TestCase):
         urls = woot.run_query()
 
         self.assertEqual(urls[0].url, 'https://ibm.com/bar/baz/#w00t')
+
+    def test_membership_is_maintained(self):
+        superuser = User.objects.get(username='superuser')
+        foo = UrlFilter.objects.get(name='foo filter')
+        bar = UrlFilter.objects.get(name='bar filter')
+
+        ## Saving a Url re-checks it against each filter.
+        url = Url.objects.create(created_by=superuser, edited_by=superuser, url='https://ibm.com/foo/baz')
+        self.assertEqual(set(foo.run_query().values_list('url', flat=True)), {'https://ibm.com/foo', 'https://ibm.com/foo/baz'})
+
+        url.url = 'https://ibm.com/qux/baz'
+        url.save()
+        self.assertEqual(set(foo.run_query().values_list('url', flat=True)), {'https://ibm.com/foo'})
+        self.assertEqual(set(bar.run_query().values_list('url', flat=True)), {'https://ibm.com/bar/baz/biff', 'https://ibm.com/bar/baz/#w00t', 'https://ibm.com/qux/baz'})
+
+        ## So does loading them in bulk.
+        Url.bulkLoad([{'url': 'https://ibm.com/foo/1'}, {'url': 'https://ibm.com/bar/2'}], superuser)
+        self.assertEqual(foo.run_query().count(), 2)
+
+        ## Changing a filter's parts rebuilds it.
+        part = UrlFilterPart.objects.get(url_filter=foo)
+        part.filter_val = 'bar'
+        part.save()
+        self.assertEqual(set(foo.run_query().values_list('url', flat=True)), {'https://ibm.com/bar/baz/biff', 'https://ibm.com/bar/baz/#w00t', 'https://ibm.com/bar/2'})
+
+        ## Filters are read from their membership rows, so rows removed behind the models' back stay gone until a rebuild.
+        UrlFilterMembership.objects.filter(url_filter=foo).delete()
+        self.assertFalse(foo.run_query().exists())
+
+        call_command('rebuild_filter_membership', stdout=StringIO())
+        self.assertEqual(foo.run_query().count(), 3)
+
+        ## A new filter has no parts yet, so it matches every URL, like get_matching_urls() does.
+        empty = UrlFilter.objects.create(name='empty filter', slug='empty')
+        self.assertEqual(empty.run_query().count(), Url.objects.count())
+        self.assertEqual(set(empty.run_query()), set(empty.get_matching_urls()))
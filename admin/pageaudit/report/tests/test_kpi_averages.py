@@ -0,0 +1,110 @@
+from django.test import TestCase
+
+from django.db.models import Avg
+
+from ..models import *
+from .sample_reports import makeUrl
+
+class TestUrlKpiAverages(TestCase):
+
+    def setUp(self):
+        """
+        create a url and a handful of runs, one of them invalid
+        """
+        self.url = makeUrl('https://ibm.com/foo')
+
+        self.runs = []
+
+        for perf, seo, ttfb in [(60, 0, 100), (71, 80, 250), (93, 91, 333)]:
+            self.runs.append(LighthouseRun.objects.create(
+                url=self.url,
+                performance_score=perf,
+                seo_score=seo,
+                time_to_first_byte=ttfb,
+                number_network_requests=20
+            ))
+
+        ## 404'd run, should never count toward the averages.
+        self.runs.append(LighthouseRun.objects.create(
+            url=self.url,
+            performance_score=99,
+            time_to_first_byte=9999,
+            number_network_requests=20,
+            invalid_run=True
+        ))
+
+    def assertMatchesRunHistory(self, urlAvg):
+        validRuns = LighthouseRun.objects.filter(url=self.url).validRuns()
+
+        self.assertEqual(urlAvg.number_samples, validRuns.count())
+        self.assertEqual(urlAvg.performance_score, round(validRuns.aggregate(Avg('performance_score'))['performance_score__avg']))
+        self.assertEqual(urlAvg.time_to_first_byte, round(validRuns.aggregate(Avg('time_to_first_byte'))['time_to_first_byte__avg']))
+        self.assertEqual(urlAvg.seo_score, round(validRuns.filter(seo_score__gt=0).aggregate(Avg('seo_score'))['seo_score__avg']))
+
+    def test_addRuns(self):
+        for run in self.runs:
+            urlAvg = UrlKpiAverage.addRuns(self.url, [run])
+
+        urlAvg = UrlKpiAverage.objects.get(url=self.url)
+
+        self.assertMatchesRunHistory(urlAvg)
+        self.assertEqual(urlAvg.seo_number_samples, 2)
+
+    def test_addRuns_invalidOnly(self):
+        self.assertIsNone(UrlKpiAverage.addRuns(self.url, [self.runs[-1]]))
+        self.assertFalse(UrlKpiAverage.objects.filter(url=self.url).exists())
+
+    def test_rebuildFromRuns(self):
+        UrlKpiAverage.objects.create(url=self.url, number_samples=50, performance_score_sum=1)
+
+        self.assertEqual(UrlKpiAverage.rebuildFromRuns(), 1)
+
+        urlAvg = UrlKpiAverage.objects.get(url=self.url)
+
+        self.assertMatchesRunHistory(urlAvg)
+        self.assertEqual(Url.objects.get(id=self.url.id).url_kpi_average, urlAvg)
+
+    def test_rebuildFromRuns_resets_url_without_runs(self):
+        for run in self.runs:
+            UrlKpiAverage.addRuns(self.url, [run])
+
+        otherUrl = makeUrl('https://ibm.com/bar')
+        otherRun = LighthouseRun.objects.create(url=otherUrl, performance_score=50, time_to_first_byte=400, number_network_requests=20)
+        UrlKpiAverage.addRuns(otherUrl, [otherRun])
+
+        LighthouseRun.objects.filter(url=self.url).delete()
+
+        ## Scoped to the other URL, this one's left alone.
+        UrlKpiAverage.rebuildFromRuns(urlIds=[otherUrl.id])
+        self.assertEqual(UrlKpiAverage.objects.get(url=self.url).number_samples, 3)
+
+        self.assertEqual(UrlKpiAverage.rebuildFromRuns(), 1)
+
+        urlAvg = UrlKpiAverage.objects.get(url=self.url)
+        self.assertEqual(urlAvg.number_samples, 0)
+        self.assertEqual(urlAvg.seo_number_samples, 0)
+        self.assertEqual(urlAvg.performance_score, 0)
+        self.assertEqual(urlAvg.performance_score_sum, 0)
+        self.assertEqual(urlAvg.seo_score, 0)
+        self.assertEqual(urlAvg.seo_score_sum, 0)
+        self.assertEqual(urlAvg.time_to_first_byte_sum, 0)
+
+        self.assertEqual(UrlKpiAverage.objects.get(url=otherUrl).performance_score, 50)
+
+    def test_addRuns_matches_stored_values(self):
+        ## A float KPI is stored truncated, the running sum has to add the same value.
+        run = LighthouseRun.objects.create(url=self.url, performance_score=80, time_to_first_byte=210.7, number_network_requests=20)
+        urlAvg = UrlKpiAverage.addRuns(self.url, [run])
+
+        self.assertEqual(urlAvg.time_to_first_byte_sum, 210)
+        self.assertEqual(urlAvg.time_to_first_byte, 210)
+
+        UrlKpiAverage.rebuildFromRuns()
+        self.assertEqual(UrlKpiAverage.objects.get(url=self.url).time_to_first_byte_sum, 100 + 250 + 333 + 210)
+
+    def test_averages_round_halves_up(self):
+        urlAvg = UrlKpiAverage(number_samples=2, performance_score_sum=5, seo_number_samples=2, seo_score_sum=181)
+        urlAvg.setAveragesFromSums()
+
+        self.assertEqual(urlAvg.performance_score, 3)
+        self.assertEqual(urlAvg.seo_score, 91)
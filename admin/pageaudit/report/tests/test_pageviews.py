@@ -0,0 +1,55 @@
+from django.db import DataError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import pageviews
+from ..models import *
+
+class TestPageViews(TestCase):
+
+    def setUp(self):
+        ## Views counted by pages other tests rendered.
+        pageviews.viewCounts.clear()
+
+    def test_views_are_buffered(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/report/filters/')
+            self.client.get('/report/filters/')
+
+        self.assertFalse([query for query in queries.captured_queries if 'report_pageview' in query['sql']])
+        self.assertEqual(pageviews.viewCounts['/pagelab/report/filters/'], 2)
+
+        PageView.objects.create(url='/pagelab/report/filters/', view_count=5)
+
+        with CaptureQueriesContext(connection) as queries:
+            pageviews.recordPageView('/pagelab/report/')
+            pageviews.flushPageViews()
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(dict(PageView.objects.values_list('url', 'view_count')), {'/pagelab/report/filters/': 7, '/pagelab/report/': 1})
+        self.assertFalse(pageviews.viewCounts)
+
+    @override_settings(PAGE_VIEW_FLUSH_SECONDS=0)
+    def test_views_are_flushed_after_requests(self):
+        self.client.get('/report/filters/')
+
+        self.assertEqual(PageView.objects.get(url='/pagelab/report/filters/').view_count, 1)
+
+    def test_bad_views_dont_block_flushes(self):
+        pageviews.recordPageView('/pagelab/%s' % ('x' * 3000))
+        pageviews.flushPageViews()
+
+        self.assertEqual(PageView.objects.get().url, '/pagelab/%s' % ('x' * 1991))
+
+        ## Counts the database rejects are dropped, not put back to fail the next flush too.
+        pageviews.viewCounts['/pagelab/report/'] = 2 ** 40
+
+        with self.assertRaises(DataError), transaction.atomic():
+            pageviews.flushPageViews()
+
+        self.assertFalse(pageviews.viewCounts)
+
+        pageviews.recordPageView('/pagelab/report/')
+        pageviews.flushPageViews()
+
+        self.assertEqual(PageView.objects.get(url='/pagelab/report/').view_count, 1)
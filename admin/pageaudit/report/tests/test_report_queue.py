@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from ..models import *
+from .sample_reports import makePayload, makeUrl
+
+class TestReportQueue(TestCase):
+
+    def setUp(self):
+        self.url = makeUrl('https://ibm.com/foo')
+
+    @override_settings(REPORT_INGEST_ASYNC=True)
+    def test_collect_report_queues(self):
+        response = self.client.post('/collect/report/', makePayload(self.url.url), content_type='text/plain')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ReportQueueItem.objects.count(), 1)
+        self.assertFalse(LighthouseRun.objects.exists())
+
+        self.assertEqual(ReportQueueItem.processBatch(), (1, 0))
+        self.assertFalse(ReportQueueItem.objects.exists())
+        self.assertEqual(LighthouseRun.objects.filter(url=self.url).count(), 1)
+        self.assertEqual(UrlKpiAverage.objects.get(url=self.url).performance_score, 80)
+
+    def test_failures_retry_then_dead_letter(self):
+        ReportQueueItem.objects.create(raw_data=makePayload('https://ibm.com/not-a-known-url'))
+
+        self.assertEqual(ReportQueueItem.processBatch(maxAttempts=2, retryDelay=0), (0, 1))
+        self.assertEqual(ReportQueueItem.objects.get().attempts, 1)
+
+        self.assertEqual(ReportQueueItem.processBatch(maxAttempts=2, retryDelay=0), (0, 1))
+        self.assertFalse(ReportQueueItem.objects.exists())
+        self.assertEqual(ReportDeadLetter.objects.get().attempts, 2)
+
+        self.assertEqual(ReportDeadLetter.requeueAll(), 1)
+        self.assertEqual(ReportQueueItem.objects.get().attempts, 0)
+        self.assertFalse(ReportDeadLetter.objects.exists())
+
+    def test_duplicate_posts(self):
+        payload = makePayload(self.url.url)
+
+        self.client.post('/collect/report/', payload, content_type='text/plain')
+        response = self.client.post('/collect/report/', payload, content_type='text/plain')
+        run = LighthouseRun.objects.get(url=self.url)
+
+        self.assertEqual(response.json()['run'], run.id)
+        self.assertEqual(UrlKpiAverage.objects.get(url=self.url).number_samples, 1)
+
+        ## Same idempotency key, different body: still the same report.
+        response = self.client.post('/collect/report/', makePayload(self.url.url, performance=0.5), content_type='text/plain', HTTP_IDEMPOTENCY_KEY='run-1')
+        response = self.client.post('/collect/report/', makePayload(self.url.url, performance=0.6), content_type='text/plain', HTTP_IDEMPOTENCY_KEY='run-1')
+
+        self.assertIn('run', response.json())
+        self.assertEqual(LighthouseRun.objects.filter(url=self.url).count(), 2)
+
+    def test_failed_post_can_be_retried(self):
+        payload = makePayload(self.url.url)
+
+        with mock.patch.object(UserTimingMeasure, 'saveForRuns', side_effect=RuntimeError('timings blew up')):
+            response = self.client.post('/collect/report/', payload, content_type='text/plain')
+
+        ## Nothing of the failed save is left, including the run holding the ingest key.
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertFalse(LighthouseRun.objects.exists())
+        self.assertFalse(LighthouseDataRaw.objects.exists())
+
+        response = self.client.post('/collect/report/', payload, content_type='text/plain')
+
+        self.assertNotIn('run', response.json())
+        self.assertEqual(LighthouseRun.objects.filter(url=self.url).count(), 1)
+        self.assertEqual(Url.objects.get(id=self.url.id).lighthouse_run, LighthouseRun.objects.get(url=self.url))
+
+    @override_settings(REPORT_INGEST_ASYNC=True)
+    def test_duplicate_queued_posts(self):
+        payload = makePayload(self.url.url)
+
+        self.client.post('/collect/report/', payload, content_type='text/plain')
+        self.client.post('/collect/report/', payload, content_type='text/plain')
+
+        self.assertEqual(ReportQueueItem.processBatch(), (2, 0))
+        self.assertEqual(LighthouseRun.objects.filter(url=self.url).count(), 1)
+
+    @override_settings(REPORT_INGEST_ASYNC=True)
+    def test_requeued_dead_letter_keeps_ingest_key(self):
+        payload = makePayload(self.url.url)
+
+        self.client.post('/collect/report/', payload, content_type='text/plain')
+
+        with mock.patch.object(UserTimingMeasure, 'saveForRuns', side_effect=RuntimeError('timings blew up')):
+            self.assertEqual(ReportQueueItem.processBatch(maxAttempts=1, retryDelay=0), (0, 1))
+
+        self.assertIsNotNone(ReportDeadLetter.objects.get().ingest_key)
+
+        ReportDeadLetter.requeueAll()
+        self.assertEqual(ReportQueueItem.processBatch(), (1, 0))
+
+        ## The re-sent report is recognized as the one the dead letter already saved.
+        with self.settings(REPORT_INGEST_ASYNC=False):
+            response = self.client.post('/collect/report/', payload, content_type='text/plain')
+
+        self.assertEqual(response.json()['run'], LighthouseRun.objects.get(url=self.url).id)
+        self.assertEqual(LighthouseRun.objects.filter(url=self.url).count(), 1)
@@ -0,0 +1,83 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import *
+from .sample_reports import makePayload, makeReport, makeUrl
+
+## Big enough to be cut out into a chunk.
+FILMSTRIP = {'type': 'filmstrip', 'items': [{'timing': i, 'data': 'x' * 100} for i in range(100)]}
+
+
+class TestReportStorage(TestCase):
+
+    def setUp(self):
+        self.url = makeUrl('https://ibm.com/foo')
+
+    def saveReport(self):
+        report = makeReport(self.url.url)
+        report['audits']['screenshot-thumbnails']['details'] = FILMSTRIP
+        LighthouseDataRaw().save_report(json.dumps({'report': report}))
+
+        return report
+
+    @override_settings(REPORT_DATA_COMPRESSED=True)
+    def test_compressed_reports_share_chunks(self):
+        report = self.saveReport()
+        self.saveReport()
+
+        self.assertEqual(ReportChunk.objects.count(), 1)
+
+        for rawData in LighthouseDataRaw.objects.all():
+            self.assertIsNone(rawData.report_data)
+            self.assertEqual(rawData.getReportData(), report)
+
+    def test_convert_existing_reports(self):
+        report = self.saveReport()
+        emptyData = LighthouseDataRaw.objects.create(lighthouse_run=LighthouseRun.objects.get(), report_data=None)
+
+        call_command('compress_report_data', stdout=StringIO())
+        emptyData.refresh_from_db()
+        self.assertIsNone(emptyData.report_data)
+        self.assertIsNone(emptyData.report_data_compressed)
+        emptyData.delete()
+
+        rawData = LighthouseDataRaw.objects.get()
+        self.assertIsNone(rawData.report_data)
+        self.assertEqual(rawData.getReportData(), report)
+
+        call_command('compress_report_data', '--decompress', stdout=StringIO())
+        rawData = LighthouseDataRaw.objects.get()
+        self.assertIsNone(rawData.report_data_compressed)
+        self.assertEqual(rawData.report_data, report)
+
+    def getStreamedReport(self, runId, **headers):
+        response = self.client.get('/report/api/lighthousedata/%s/' % runId, **headers)
+
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_report_is_streamed_as_stored(self):
+        report = self.saveReport()
+        runId = LighthouseRun.objects.get().id
+
+        response, content = self.getStreamedReport(runId)
+        self.assertEqual(json.loads(content.decode('utf-8')), {'results': {'rawData': report}})
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response, content = self.getStreamedReport(runId, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response, content = self.getStreamedReport(runId, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        ## Compressed storage, and no report.
+        call_command('compress_report_data', stdout=StringIO())
+        self.assertEqual(json.loads(self.getStreamedReport(runId)[1].decode('utf-8'))['results']['rawData'], report)
+        self.assertEqual(self.client.get('/report/api/lighthousedata/%s/' % (runId + 1)).json(), {'results': {}})
+
+        ## The viewer page fetches the report, it's not in the page.
+        response = self.client.get('/report/urls/lighthouse-viewer/%s/' % runId)
+        self.assertContains(response, '/report/api/lighthousedata/%s/' % runId)
+        self.assertNotContains(response, 'requestedUrl')
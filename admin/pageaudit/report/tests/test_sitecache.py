@@ -0,0 +1,66 @@
+from django.contrib.flatpages.models import FlatPage
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import *
+from ..sitecache import SITE_CACHE_VERSION_KEY
+
+class TestSiteCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.banner = BannerNotification.objects.create(name='Maintenance', active=True, banner_text='Down for maintenance tonight')
+        self.flatpage = FlatPage.objects.create(url='/about/', title='About PageLab', content='About')
+        self.flatpage.sites.add(1)
+
+    def getChromeQueries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+
+        return response, [query['sql'] for query in queries.captured_queries if 'report_bannernotification' in query['sql'] or 'django_flatpage' in query['sql'] or 'report_urlfilter"' in query['sql']]
+
+    def test_chrome_is_cached(self):
+        response, queries = self.getChromeQueries('/report/dashboard/')
+        self.assertContains(response, 'Down for maintenance tonight')
+        self.assertContains(response, 'About PageLab')
+        self.assertTrue(queries)
+
+        response, queries = self.getChromeQueries('/report/dashboard/')
+        self.assertContains(response, 'Down for maintenance tonight')
+        self.assertEqual(queries, [])
+
+        ## Saves and deletes show up on the next render.
+        self.banner.banner_text = 'Back up'
+        self.banner.save()
+        UrlFilter.objects.create(name='Marketing', slug='marketing')
+        self.flatpage.delete()
+
+        response, queries = self.getChromeQueries('/report/dashboard/')
+        self.assertContains(response, 'Back up')
+        self.assertContains(response, 'value="marketing"')
+        self.assertNotContains(response, 'About PageLab')
+
+    def test_nav_leaves_out_registration_required_pages(self):
+        ## Like {% get_flatpages %} without a user did, even for signed-in users.
+        private = FlatPage.objects.create(url='/team/', title='Team only', content='Team', registration_required=True)
+        private.sites.add(1)
+        self.client.force_login(User.objects.create(username='superuser', is_staff=True, is_superuser=True))
+
+        response = self.client.get('/report/dashboard/')
+        self.assertContains(response, 'About PageLab')
+        self.assertNotContains(response, 'Team only')
+
+    def test_lost_version_doesnt_bring_back_old_entries(self):
+        cache.delete(SITE_CACHE_VERSION_KEY)
+        self.client.get('/report/dashboard/')
+
+        self.banner.banner_text = 'Back up'
+        self.banner.save()
+        self.client.get('/report/dashboard/')
+
+        ## The version key is culled, old entries from earlier versions are still cached.
+        cache.delete(SITE_CACHE_VERSION_KEY)
+        self.assertContains(self.client.get('/report/dashboard/'), 'Back up')
@@ -0,0 +1,59 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import *
+from ..snapshots import SnapshotReader, writeSnapshot
+from .sample_reports import makePayload, makeUrl
+
+class TestSnapshots(TestCase):
+
+    def setUp(self):
+        self.urls = [
+            makeUrl(url)
+            for url in ['https://ibm.com/foo', 'https://ibm.com/bar']
+        ]
+
+        LighthouseDataRaw().save_report(makePayload(self.urls[0].url, performance=0.8))
+        LighthouseDataRaw().save_report(makePayload(self.urls[1].url, performance=0.6))
+        LighthouseDataRaw().save_report(makePayload(self.urls[1].url, statusCode=404))
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.today = timezone.localdate()
+        self.tomorrow = self.today + datetime.timedelta(days=1)
+
+    def test_snapshot_appends(self):
+        ## Today isn't over yet, so nothing is written.
+        self.assertEqual(writeSnapshot(self.root), (0, 0, 2))
+
+        self.assertEqual(writeSnapshot(self.root, until=self.tomorrow), (3, 1, 2))
+        self.assertEqual(writeSnapshot(self.root, until=self.tomorrow), (0, 0, 2))
+        self.assertEqual(len(os.listdir(os.path.join(self.root, 'runs', 'date=%s' % self.today))), 1)
+
+        ## Only runs after the last snapshot are added.
+        LighthouseDataRaw().save_report(makePayload(self.urls[0].url, performance=0.5))
+        call_command('snapshot_runs', path=self.root, until=self.tomorrow.isoformat(), stdout=io.StringIO())
+
+        reader = SnapshotReader(self.root)
+        self.assertEqual(reader.runs(includeInvalid=True).num_rows, 4)
+        self.assertEqual(len(os.listdir(os.path.join(self.root, 'runs', 'date=%s' % self.today))), 2)
+
+    def test_reader(self):
+        writeSnapshot(self.root, until=self.tomorrow)
+        reader = SnapshotReader(self.root)
+
+        self.assertEqual(reader.kpiOverTime('performance_score'), [(self.today, 70.0, 2)])
+        self.assertEqual(reader.kpiOverTime('performance_score', urlIds=[self.urls[0].id]), [(self.today, 80.0, 1)])
+        self.assertEqual(reader.kpiOverTime('performance_score', endDate=self.today - datetime.timedelta(days=1)), [])
+        self.assertEqual(reader.measureOverTime('page-ready'), [(self.today, 900.0, 2)])
+        self.assertEqual(reader.urls().column('url').to_pylist(), [url.url for url in self.urls])
+
+        with self.assertRaises(ValueError):
+            reader.kpiOverTime('url')
@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from ..models import *
+from .sample_reports import makePayload, makeUrl
+
+class TestThumbnails(TestCase):
+
+    def setUp(self):
+        self.url = makeUrl('https://ibm.com/foo')
+
+    def test_thumbnail_view(self):
+        LighthouseDataRaw().save_report(makePayload(self.url.url))
+        run = LighthouseRun.objects.get(url=self.url)
+
+        thumbnailPath = '/report/thumb/%s.jpg' % run.id
+        self.assertTrue(run.thumbnailUrl().endswith(thumbnailPath))
+
+        response = self.client.get(thumbnailPath)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, base64.b64decode('/9j/4AAQSkZJRg=='))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(thumbnailPath, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get('/report/thumb/0.jpg').status_code, 404)
@@ -0,0 +1,133 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..helpers import getUrlHash
+from ..models import *
+from .sample_reports import getSuperuser, makePayload, makeUrl
+
+class TestUrlSave(TestCase):
+
+    def setUp(self):
+        ## So creating it isn't counted in createUrl's queries.
+        getSuperuser()
+
+    def createUrl(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            urlObj = makeUrl(url)
+
+        return urlObj, len(queries)
+
+    def test_url_parts_are_shared(self):
+        short, shortQueries = self.createUrl('https://ibm.com/a?x=1')
+        long, longQueries = self.createUrl('https://ibm.com/a/b/c/d/e/f?x=1&y=2&z')
+
+        self.assertEqual(shortQueries, longQueries)
+        self.assertEqual(UrlPath.objects.count(), 6)
+        self.assertEqual(SearchKeyVal.objects.count(), 3)
+        self.assertEqual(list(long.url_paths.order_by('sequence').values_list('path', flat=True)), ['a', 'b', 'c', 'd', 'e', 'f'])
+        self.assertEqual(set(long.search_key_vals.values_list('key', 'val')), {('x', '1'), ('y', '2'), ('z', None)})
+
+        short.url = 'https://ibm.com/b/a'
+        short.save()
+
+        self.assertEqual(UrlPath.objects.count(), 8)
+        self.assertEqual(list(short.url_paths.order_by('sequence').values_list('path', flat=True)), ['b', 'a'])
+        self.assertFalse(short.search_key_vals.exists())
+
+    def test_keys_without_val_are_unique(self):
+        makeUrl('https://ibm.com/a?z')
+        self.assertEqual(makeUrl('https://ibm.com/b?z').search_key_vals.get(), SearchKeyVal.objects.get(key='z'))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SearchKeyVal.objects.create(key='z', val=None)
+
+    def test_load_urls(self):
+        makeUrl('https://ibm.com/a?x=1')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('url,sequence,owner\nibm.com/a?x=1,5,Team A\nibm.com/a/b?x=1&y,6,\nhttp://ibm.com/c,,Team A\nIBM.com/a/b/?x=1&y,7,\n')
+
+        call_command('load_urls', f.name, '--header', '--update', '--batch-size', '2', stdout=StringIO())
+        os.remove(f.name)
+
+        self.assertEqual(Url.objects.count(), 3)
+        self.assertEqual(UrlPath.objects.count(), 3)
+
+        updated = Url.objects.get(url='https://ibm.com/a?x=1')
+        self.assertEqual((updated.sequence, updated.owner.owner_name), (5, 'Team A'))
+
+        loaded = Url.objects.get(url='https://ibm.com/a/b?x=1&y')
+        self.assertEqual((loaded.sequence, loaded.hostname, loaded.search, loaded.parsed_url), (7, 'ibm.com', 'x=1&y', loaded.url))
+        self.assertEqual(list(loaded.url_paths.order_by('sequence').values_list('path', flat=True)), ['a', 'b'])
+        self.assertEqual(set(loaded.search_key_vals.values_list('key', 'val')), {('x', '1'), ('y', None)})
+        self.assertEqual(Url.getIdForUrl('HTTP://ibm.com/c/'), Url.objects.get(url='http://ibm.com/c').id)
+
+        Url.reparseBulk(Url.objects.all())
+        self.assertEqual(loaded.url_paths.count(), 2)
+
+    def test_legacy_duplicate_urls(self):
+        ## A Url from before url_hash existed, that normalizes the same as another one, has no hash (see migration 0023).
+        original = makeUrl('https://ibm.com/foo')
+        duplicate = makeUrl('https://ibm.com/other')
+        Url.objects.filter(id=duplicate.id).update(url='https://ibm.com/foo/', parsed_url='https://ibm.com/foo/', url_hash=None)
+        duplicate = Url.objects.get(id=duplicate.id)
+
+        duplicate.inactive = True
+        duplicate.save()
+        Url.reparseBulk(Url.objects.all())
+
+        self.assertIsNone(Url.objects.get(id=duplicate.id).url_hash)
+        self.assertEqual(Url.getForUrl('https://ibm.com/foo/'), duplicate)
+        self.assertEqual(Url.getIdForUrl('https://ibm.com/foo/'), duplicate.id)
+        self.assertEqual(Url.getForUrl('https://IBM.com/foo/'), original)
+        self.assertEqual(Url.getForUrls(['https://ibm.com/foo/', 'https://ibm.com/foo']), {'https://ibm.com/foo/': duplicate, 'https://ibm.com/foo': original})
+
+        LighthouseDataRaw().save_report(makePayload('https://ibm.com/foo/'))
+        self.assertTrue(LighthouseRun.objects.filter(url=duplicate).exists())
+
+    def test_cached_url_id_is_rechecked(self):
+        old = makeUrl('https://ibm.com/foo')
+        other = makeUrl('https://ibm.com/other')
+        self.assertEqual(Url.getIdForUrl('https://IBM.com/foo'), old.id)
+
+        ## Another process swaps the URLs around, the cached ID for the hash is now wrong.
+        Url.objects.filter(id=old.id).update(url='https://ibm.com/old', url_hash=getUrlHash('https://ibm.com/old'))
+        Url.objects.filter(id=other.id).update(url='https://ibm.com/foo', url_hash=getUrlHash('https://ibm.com/foo'))
+        self.assertEqual(Url.getIdForUrl('https://IBM.com/foo'), other.id)
+
+        Url.objects.filter(id=other.id).delete()
+
+        with self.assertRaises(Url.DoesNotExist):
+            Url.getIdForUrl('https://IBM.com/foo')
+
+    def test_url_typeahead(self):
+        cache.clear()
+
+        for url in ('https://docs.example.com/cloud', 'https://cloud.example.com/a', 'https://cloud.ibm.com/', 'https://example.com/50%_off', 'https://example.com/50x_off'):
+            makeUrl(url)
+
+        ## Prefix matches, then host matches, then the rest.
+        matches = [match['url'] for match in Url.getTypeaheadMatches('cloud')]
+        self.assertEqual(matches[2], 'https://docs.example.com/cloud')
+        self.assertEqual(set(matches[:2]), {'https://cloud.example.com/a', 'https://cloud.ibm.com/'})
+
+        self.assertEqual(len(Url.getTypeaheadMatches('cloud', 1)), 1)
+        self.assertEqual(len(Url.getTypeaheadMatches('cl')), 2)
+        self.assertEqual(Url.getTypeaheadMatches('lo'), [])
+        self.assertEqual([match['url'] for match in Url.getTypeaheadMatches('50%')], ['https://example.com/50%_off'])
+
+        response = self.client.get('/report/api/urltypeahead/', {'q': 'ibm'})
+        self.assertEqual([match['url'] for match in response.json()['results']], ['https://cloud.ibm.com/'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/report/api/urltypeahead/', {'q': 'ibm'})
+
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertFalse([query for query in queries.captured_queries if 'report_url' in query['sql']])
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import *
+from .sample_reports import makePayload, makeUrl
+
+def makeUserTimings(count, duration=100):
+    return [{'name': 'measure-%s' % i, 'timingType': 'Measure', 'startTime': i * 10, 'duration': duration} for i in range(count)]
+
+
+class TestUserTimings(TestCase):
+
+    def setUp(self):
+        self.url = makeUrl('https://ibm.com/foo')
+
+    def saveReport(self, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            LighthouseDataRaw().save_report(makePayload(self.url.url, **kwargs))
+
+        return len(queries)
+
+    def test_queries_dont_grow_with_measures(self):
+        ## First report creates the names, after that they're cached.
+        self.saveReport(userTimings=makeUserTimings(40))
+
+        self.assertEqual(self.saveReport(userTimings=makeUserTimings(2)), self.saveReport(userTimings=makeUserTimings(40)))
+
+    def test_running_averages(self):
+        self.saveReport(userTimings=makeUserTimings(3, duration=100))
+        self.saveReport(userTimings=makeUserTimings(3, duration=201))
+        self.saveReport(userTimings=makeUserTimings(3, duration=5000), statusCode=500)
+
+        average = UserTimingMeasureAverage.objects.get(url=self.url, name__name='measure-2')
+        self.assertEqual((average.number_samples, average.duration, average.start_time), (2, 151, 20))
+
+        UserTimingMeasureAverage.rebuildFromMeasures()
+
+        rebuilt = UserTimingMeasureAverage.objects.get(url=self.url, name__name='measure-2')
+        self.assertEqual((rebuilt.number_samples, rebuilt.duration_sum, rebuilt.duration), (2, 301, 151))
+
+    def test_name_cache_overflow(self):
+        UserTimingMeasureName.idCache.clear()
+        UserTimingMeasureName.getIds(['a', 'b'])
+
+        with mock.patch.object(UserTimingMeasureName, 'ID_CACHE_MAX_SIZE', 3):
+            ids = UserTimingMeasureName.getIds(['a', 'b', 'c', 'd'])
+
+        self.assertEqual(ids, dict(UserTimingMeasureName.objects.filter(name__in=['a', 'b', 'c', 'd']).values_list('name', 'id')))
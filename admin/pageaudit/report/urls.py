@@ -18,6 +18,7 @@ urlpatterns = [
     url(r'^api/urltypeahead/$', api_url_typeahead, name='api_url_typeahead'),
     url(r'^api/chart/scores/$', api_chart_scores, name='api_chart_scores'),
     url(r'^api/table/kpis/$', api_table_kpis, name='api_table_kpis'),
+    url(r'^api/export/runs/$', api_export_runs, name='api_export_runs'),
         
     ## Core pages.
     ## Regex on browse and dashboard allow capture of just the filter slug, excluding the /.
@@ -39,6 +40,9 @@ urlpatterns = [
     url(r'^urls/lighthouse-viewer/(?P<id>[\d-]+)/$', reports_lighthouse_viewer, name='reports_lighthouse_viewer'),
     url(r'^urls/lighthouse-viewer-template/$', TemplateView.as_view(template_name='reports_lighthouse_viewer_template.html'), name='reports_lighthouse_viewer_template'),
     
+    ## Page screenshot thumbnail for a LighthouseRun ID.
+    url(r'^thumb/(?P<id>\d+)\.jpg$', reports_thumbnail, name='reports_thumbnail'),
+    
     ## Standard across all apps.
     url(r'^signin/$', signin, name='signin'),
     url(r'^signout/$', logout, name='signout'),
@@ -1,32 +1,43 @@
 import calendar
 import datetime
+import hashlib
 import json
 import sys
 
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User, Group
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.mail import mail_admins, send_mail
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.core.serializers import serialize
 from django.core.validators import validate_email
-from django.db.models import Avg, Max, Min, Q, Sum
-from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse
+from django.db import IntegrityError
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotFound, HttpResponseNotModified, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy, reverse
+from django.utils import formats, timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.crypto import get_random_string
+from django.utils.http import http_date, parse_etags, quote_etag
 from django.utils.text import capfirst
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
 
 from pageaudit.settings import ADMINS_EMAIL_TO_SMS
+from .cards import getReportCardsHtml
+from .export import EXPORT_FORMATS, exportLines, getExportRuns
 from .helpers import *
-from .models import LighthouseDataRaw, LighthouseRun, Url, UrlKpiAverage, UrlFilter, UrlFilterPart
+from .models import LighthouseDataRaw, LighthouseRun, LighthouseRunThumbnail, ReportQueueItem, Url, UrlKpiAverage, UrlFilter, UrlFilterPart
+from .sitecache import getUrlFilters
 
 ERROR = 'error'
 SUCCESS = 'success'
@@ -50,6 +61,8 @@ SUCCESS = 'success'
 def collect_report(request):
     """
     Web service URL where Lighthouse report data is POST'd and saved in Django.
+    With REPORT_INGEST_ASYNC on, the body is just queued and a 202 is returned right away.
+    The 'process_report_queue' command does the actual save.
     """
     
     if request.method == 'GET':
@@ -62,15 +75,40 @@ def collect_report(request):
                 'status': ERROR,
                 'message': 'Report value missing in request'
             })
+        
+        ## Re-sent reports (i.e. the runner timed out after we saved it) return the run we already have.
+        ingestKey = getIngestKey(raw_report, request.META.get('HTTP_IDEMPOTENCY_KEY'))
+        savedRunId = LighthouseRun.objects.filter(ingest_key=ingestKey).values_list('id', flat=True).first()
+        
+        if savedRunId is not None:
+            return reportAlreadySaved(savedRunId)
+        elif settings.REPORT_INGEST_ASYNC:
+            queueItem = ReportQueueItem.objects.create(raw_data=raw_report, ingest_key=ingestKey)
+            
+            return JsonResponse({
+                'status': SUCCESS,
+                'message': 'Report data queued %s' % queueItem.id
+            }, status=202)
         else:
             try:
                 lhd = LighthouseDataRaw()
-                lhd.save_report(raw_data=raw_report)
+                lhd.save_report(raw_data=raw_report, ingestKey=ingestKey)
                 
                 return JsonResponse({
                     'status': SUCCESS,
                     'message': 'Report data accepted %s' % lhd.id
                 })
+            except IntegrityError as ex:
+                ## The same report was saved by another request in the meantime.
+                savedRunId = LighthouseRun.objects.filter(ingest_key=ingestKey).values_list('id', flat=True).first()
+                
+                if savedRunId is not None:
+                    return reportAlreadySaved(savedRunId)
+                
+                return JsonResponse({
+                    'status': ERROR,
+                    'message': str(ex)
+                })
             except Exception as ex:
                 #print(str(ex))
                 return JsonResponse({
@@ -79,6 +117,59 @@ def collect_report(request):
                 })
 
 
+def reportAlreadySaved(runId):
+    return JsonResponse({
+        'status': SUCCESS,
+        'message': 'Report data already saved %s' % runId,
+        'run': runId
+    })
+
+
+##
+##  /collect/reports/batch/
+##
+##
+@csrf_exempt
+def collect_reports_batch(request):
+    """
+    Web service URL where many Lighthouse reports can be POST'd and saved at once,
+    as a JSON array or NDJSON. Used to backfill or replay runs.
+    """
+    
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    try:
+        rawReports = parseReportBatch(request.body)
+    except Exception as ex:
+        return JsonResponse({
+            'status': ERROR,
+            'message': 'Unable to read report batch: %s' % ex
+        }, status=400)
+    
+    if not rawReports:
+        return JsonResponse({
+            'status': ERROR,
+            'message': 'Report value missing in request'
+        }, status=400)
+    
+    try:
+        results = LighthouseDataRaw.save_reports(rawReports)
+    except Exception as ex:
+        return JsonResponse({
+            'status': ERROR,
+            'message': str(ex)
+        }, status=500)
+    
+    errorCount = len([result for result in results if 'error' in result])
+    
+    return JsonResponse({
+        'status': SUCCESS if errorCount == 0 else ERROR,
+        'message': 'Report data accepted: %s, rejected: %s' % (len(results) - errorCount, errorCount),
+        'results': results
+    })
+
+
 ##
 ##  /queue/
 ##
@@ -111,30 +202,60 @@ def get_urls(request):
 ########################################################################
 
 
+## Size of the pieces a report's JSON is streamed out in.
+REPORT_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def streamJsonText(prefix, jsonText, suffix):
+    """
+    Streams JSON text that's already serialized, wrapped in a prefix/suffix, a chunk at a time.
+    Only a chunk is ever encoded at once, instead of a second multi-megabyte copy of the report.
+    """
+    yield prefix.encode('utf-8')
+    
+    for start in range(0, len(jsonText), REPORT_STREAM_CHUNK_SIZE):
+        yield jsonText[start:start + REPORT_STREAM_CHUNK_SIZE].encode('utf-8')
+    
+    yield suffix.encode('utf-8')
+
+
 ##
 ##  /api/lighthousedata/<id>/
 ##  
 ##  Get the Lighthouse report's raw data object for the given LighthouseRun ID.
+##  The stored report JSON is streamed as-is (gzipped if the browser takes it), and since a run's report
+##  never changes, it's cached forever by run ID.
 ##
 ##
+@gzip_page
 def api_lighthouse_data(request, id):
     """
     Takes a given LighthouseRun ID and returns it's raw report data object.
     If none exists, returns empty results object.
-    Used by the report detail page in the data table. Clicking on the icon to view
-    a report calls this as a web service to get the JSON to send to the lighthouse viewer.
+    Used by the Lighthouse viewer page, which fetches the report from here to show it.
     """
     
-    lighthouseData = {}
+    etag = quote_etag('lhr-%s' % id)
+    response = get_conditional_response(request, etag=etag)
     
-    try:
-        lighthouseData['rawData'] = LighthouseRun.objects.get(id=id).lighthouse_data_raw_lighthouse_run.get().report_data
-    except Exception as ex:
-        pass
+    if response is None:
+        try:
+            reportJson = LighthouseDataRaw.getReportJson(id) if id else None
+        except ValueError:
+            reportJson = None
+        
+        ## No report (yet), don't let that get cached.
+        if reportJson is None:
+            return JsonResponse({
+                'results': {}
+            })
+        
+        response = StreamingHttpResponse(streamJsonText('{"results": {"rawData": ', reportJson, '}}'), content_type='application/json')
     
-    return JsonResponse({
-        'results': lighthouseData 
-    })
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    
+    return response
 
 
 ##
@@ -143,8 +264,9 @@ def api_lighthouse_data(request, id):
 ##
 def api_url_typeahead(request):
     """
-    Takes a given string and returns 6 URLs that contain it.
+    Takes a given string and returns 6 URLs that contain it, best matches first.
     Used by the input field on the home page to get and display the matches.
+    Results are cached for a few seconds, people type and delete the same prefixes a lot.
     """
     
     textString = request.GET.get('q', '')
@@ -152,7 +274,12 @@ def api_url_typeahead(request):
     urlList = []
 
     if textString != '':
-        urlList = list(Url.objects.filter(url__contains=textString)[:6].values('id', 'url'))
+        cacheKey = 'urltypeahead:%s' % hashlib.md5(textString.encode('utf-8')).hexdigest()
+        urlList = cache.get(cacheKey)
+        
+        if urlList is None:
+            urlList = Url.getTypeaheadMatches(textString, 6)
+            cache.set(cacheKey, urlList, settings.URL_TYPEAHEAD_CACHE_SECONDS)
     
     return JsonResponse({
         'results': urlList 
@@ -175,7 +302,7 @@ def api_urlid(request):
     url = request.GET.get('url', '')
     
     try:
-        urlid = Url.objects.get(url=url).id
+        urlid = Url.getIdForUrl(url)
     except Exception as ex:
         urlid = None
     
@@ -235,48 +362,81 @@ def api_browse_items(request):
     """
     
     filter_slug = request.GET.get("filter", None)
-    ids = []
-    
     filter = UrlFilter.get_filter_safe(filter_slug)
     
-    if filter is not None:
-        filter.run_query()
-        ids = list(filter.run_query().values_list('id', flat=True))   
-    
-    urls = Url.getUrls({
+    urlOptions = {
         'sortby': request.GET.get('sortby'),
         'sortorder': request.GET.get('sortorder'),
-        'ids': ids
-    })
+        'filter': filter
+    }
     
-    page = request.GET.get('page')
-    urlPaginator = Paginator(urls, 20) # Show 20 'cards' per request.
-    urlsToShow = urlPaginator.get_page(page)
     viewData = request.GET.get('viewdata', 'perfscore')
+    page = request.GET.get('page')
+    cursor = request.GET.get('cursor')
+    
+    ## Cursor (keyset) pagination: no COUNT(*) and no OFFSET, so deep pages cost the same as the first.
+    ## ?page=<#> still works for old clients.
+    if cursor or not page:
+        urlsToShow, nextCursor = Url.getUrlsPage(urlOptions, cursor, 20) # Show 20 'cards' per request.
+        pagination = {
+            'hasNextPage': nextCursor is not None,
+            'nextCursor': nextCursor,
+        }
+    else:
+        urlPaginator = Paginator(Url.getUrls(urlOptions), 20) # Show 20 'cards' per request.
+        urlsToShow = urlPaginator.get_page(page)
+        pagination = {
+            'pageNum': urlsToShow.number,
+            'hasNextPage': urlsToShow.has_next(),
+        }
     
-    context = {
-        'urls': urlsToShow,
-        'viewdata': viewData
-    }
+    html = getReportCardsHtml(list(urlsToShow), viewData)
     
+    return JsonResponse(dict(pagination, resultsHtml=html))
+
+
+##
+##  The latest-N ranges the chart and table APIs allow. Whitelisted AVL.
+##
+CHART_LATEST_RANGES = ('15', '30', '60',)
+
+
+def getRequestedRuns(request, urlId):
+    """
+    A URL's LighthouseRuns for the range in a chart/table API request:
+        range '15', '30', '60' (default 15):  Latest # of runs, newest first.
+        range 'all':  Every run, oldest first.
+        range 'custom':  Runs from startdate to enddate (YYYY-MM-DD, inclusive, either optional), oldest first.
+    Returns a (runs queryset, whether the range is open-ended) tuple. Open-ended ranges can be any
+    # of runs, so charts downsample them. Raises ValueError for bad dates.
+    """
+    rangeType = request.GET.get('range', None)
+    runs = LighthouseRun.objects.filter(url=urlId)
     
-    html = render_to_string('partials/home_load_items.html', context)
+    if rangeType == 'all':
+        return (runs.order_by('created_date'), True)
     
-    return JsonResponse({
-            'pageNum': urlsToShow.number,
-            'hasNextPage': urlsToShow.has_next(),
-            'resultsHtml': html
-        })
+    if rangeType == 'custom':
+        startDate = parseDateParam(request.GET.get('startdate'))
+        endDate = parseDateParam(request.GET.get('enddate'))
+        
+        return (lighthouseRunsByDate(runs, startDate, endDate).order_by('created_date'), True)
+    
+    if rangeType not in CHART_LATEST_RANGES:
+        rangeType = '15'
+    
+    return (runs.order_by('-created_date')[:int(rangeType)], False)
 
 
 ##
 ##  /api/chart/scores/?<GET params:>
 ##      urlid (int)
-##      range ('latest', 'all', 'custom' (FUTURE USE))
-##      startdate (FUTURE USE)
-##      enddate (FUTURE USE)
+##      range ('15', '30', '60', 'all', 'custom')
+##      startdate (YYYY-MM-DD, for 'custom')
+##      enddate (YYYY-MM-DD, for 'custom')
 ##
 ##  Returns data object in format needed for line chart.
+##  'all' and 'custom' ranges are downsampled to CHART_MAX_POINTS points per line.
 ##
 ##
 def api_chart_scores(request):
@@ -287,7 +447,6 @@ def api_chart_scores(request):
     """
     
     urlId = request.GET.get('urlid', None)
-    rangeType = request.GET.get('range', None)
     
     
     ## Validate that the passed URL ID is valid. No URL = no service.
@@ -297,33 +456,17 @@ def api_chart_scores(request):
         return JsonResponse({
             'results': {}
         })
-        
-
-    ## FUTURE FEATURE: custom range.
-    ## Will be used with data pickers to allow user to select start/stop date range.
-    #     ## Validate optional start date
-    #     try:
-    #         startDateString = request.GET.get('startdate', None)
-    #         startDate = datetime.datetime.strptime(startDateString, "%Y-%m-%d")
-    #     except:
-    #         startDate = None
-    #     
-    #     ## Validate optional end date
-    #     try:
-    #         endDateString = request.GET.get('enddate', None)
-    #         endDate = datetime.datetime.strptime(endDateString, "%Y-%m-%d")
-    #     except:
-    #         endDate = None
-    
-    
-    ## Get the scope of LighthouseRuns to chart: Latest 15/30/60. Whitelisted AVL.
-    if rangeType == "15" or rangeType == "30" or rangeType == "60":
-        urlLighthouseRuns = LighthouseRun.objects.filter(url=urlId).order_by('-created_date')[:int(rangeType)]
-    else:
-        urlLighthouseRuns = LighthouseRun.objects.filter(url=urlId).order_by('-created_date')[:15]
+    
+    try:
+        urlLighthouseRuns, openRange = getRequestedRuns(request, url.id)
+    except ValueError as ex:
+        return JsonResponse({
+            'status': ERROR,
+            'message': str(ex)
+        }, status=400)
         
     ## Create the output in format needed for line chart.
-    lineChartData = createHistoricalScoreChartData(urlLighthouseRuns)
+    lineChartData = createHistoricalScoreChartData(urlLighthouseRuns, maxPoints=CHART_MAX_POINTS if openRange else None)
 
     ## Return to requestor.
     return JsonResponse({
@@ -331,14 +474,38 @@ def api_chart_scores(request):
     })
     
 
+##
+##  LighthouseRun fields sent for the run KPI table on the report detail page, in table column order.
+##
+KPI_TABLE_FIELDS = (
+    'id',
+    'created_date',
+    'performance_score',
+    'accessibility_score',
+    'seo_score',
+    'total_byte_weight',
+    'number_network_requests',
+    'time_to_first_byte',
+    'dom_content_loaded',
+    'first_contentful_paint',
+    'first_meaningful_paint',
+    'interactive',
+    'dom_loaded',
+    'redirect_hops',
+    'redirect_wasted_ms',
+)
+
+
 ##
 ##  /api/table/kpis/?<GET params:>
 ##      urlid (int)
-##      range ('latest', 'all', 'custom' (FUTURE USE))
-##      startdate (FUTURE USE)
-##      enddate (FUTURE USE)
+##      range ('15', '30', '60', 'all', 'custom')
+##      startdate (YYYY-MM-DD, for 'custom')
+##      enddate (YYYY-MM-DD, for 'custom')
 ##
-##  Returns data object in format needed for line chart.
+##  Returns the runs in range as columns: {'results': {<field>: [value for each run], ...}}
+##  Sends an ETag and Last-Modified from the URL's latest run, so a repeat request answers a 304
+##  without querying the runs, until a new run comes in.
 ##
 ##
 def api_table_kpis(request):
@@ -349,7 +516,6 @@ def api_table_kpis(request):
     """
     
     urlId = request.GET.get('urlid', None)
-    rangeType = request.GET.get('range', None)
     
     
     ## Validate that the passed URL ID is valid. No URL = no service.
@@ -359,43 +525,106 @@ def api_table_kpis(request):
         return JsonResponse({
             'results': {}
         })
+    
+    try:
+        urlLighthouseRuns, openRange = getRequestedRuns(request, url.id)
+    except ValueError as ex:
+        return JsonResponse({
+            'status': ERROR,
+            'message': str(ex)
+        }, status=400)
+    
+    ## The runs in any range only change when the URL gets a new run.
+    latestRun = LighthouseRun.objects.filter(url=url.id).order_by('-id').values_list('id', 'created_date').first() or (0, None)
+    rangeHash = hashlib.md5(request.GET.urlencode().encode('utf-8')).hexdigest()
+    etag = quote_etag('kpis-%s-%s-%s' % (url.id, latestRun[0], rangeHash))
+    lastModified = calendar.timegm(latestRun[1].utctimetuple()) if latestRun[1] else None
+    
+    response = get_conditional_response(request, etag=etag, last_modified=lastModified)
+    
+    if response is None:
+        columns = {field: [] for field in KPI_TABLE_FIELDS}
         
-
-    ## FUTURE FEATURE: custom range.
-    ## Will be used with data pickers to allow user to select start/stop date range.
-    #     ## Validate optional start date
-    #     try:
-    #         startDateString = request.GET.get('startdate', None)
-    #         startDate = datetime.datetime.strptime(startDateString, "%Y-%m-%d")
-    #     except:
-    #         startDate = None
-    #     
-    #     ## Validate optional end date
-    #     try:
-    #         endDateString = request.GET.get('enddate', None)
-    #         endDate = datetime.datetime.strptime(endDateString, "%Y-%m-%d")
-    #     except:
-    #         endDate = None
-    
-    
-    ## Get the scope of LighthouseRuns to chart: Latest 15/30/60. Whitelisted AVL.
-    if rangeType == "15" or rangeType == "30" or rangeType == "60":
-        urlLighthouseRuns = LighthouseRun.objects.filter(url=urlId).order_by('-created_date')[:int(rangeType)]
-    else:
-        urlLighthouseRuns = LighthouseRun.objects.filter(url=urlId).order_by('-created_date')[:15]
+        for runData in urlLighthouseRuns.values_list(*KPI_TABLE_FIELDS):
+            for field, value in zip(KPI_TABLE_FIELDS, runData):
+                columns[field].append(value)
+        
+        ## Dates as they'd show in a template.
+        columns['created_date'] = [formats.localize(timezone.localtime(value)) for value in columns['created_date']]
         
+        response = JsonResponse({
+            'results': columns
+        })
     
-    context = {
-        'lighthouseRuns': urlLighthouseRuns
-    }
+    response['ETag'] = etag
     
-    html = render_to_string('partials/report_detail_table_run_kpi_rows.html', context)
+    if lastModified:
+        response['Last-Modified'] = http_date(lastModified)
     
-    return JsonResponse({
-        'resultsHtml': html
-    })
+    ## Browsers must check back every time, but get a 304 if nothing changed.
+    patch_cache_control(response, no_cache=True)
+    
+    return response
 
 
+##
+##  /api/export/runs/?<GET params:>
+##      format ('csv' (default), 'ndjson')
+##      startdate (YYYY-MM-DD, optional, inclusive)
+##      enddate (YYYY-MM-DD, optional, inclusive)
+##      filter (UrlFilter slug, optional)
+##      usertiming ('1' to include user-timing data)
+##
+##  Streams a download of all the LighthouseRuns in range.
+##
+##
+def api_export_runs(request):
+    """
+    Export of LighthouseRuns as CSV or NDJSON. Streamed a row at a time from a server-side cursor,
+    so it can export any # of runs without loading them in memory. See report/export.py.
+    """
+    
+    exportFormat = request.GET.get('format', 'csv')
+    filterSlug = request.GET.get('filter', None)
+    urlFilter = None
+    
+    try:
+        startDate = parseDateParam(request.GET.get('startdate'))
+        endDate = parseDateParam(request.GET.get('enddate'))
+    except ValueError as ex:
+        return JsonResponse({
+            'status': ERROR,
+            'message': str(ex)
+        }, status=400)
+    
+    if exportFormat not in EXPORT_FORMATS:
+        return JsonResponse({
+            'status': ERROR,
+            'message': 'format must be one of: %s' % ', '.join(EXPORT_FORMATS)
+        }, status=400)
+    
+    if filterSlug:
+        urlFilter = UrlFilter.get_filter_safe(filterSlug)
+        
+        if urlFilter is None:
+            return JsonResponse({
+                'status': ERROR,
+                'message': 'Unknown filter: %s' % filterSlug
+            }, status=404)
+    
+    runs = getExportRuns(
+        startDate = startDate,
+        endDate = endDate,
+        urlFilter = urlFilter,
+        includeUserTiming = request.GET.get('usertiming') == '1',
+    )
+    
+    response = StreamingHttpResponse(exportLines(runs, exportFormat),
+                                     content_type='text/csv' if exportFormat == 'csv' else 'application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="lighthouse-runs.%s"' % exportFormat
+    
+    return response
+
 
 ########################################################################
 ########################################################################
@@ -432,36 +661,27 @@ def reports_browse(request):
     """
     
     filter_slug = request.GET.get("filter", None)
-    ids = []
-    
     filter = UrlFilter.get_filter_safe(filter_slug)
     
-    if filter is not None:
-        filter.run_query()
-        ids = list(filter.run_query().values_list('id', flat=True))   
-    
-    urls = Url.getUrls({
+    ## Cursor (keyset) pagination, the "load more" button gets the next page from api_browse_items with nextCursor.
+    urlsToShow, nextCursor = Url.getUrlsPage({
         'sortby': request.GET.get('sortby'),
         'sortorder': request.GET.get('sortorder'),
-        'ids': ids
-    })
+        'filter': filter
+    }, request.GET.get('cursor'), 20) # Show 20 'cards' per request.
     
-    ## Pagination is AWESOME:  https://docs.djangoproject.com/en/2.0/topics/pagination/
-    
-    urlPaginator = Paginator(urls, 20) # Show 20 'cards' per request.
-    page = request.GET.get('page')
-    urlsToShow = urlPaginator.get_page(page)
     viewData = request.GET.get('viewdata', 'perfscore')
     
     context = {
-        'urlPaginator': urlPaginator,
         'urls': urlsToShow,
+        'cardsHtml': getReportCardsHtml(urlsToShow, viewData),
         'sortby': request.GET.get('sortby', 'date'),
         'sortorder': request.GET.get('sortorder', 'desc'),
         'viewdata': viewData,
-        'hasNextPage': urlsToShow.has_next(),
+        'hasNextPage': nextCursor is not None,
+        'nextCursor': nextCursor,
         'filter': filter,
-        'filters': UrlFilter.objects.all(),
+        'filters': getUrlFilters(),
         'filterSlug': filter_slug
     }
     
@@ -490,13 +710,11 @@ def reports_filters(request):
     return render(request, 'reports_filters.html', context)
 
 
-##
-##  /report/dashboard/
-##
-##
-def reports_dashboard(request, filter_slug=''):
+def getDashboardCounts(filter=None):
     """
-    High-level page that shows key averages and overview #s.
+    All of the dashboard's counts and averages, for all tested URLs or just a UrlFilter's URLs.
+    Every count is a conditional aggregate (COUNT(*) FILTER (WHERE ...)), so this is two queries
+    however many buckets there are: one on the URLs, and one pass over their KPI averages.
     """
     
     ## Custom defined as an average realistic KPI measurement.
@@ -518,96 +736,125 @@ def reports_dashboard(request, filter_slug=''):
     
     ## Vars here allow for easy future update to scope data to any set of URLs, instead of all.
     ## This way NONE OF THE THINGS IN "CONTEXT" need to be touched.
-    ## Simply change the scope/queries of these two vars.
-    filter_slug = request.GET.get("filter", None)
-    filter = UrlFilter.get_filter_safe(filter_slug)
-    
+    ## Simply change the scope/queries of these vars.
     totalTestedUrls = Url.objects.withValidRuns()
 
     if filter != None:
         urls = filter.run_query()
         urlKpiAverages = UrlKpiAverage.getFilteredAverages(urls)
+        ## The averages are already scoped to the filter's URLs.
+        timingScope = Q()
     else:
         urls = totalTestedUrls
         urlKpiAverages = UrlKpiAverage.objects.all()
+        timingScope = Q(url__in=totalTestedUrls.values('id'))
     
-    ## If there are runs for the URL query set, get the average of average KPI scores across them.
-    if urlKpiAverages.count() > 0:
-        perfScoreAverage = round(urlKpiAverages.aggregate(Avg('performance_score'))['performance_score__avg'])
-        a11yScoreAverage = round(urlKpiAverages.aggregate(Avg('accessibility_score'))['accessibility_score__avg'])
-        seoScoreAverage = round(urlKpiAverages.aggregate(Avg('seo_score'))['seo_score__avg'])
-    else:
-        perfScoreAverage = 0
-        a11yScoreAverage = 0
-        seoScoreAverage = 0
-    
-    
-    ## Get a bunch of counts to chart.
     ## Nothing here should be changed unless we add a new data point to chart.
-    context = {
-        'totalTestedUrls': totalTestedUrls.count(),
-        'scopedUrlsTestedCount': urls.withValidRuns().count(),
-        'filter': filter,
-        'filters': UrlFilter.objects.all(),
-        'filterSlug': filter_slug,
-        
+    kpiAggregates = {
         ## Top "average" donut charts.
-        'urlGlobalPerfAvg': perfScoreAverage,
-        'urlGlobalA11yAvg': a11yScoreAverage,
-        'urlGlobalSeoAvg': seoScoreAverage,
-        
-        ## Aggregate scores (perf, a11y, seo) pie charts.
-        'urlPerfCountPoor': urlKpiAverages.filter(performance_score__gt = 5, performance_score__lte=GOOGLE_SCORE_SCALE['poor']['max']).count(),
-        'urlPerfCountAvg': urlKpiAverages.filter(performance_score__gte=GOOGLE_SCORE_SCALE['average']['min'], performance_score__lte=GOOGLE_SCORE_SCALE['average']['max']).count(),
-        'urlPerfCountGood': urlKpiAverages.filter(performance_score__gte=GOOGLE_SCORE_SCALE['good']['min']).count(),
-        
-        'urlA11yCountPoor': urlKpiAverages.filter(accessibility_score__gt = 5, accessibility_score__lte=GOOGLE_SCORE_SCALE['poor']['max']).count(),
-        'urlA11yCountAvg': urlKpiAverages.filter(accessibility_score__gte=GOOGLE_SCORE_SCALE['average']['min'], accessibility_score__lte=GOOGLE_SCORE_SCALE['average']['max']).count(),
-        'urlA11yCountGood': urlKpiAverages.filter(accessibility_score__gte=GOOGLE_SCORE_SCALE['good']['min']).count(),
-        
-        'urlSeoCountPoor': urlKpiAverages.filter(seo_score__gt = 5, seo_score__lte=GOOGLE_SCORE_SCALE['poor']['max']).count(),
-        'urlSeoCountAvg': urlKpiAverages.filter(seo_score__gte=GOOGLE_SCORE_SCALE['average']['min'], seo_score__lte=GOOGLE_SCORE_SCALE['average']['max']).count(),
-        'urlSeoCountGood': urlKpiAverages.filter(seo_score__gte=GOOGLE_SCORE_SCALE['good']['min']).count(),
-        
-        ## KPI timing pie charts (FCP, FMP, TTI/FI).
-        'urlFcpCountSlow': urls.filter(url_kpi_average__first_contentful_paint__gt=(reportBuckets['fcp']['slow']*1000)).count(),
-        'urlFcpCountFast': urls.filter(url_kpi_average__first_contentful_paint__lt=(reportBuckets['fcp']['fast']*1000)).count(),
-        'urlFcpCountAvg': urls.filter(url_kpi_average__first_contentful_paint__gte=(reportBuckets['fcp']['fast']*1000), url_kpi_average__first_contentful_paint__lte=(reportBuckets['fcp']['slow']*1000)).count(),
-
-        'urlFmpCountSlow': urls.filter(url_kpi_average__first_meaningful_paint__gt=(reportBuckets['fmp']['slow']*1000)).count(),
-        'urlFmpCountFast': urls.filter(url_kpi_average__first_meaningful_paint__lt=(reportBuckets['fmp']['fast']*1000)).count(),
-        'urlFmpCountAvg': urls.filter(url_kpi_average__first_meaningful_paint__gte=(reportBuckets['fmp']['fast']*1000), url_kpi_average__first_meaningful_paint__lte=(reportBuckets['fmp']['slow']*1000)).count(),
-
-        'urlFiCountSlow': urls.filter(url_kpi_average__interactive__gt=(reportBuckets['tti']['slow']*1000)).count(),
-        'urlFiCountFast': urls.filter(url_kpi_average__interactive__lt=(reportBuckets['tti']['fast']*1000)).count(),
-        'urlFiCountAvg': urls.filter(url_kpi_average__interactive__gte=(reportBuckets['tti']['fast']*1000), url_kpi_average__interactive__lte=(reportBuckets['tti']['slow']*1000)).count(),
+        'urlGlobalPerfAvg': Avg('performance_score'),
+        'urlGlobalA11yAvg': Avg('accessibility_score'),
+        'urlGlobalSeoAvg': Avg('seo_score'),
     }
     
+    ## Aggregate scores (perf, a11y, seo) pie charts.
+    for name, field in (('Perf', 'performance_score'), ('A11y', 'accessibility_score'), ('Seo', 'seo_score')):
+        kpiAggregates['url%sCountPoor' % name] = Count('id', filter=Q(**{field + '__gt': 5, field + '__lte': GOOGLE_SCORE_SCALE['poor']['max']}))
+        kpiAggregates['url%sCountAvg' % name] = Count('id', filter=Q(**{field + '__gte': GOOGLE_SCORE_SCALE['average']['min'], field + '__lte': GOOGLE_SCORE_SCALE['average']['max']}))
+        kpiAggregates['url%sCountGood' % name] = Count('id', filter=Q(**{field + '__gte': GOOGLE_SCORE_SCALE['good']['min']}))
+    
+    ## KPI timing pie charts (FCP, FMP, TTI/FI).
+    for name, field, bucket in (('Fcp', 'first_contentful_paint', 'fcp'), ('Fmp', 'first_meaningful_paint', 'fmp'), ('Fi', 'interactive', 'tti')):
+        fast = reportBuckets[bucket]['fast'] * 1000
+        slow = reportBuckets[bucket]['slow'] * 1000
+        kpiAggregates['url%sCountSlow' % name] = Count('id', filter=timingScope & Q(**{field + '__gt': slow}))
+        kpiAggregates['url%sCountFast' % name] = Count('id', filter=timingScope & Q(**{field + '__lt': fast}))
+        kpiAggregates['url%sCountAvg' % name] = Count('id', filter=timingScope & Q(**{field + '__gte': fast, field + '__lte': slow}))
+    
+    counts = totalTestedUrls.aggregate(
+        totalTestedUrls = Count('id'),
+        scopedUrlsTestedCount = Count('id', filter=Q(id__in=urls.values('id'))),
+    )
+    counts.update(urlKpiAverages.aggregate(**kpiAggregates))
+    
+    ## No averages for the URL query set means no runs, so show 0s.
+    for key in ('urlGlobalPerfAvg', 'urlGlobalA11yAvg', 'urlGlobalSeoAvg'):
+        counts[key] = round(counts[key] or 0)
+    
+    return counts
+
+
+##
+##  /report/dashboard/
+##
+##
+def reports_dashboard(request, filter_slug=''):
+    """
+    High-level page that shows key averages and overview #s.
+    """
+    
+    filter_slug = request.GET.get("filter", None)
+    filter = UrlFilter.get_filter_safe(filter_slug) if filter_slug else None
+    
+    context = dict(
+        getDashboardCounts(filter),
+        filter = filter,
+        filters = getUrlFilters(),
+        filterSlug = filter_slug,
+    )
+    
     return render(request, 'reports_dashboard.html', context)
 
 
 ##
 ##  /report/urls/lighthouse-viewer/id/
 ##
-##  Compares 2 (required) or optional 3rd URL report side-by-side.
+##  Shows the Lighthouse report of the given LighthouseRun ID in the Lighthouse viewer.
 ##
 ##
 def reports_lighthouse_viewer(request, id):
-    
-    lighthouseData = {}
-    
-    try:
-        lighthouseData['rawData'] = LighthouseRun.objects.get(id=id).lighthouse_data_raw_lighthouse_run.get().report_data
-    except Exception as ex:
-        pass
+    """
+    Lighthouse report viewer for a given LighthouseRun ID.
+    The page fetches the report from /api/lighthousedata/<id>/ itself, so it's not embedded in the HTML.
+    """
     
     context = {
-        'lighthouseData': json.dumps(lighthouseData)
+        'runId': id
     }
 
     return render(request, 'reports_lighthouse_viewer.html', context)
     
     
+##
+##  /report/thumb/<id>.jpg
+##
+##  Page screenshot thumbnail for the given LighthouseRun ID.
+##
+##
+def reports_thumbnail(request, id):
+    """
+    Serves a run's thumbnail JPEG. A run's thumbnail never changes, so browsers can cache it forever,
+    and a conditional request is answered with a 304 without touching the database.
+    """
+    
+    etag = quote_etag('thumb-%s' % id)
+    
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            thumbnail = LighthouseRunThumbnail.objects.get(lighthouse_run_id=id)
+        except LighthouseRunThumbnail.DoesNotExist:
+            return HttpResponseNotFound()
+        
+        response = HttpResponse(bytes(thumbnail.image), content_type='image/jpeg')
+    
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    
+    return response
+
+
 ##
 ##  /report/urls/compare/<id1>/<id2>/<id3>?/
 ##
@@ -675,7 +922,7 @@ def reports_urls_detail(request, id):
     if lighthouseRunsCount > 0:
         try:
             lastRun = validRuns.order_by('-created_date').first().lighthouse_data_raw_lighthouse_run.get()
-            redirects = lastRun.report_data['audits']['redirects']['details']['items']
+            redirects = lastRun.getReportData()['audits']['redirects']['details']['items']
         except Exception as ex:
             pass
     